@@ -34,6 +34,12 @@ from VerticalWindWorkflowStandalone import *
 from ClipNetCDFMultiVar import *
 from HorizontalWindWorkflowStandalone import *
 from IcingWorkflowStandalone import *
+from VerticalInterpolation import *
+from HeightAssignment import *
+from TileProcessing import *
+from StageHandoff import *
+from CreateSceneLayer import *
+from SceneLayerPackage import *
 
 def feedRoutine():
     """
@@ -55,12 +61,32 @@ def feedRoutine():
 
     # 1.1 Assign Config parameters to variables
     xyExtent = config["APP"]["EXTENT"]
+    Regions = config["APP"]["REGIONS"]
     xDimension = config["APP"]["XDIMENSION"]
     yDimension = config["APP"]["YDIMENSION"]
     varNames = config["APP"]["VARIABLES"]
     AmountofLayers = config["APP"]["ZLAYERS"]
     MaxHeight = config["APP"]["MAXHEIGHT"]
     TimeAvailable = config["APP"]["TIMEAVAILABLE"]
+    WeightCacheSize = config["APP"]["WEIGHTCACHESIZE"]
+    SharedHeightAssignment = config["APP"]["SHAREDHEIGHTASSIGNMENT"]
+    TileSize = config["APP"]["TILESIZE"]
+    InterpolationWorkers = config["APP"]["INTERPOLATIONWORKERS"]
+    BarbStride = config["APP"]["BARBSTRIDE"]
+    InMemoryStages = config["APP"]["INMEMORYSTAGES"]
+    SparsePoints = config["APP"]["SPARSEPOINTS"]
+    NativeScenePackage = config["APP"]["NATIVESCENEPACKAGE"]
+    PackageWorkers = config["APP"]["PACKAGEWORKERS"]
+    MaxPointsPerNode = config["APP"]["MAXPOINTSPERNODE"]
+    CloudRegions = config["APP"]["CLOUDREGIONS"]
+    CloudPyramid = config["APP"]["CLOUDPYRAMID"]
+    IsosurfaceClasses = config["APP"]["ISOSURFACECLASSES"]
+    IsosurfaceIcing = config["APP"]["ISOSURFACEICING"]
+    TriangleBudget = config["APP"]["TRIANGLEBUDGET"]
+    InstancedSymbols = config["APP"]["INSTANCEDSYMBOLS"]
+    LevelBands = config["APP"]["LEVELBANDS"]
+    AppendHours = config["APP"]["APPENDHOURS"]
+    VirtualMerge = config["APP"]["VIRTUALMERGE"]
 
     COSMOFilesFolder = config["DATABASE"]["COSMOFILES"]
     workGDB = config["DATABASE"]["WORKGDB"]
@@ -85,12 +111,51 @@ def feedRoutine():
     arcpy.AddMessage("\nSaving output NetCDF files to: " + str(current_folder))
     tempLayerFolder = os.path.join(current_folder, "TempLayerFolder")      
 
-    # 2.3 Log into ArcGIS Online Portal
+    # 2.3 Define WeightCache folder to store the interpolation weights of the HeightAssignment between runs
+    set_weight_cache(os.path.join(current_folder, "WeightCache"), WeightCacheSize)
+
+    # 2.4 Define the number of latitude rows processed at once (see TileProcessing.py)
+    set_tile_size(TileSize)
+
+    # 2.5 Define the number of worker processes for the HeightAssignment (see VerticalInterpolation.py)
+    set_interpolation_workers(InterpolationWorkers)
+
+    # 2.6 Define if the intermediate files are handed over in memory or written to disk (see StageHandoff.py)
+    set_stage_in_memory(InMemoryStages)
+
+    # 2.7 Define if only the populated voxels are exported to the Feature Classes of the Scene Layers (see PointExport.py)
+    set_sparse_point_export(SparsePoints)
+
+    # 2.8 Define if the Scene Layer Packages are written by the I3S writer, its number of worker processes and features per node (see SceneLayerPackage.py)
+    #     and if the cloud voxels are merged to regions (see CloudRegions.py) and coarsened to a pyramid (see CloudPyramid.py)
+    set_native_scene_package(NativeScenePackage)
+    set_package_workers(PackageWorkers)
+    set_max_points_per_node(MaxPointsPerNode)
+    set_cloud_regions(CloudRegions)
+    set_cloud_pyramid(CloudPyramid)
+
+    # 2.9 Define the isosurface meshes of the cloud classes and icing (see IsosurfaceMesh.py)
+    set_isosurface_meshes(IsosurfaceClasses, IsosurfaceIcing, TriangleBudget)
+
+    # 2.10 Define if the cloud and wind barb symbols are written as instanced glTF batches per level band (see InstancedSymbols.py)
+    set_instanced_symbols(InstancedSymbols, LevelBands)
+
+    # 2.11 Define if the files of the time-enabled layers are merged virtually (see MergeNetCDF.py and MergeManifest.py), 
+    #      the manifests can only be read by the export of the populated voxels (MakeNetCDFFeatureLayer needs the merged files)
+    if VirtualMerge and not (SparsePoints or NativeScenePackage):
+        arcpy.AddMessage("\nWARNING: VIRTUALMERGE requires SPARSEPOINTS or NATIVESCENEPACKAGE, the files are merged.\n")
+    set_virtual_merge(VirtualMerge and TimeAvailable and (SparsePoints or NativeScenePackage))
+
+    # 2.12 Log into ArcGIS Online Portal
     arcpy.SignInToPortal(arcpy.GetActivePortalURL(), username_arcgis, password_arcgis)
     
-    # 2.4. Define path to Input NetCDF Files for the desired timestamps 0500UTC, 0800UTC, 1100UTC, 1400UTC and 1700UTC
+    # 2.13. Define path to Input NetCDF Files for the desired timestamps 0500UTC, 0800UTC, 1100UTC, 1400UTC and 1700UTC
     inNetCDFFiles_dict = get_inNetCDFFiles(COSMOFilesFolder)
 
+    # 2.14 Define the regions to process (a single unnamed region with EXTENT, if no regions are given)
+    if not Regions:
+        Regions = {"": xyExtent}
+
 
 
     # 3. Geoprocessing Workflows
@@ -105,15 +170,27 @@ def feedRoutine():
                     descriptionDate_raw = datetime.datetime.strptime(str(descriptionDate_raw), "%Y%m%d")
                     descriptionDate = format_datetime(descriptionDate_raw, "dd. MMMM Y", locale='en')
                     
-                    # 3.1.1 Clip netCDF
-                    clipped_file = ClipNetCDFMultiVar(inNetCDFFiles_dict[key], varNames, xDimension, yDimension, xyExtent, current_folder, timestamp)
+                    # 3.1.1 Clip netCDF (one clipped file per region from a single read of the input file)
+                    clipped_files = ClipNetCDFMultiRegion(inNetCDFFiles_dict[key], varNames, xDimension, yDimension, Regions, current_folder, timestamp, MaxHeight)
                     
-                    # 3.1.2 Geoprocessing Workflows
-                    CloudWorkflow([clipped_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate,username_arcgis, password_arcgis)
-                    StormWorkflow([clipped_file], workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis)
-                    VerticalWindWorkflow([clipped_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis) 
-                    HorizontalWindWorkflow([clipped_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis)  
-                    IcingWorkflow([clipped_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis)
+                    for regionName in clipped_files:
+                        clipped_file = clipped_files[regionName]
+                        regionTimestamp = region_timestamp(regionName, timestamp)
+
+                        # 3.1.2 Shared HeightAssignment of all level-based variables (optional)
+                        #       U and V are interpolated on the subsampled grid of the wind barbs in the HorizontalWindWorkflow
+                        level_file = clipped_file
+                        if SharedHeightAssignment:
+                            levelVarNames = [varName for varName in get_level_based_variables(clipped_file, varNames) if varName not in ('U', 'V')]
+                            level_file = HeightAssignment(clipped_file, levelVarNames, current_folder, AmountofLayers, MaxHeight, "Shared", regionTimestamp)
+
+                        # 3.1.3 Geoprocessing Workflows
+                        CloudWorkflow([level_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate,username_arcgis, password_arcgis, False, SharedHeightAssignment)
+                        StormWorkflow([clipped_file], workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis)
+                        VerticalWindWorkflow([level_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, False, SharedHeightAssignment) 
+                        HorizontalWindWorkflow([clipped_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, False, False, BarbStride)  
+                        IcingWorkflow([level_file], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, False, SharedHeightAssignment)
+                        release_stage_files([clipped_file, level_file])
 
     elif TimeAvailable:
         # 3.2 Variant 2: A single layer per meteorological parameter. Time is included as SceneLayer Attribute 
@@ -126,22 +203,54 @@ def feedRoutine():
         descriptionDate_raw = datetime.datetime.strptime(str(descriptionDate_raw), "%Y%m%d")
         descriptionDate = format_datetime(descriptionDate_raw, "ddMMMY", locale='en')
         timestamp = descriptionDate+"_TimeEnabled"
-        clipped_file_names = []
-        for InFileName in ncFilePaths:
-            clipped_file = ClipNetCDFMultiVar(InFileName, varNames, xDimension, yDimension, xyExtent, current_folder, timestamp)
-            clipped_file_names.append(clipped_file)
+
+        # Number of forecast hours already in the merged files of every region (optional, only the new hours
+        # are clipped, classified and appended to the merged files)
+        mergedHours = {regionName: 0 for regionName in Regions}
+        if AppendHours:
+            for regionName in Regions:
+                regionTimestamp = region_timestamp(regionName, timestamp.split("_")[1])
+                mergedHours[regionName] = get_merged_hours(ncFilePaths, current_folder, ["Clouds", "Thunderstorm", "VerticalWind", "HorizontalWind", "Icing"], regionTimestamp)
+                arcpy.AddMessage("\n" + regionTimestamp + ": " + str(mergedHours[regionName]) + " of " + str(len(ncFilePaths)) + " forecast hours already merged")
+
+        clipped_file_names = {regionName: [] for regionName in Regions}
+        for hour, InFileName in enumerate(ncFilePaths):
+            clipRegions = {regionName: Regions[regionName] for regionName in Regions if hour >= mergedHours[regionName]}
+            if not clipRegions:
+                continue
+            clipped_files = ClipNetCDFMultiRegion(InFileName, varNames, xDimension, yDimension, clipRegions, current_folder, timestamp, MaxHeight)
+            for regionName in clipped_files:
+                clipped_file_names[regionName].append(clipped_files[regionName])
         
-        # 3.2.2. Geoprocessing Workflows
-        timestamp = timestamp.split("_")[1]     # Change Timestamp for later archiving the correct layers in the Portal
-        CloudWorkflow(clipped_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable)
-        StormWorkflow(clipped_file_names, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable)
-        VerticalWindWorkflow(clipped_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable)   
-        HorizontalWindWorkflow(clipped_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable)  
-        IcingWorkflow(clipped_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, timestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable)
+        for regionName in clipped_file_names:
+            if not clipped_file_names[regionName]:
+                continue    # No new forecast hours
+            appendMerge = mergedHours[regionName] > 0
+            regionTimestamp = region_timestamp(regionName, timestamp.split("_")[1])     # Change Timestamp for later archiving the correct layers in the Portal
+            # 3.2.2 Shared HeightAssignment of all level-based variables (optional)
+            #       U and V are interpolated on the subsampled grid of the wind barbs in the HorizontalWindWorkflow
+            level_file_names = clipped_file_names[regionName]
+            if SharedHeightAssignment:
+                level_file_names = []
+                for clipped_file in clipped_file_names[regionName]:
+                    levelVarNames = [varName for varName in get_level_based_variables(clipped_file, varNames) if varName not in ('U', 'V')]
+                    level_file_names.append(HeightAssignment(clipped_file, levelVarNames, current_folder, AmountofLayers, MaxHeight, "Shared", regionTimestamp))
+
+            # 3.2.3. Geoprocessing Workflows
+            CloudWorkflow(level_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable, SharedHeightAssignment, appendMerge)
+            StormWorkflow(clipped_file_names[regionName], workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable, appendMerge)
+            VerticalWindWorkflow(level_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable, SharedHeightAssignment, appendMerge)   
+            HorizontalWindWorkflow(clipped_file_names[regionName], varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable, False, BarbStride, appendMerge)  
+            IcingWorkflow(level_file_names, varNames, workGDB, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, regionTimestamp, descriptionDate, username_arcgis, password_arcgis, TimeAvailable, SharedHeightAssignment, appendMerge)
+            release_stage_files(clipped_file_names[regionName] + level_file_names)
     else:
         arcpy.AddMessage("\nWARNING: Please select in the config file if the ''time'' Attribute is available in the webapp."+
                         "This will automatically choose the appropriate workflow.\n")
 
+    shutdown_interpolation_pool()
+    shutdown_package_pool()
+    arcpy.AddMessage("\nInterpolation weight cache: " + str(weightCacheStatistics["hits"]) + " hits, " + str(weightCacheStatistics["misses"]) + " misses")
+
 def read_yaml(file_path):
     with open(file_path, "r") as f:
         return yaml.safe_load(f)
@@ -14,6 +14,9 @@
                     dependent Variable Value at Datapoints in the (levels, lat, lon)-System to a geometric 
                     height value. Afterwards the dependent variable values at Datapoints in the (Z, lat, lon) are determined
                     by Interpolation using the nearest points above and below the Z-coordinate.
+                    2D variables (e.g. the classified CAPE values) are extruded to all Z layers. For the
+                    sparse point export and the native Scene Layer Package only the Z-Coordinates and
+                    the 2D values are written, the extrusion is done by the point export (see PointExport.py).
                     
   
 ----------------------------------------------------------------------------------'''
@@ -27,19 +30,22 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from TileProcessing import *
+from StageHandoff import *
+
 def CapeRegrid(GeometricHeight, VariableData, AmountofLayers, MaxHeight):
     """
         Function Description: 
-        Creating new z-Coordinates with "nVertLayers"-Layers. Assigning a Geometric Height to each Level Based
-        Datapoint of the COSMO Output. Interpolating the Values of the variable "VariableData" to the new 
-        z-Coordinates.
+        Creating new z-Coordinates with "nVertLayers"-Layers. The 2D Values of the variable "VariableData" 
+        are extruded to all Layers of the new z-Coordinates. The extruded array is a read-only broadcast 
+        view of the 2D Values (no copy per Layer). All timestamps of "VariableData" are regridded at once.
 
         Parameters
         ----------
         GeometricHeight: array
             array of netCDF variable "height"
         VariableData: array
-            Values from the Variable to interpolate
+            Values from the Variable to interpolate (time, latitude, longitude)
         AmountofLayers: int
             Number of Layers in new vertical coordinate system
         MaxHeight: int
@@ -48,7 +54,7 @@ def CapeRegrid(GeometricHeight, VariableData, AmountofLayers, MaxHeight):
         Returns
         -------
         outVariableData: array
-            Interpolated data
+            Regridded data (read-only broadcast view (time, Z, latitude, longitude))
         HeightSpacing: int
             Vertical Layer numbers
     """
@@ -58,30 +64,23 @@ def CapeRegrid(GeometricHeight, VariableData, AmountofLayers, MaxHeight):
     maxHeight =  np.max(GeometricHeight)
     minHeight = np.min(GeometricHeight)
     heightSpacing = np.linspace(MaxHeight, 0, num = AmountofLayers)   # Divide Vertical Spacing in to uniform spacing (Reversed because of order of geometric height)
-    min_indices = np.empty(2)
     shapeVariableData = list(np.shape(VariableData))
     shapeVariableData.insert(1, AmountofLayers)
     shapeVariableData = tuple(shapeVariableData)
-    outVariableData = np.empty(shapeVariableData)
     
     arcpy.AddMessage('... regrid data')
     # Reclassify Height 
-    for height in range(AmountofLayers):
-        for i in range(GeometricHeight.shape[1]):       # latitude
-            for j in range(GeometricHeight.shape[2]):   # longitude
-                if GeometricHeight[0,i,j] < -100000:    # Check for NaN Values in Geometric Height
-                    pass
-                else:
-                    CapeValue = VariableData[0,i,j]
-                    outVariableData[0, height, i, j] = CapeValue      # Time dimension also iterable (if more than one timestamp)
-
-        arcpy.AddMessage('    height: '+ str(height))
+    # The value of every column and timestamp is used for all layers (broadcast along the Z-axis)
+    missingHeight = GeometricHeight[0] < -100000        # Check for NaN Values in Geometric Height
+    VariableData = np.where(missingHeight, -3.4028235e+38, np.ma.getdata(VariableData))
+    outVariableData = np.broadcast_to(VariableData[:, np.newaxis, :, :], shapeVariableData)
+
     return outVariableData, heightSpacing
 
-def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, AmountofLayers, MaxHeight, LayerName, Timestamp):
+def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, AmountofLayers, MaxHeight, LayerName, Timestamp, heightNetCDFFileName = None, extrude = True):
     """
         Function Description: 
-        Transforms the Variable CAPE to a three dimensional coordinate system.
+        Transforms a 2D Variable (CAPE or the classified CAPE values) to a three dimensional coordinate system.
         Writes a new netCDF file containing the transformed variable.
 
         Parameters
@@ -100,6 +99,12 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
             Name of Layer (corresponds to Meteorological Parameter)
         Timestamp: string
             Timestamp of the current NetCDF file 
+        heightNetCDFFileName: string
+            Name of the NetCDF File containing the geometric height (if not part of the Input NetCDF File)
+        extrude: bool
+            If true, the variable is written to all Z layers (time, Z, latitude, longitude). Otherwise
+            only the Z-Coordinates are added and the variable keeps its 2D dimensions (extruded by the
+            point export, thus the file is not AmountofLayers times larger)
         
         Returns
         -------
@@ -109,7 +114,7 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
     arcpy.AddMessage('\nSTART Transforming to Z-Coordinates')
 
     ncVarHeight = 'HEIGHT'
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_CapeRegrid_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_CapeRegrid_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name    
 
     fill_value = -3.4028235e+38
@@ -122,11 +127,15 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
 
     # 1. Load netCDF File
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
+    if heightNetCDFFileName is None:
+        heightNetCDFFile = inNetCDFFile
+    else:
+        heightNetCDFFile = open_stage_file(heightNetCDFFileName)
     
     #1.2 Check if netCDF variable "Height" and "ncVarName" exist
-    if list(ncVarNames).count(ncVarHeight) == 0:
+    if list(heightNetCDFFile.variables.keys()).count(ncVarHeight) == 0:
         arcpy.AddError("NetCDF variable " + ncVarHeight + " does not exist.")              
         raise Exception (msgInvalidParameter)
     arcpy.AddMessage("... netCDF variable " + ncVarHeight + " exists")
@@ -155,21 +164,19 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
 
     # 2. Extract variable Geometric Height and Specified Dependent Variable from netCDF Input File
     # 2.1 Get the netCDF geometric height variable object 
-    height = inNetCDFFile.variables[ncVarHeight]
-    heightData = height[:]    
+    height = heightNetCDFFile.variables[ncVarHeight]
     heightShape = height.shape
-    heightRank = len(heightData.shape)
+    heightRank = len(heightShape)
     heightDimNames = height.dimensions 
 
     # 2.2 Get the specified dependent variable object from netCDF Input File
     ncVarObj = inNetCDFFile.variables[ncVarName]
-    ncVarData = inNetCDFFile.variables[ncVarName][:]
 
-    # 3. Construction of new z-Coordinate Frame and interpolation of dependent variable data
-    [RegriddedData, zCoordinates] = CapeRegrid(heightData, ncVarData, AmountofLayers, MaxHeight)
+    # 3. Construction of new z-Coordinate Frame (the data is regridded tile by tile when writing the output variable)
+    zCoordinates = np.linspace(MaxHeight, 0, num = AmountofLayers)
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4')    
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')     # Merged along the time dimension (see MergeNetCDF.py)
 
     # 5. Create Dimensions
     for dimName in ncDimNames:       
@@ -228,8 +235,16 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
             outNcCoordVar[:] = zCoordinates[:]      # Assign new z-Coordinate values from reclassify_height function output to Height coordinate variable 
             
     
-    outNcVar = outNetCDFFile.createVariable(ncVarName, 'f4', (ncDimNames), fill_value = -3.4028235e+38)
-    outNcVar [:, :, :, :] = RegriddedData[:]                    
+    outNcVarDimNames = ncDimNames if extrude else list(ncVarObj.dimensions)
+    outNcVar = outNetCDFFile.createVariable(ncVarName, 'f4', (outNcVarDimNames), fill_value = -3.4028235e+38)
+    for tile in latitude_tiles(heightShape[1]):     # Regrid and write in latitude bands (see TileProcessing.py)
+        ncVarData = ncVarObj[tile_index(ncVarObj.dimensions, tile, yDimension)]
+        [RegriddedData, zCoordinates] = CapeRegrid(height[:, tile, :], ncVarData, AmountofLayers, MaxHeight)
+        if extrude:
+            for zIndex in range(AmountofLayers):    # Layer by layer, the broadcast view is never copied as a whole
+                outNcVar[:, zIndex, tile, :] = RegriddedData[:, zIndex]
+        else:
+            outNcVar[:, tile, :] = RegriddedData[:, 0]      # Columns without geometric height are set to the fill value
 
     # 6. Get Variable Attributes and assign to new outVariable
         #    Also determine if grid_mapping exists or not
@@ -291,8 +306,10 @@ def CapeGridAssignment(inNetCDFFileName, ncVarName, current_geodatabase, Amounto
 
     # 9. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
+    if heightNetCDFFile is not inNetCDFFile:
+        heightNetCDFFile.close()
 
     arcpy.AddMessage('END Transforming to Z-Coordinates\n\n')
 
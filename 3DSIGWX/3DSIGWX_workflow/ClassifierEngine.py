@@ -0,0 +1,97 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  ClassifierEngine
+ Source Name:       ClassifierEngine.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Rule Table
+                    Variable arrays
+
+ Description:       Classifies meteorological variables with a declarative rule table instead of
+                    looping over every (t,z,lat,lon)-Datapoint. A rule table is a list of rules 
+                    [class value, {variable name: interval}], an interval is given as
+                    (lower bound, upper bound, closed side) with closed side "left", "right", 
+                    "both" or "neither" and None for an unbounded side. A Datapoint gets the 
+                    class value of the first rule whose intervals contain the values of all 
+                    variables (as in an if/elif chain), otherwise the fill value.
+                    Example (Icing): [[1, {'T': (233.15, 273.15, "both"), 'QC': (0, None, "neither")}]]
+                    
+  
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+
+
+def interval_condition(VariableData, interval):
+    """
+        Function Description: 
+        Checks at every Datapoint if the value lies inside the interval.
+
+        Parameters
+        ----------
+        VariableData: array
+            Values of the variable
+        interval: tuple
+            (lower bound, upper bound, closed side), None for an unbounded side
+        
+        Returns
+        -------
+        condition: array
+            True where the value lies inside the interval
+    """
+    [lower, upper, closed] = interval
+    if closed not in ("left", "right", "both", "neither"):
+        raise ValueError("Invalid closed side of interval: " + str(closed))
+
+    condition = np.ones(np.shape(VariableData), dtype=bool)
+    if lower is not None:
+        if closed in ("left", "both"):
+            condition &= VariableData >= lower
+        else:
+            condition &= VariableData > lower
+    if upper is not None:
+        if closed in ("right", "both"):
+            condition &= VariableData <= upper
+        else:
+            condition &= VariableData < upper
+    return condition
+
+
+def apply_rule_table(ruleTable, variables, fillValue):
+    """
+        Function Description: 
+        Classifies all Datapoints of the variables at once with the rule table. The first
+        matching rule determines the class value, Datapoints without matching rule get the
+        fill value (thus no feature will be created in the feature layer).
+
+        Parameters
+        ----------
+        ruleTable: list
+            Rules [class value, {variable name: (lower bound, upper bound, closed side)}]
+        variables: dict
+            Arrays of the variables used in the rule table (all of the same shape)
+        fillValue: float
+            Default value
+        
+        Returns
+        -------
+        outVariableData: array
+            Classified values
+    """
+    # Compare in double precision as the scalar comparisons of the former per-cell classification
+    VariableData = {}
+    for varName, values in variables.items():
+        VariableData[varName] = np.asarray(np.ma.getdata(values), dtype=np.float64)
+    shapeData = np.shape(next(iter(VariableData.values())))
+
+    conditions = []
+    classValues = []
+    for [classValue, intervals] in ruleTable:
+        condition = np.ones(shapeData, dtype=bool)
+        for varName, interval in intervals.items():
+            condition &= interval_condition(VariableData[varName], interval)
+        conditions.append(condition)
+        classValues.append(classValue)
+
+    return np.select(conditions, classValues, default=fillValue).astype(np.float64)
@@ -25,10 +25,20 @@ import sys, os, copy
 from netCDF4 import Dataset as NetCDFFile
 import netCDF4
 
+from TileProcessing import *
+from CoordinateIndex import *
+from StageHandoff import *
 
-def getSlice(inArray,xMinIndex,yMinIndex,xMaxIndex,yMaxIndex,xDimensionIndex,yDimensionIndex,rank=1):
+
+# Number of model levels kept above the levels reaching MaxHeight. The HeightAssignment compares 
+# the three levels above and below every z-Coordinate (see VerticalInterpolation.py)
+BracketingLevels = 3
+
+
+def getSlice(inArray,xMinIndex,yMinIndex,xMaxIndex,yMaxIndex,xDimensionIndex,yDimensionIndex,rank=1,zDimensionIndex=None,zMinIndex=0):
     """
         Function Description: This defines the extent (lat/lon), which is finally used to carry out the clipping.
+        If 'inArray' is a netCDF variable, only the hyperslab of the extent is read from the file.
 
         Parameters
         ----------
@@ -48,28 +58,101 @@ def getSlice(inArray,xMinIndex,yMinIndex,xMaxIndex,yMaxIndex,xDimensionIndex,yDi
             Index of y-Dimension
         rank: int
             Rank of the variable array (number of dimensions)
+        zDimensionIndex: int
+            Index of the level Dimension (None if the levels are taken completely)
+        zMinIndex: int
+            Index of the first level
 
         Returns
         -------
         array
             Returns multidimensional array containing the variable values for the given extent and the given dimensions
     """
-    #Get a subset of a multidimensional array
-    args = [":" for i in range(rank) ]
-    xRange = ":".join([str(xMinIndex), str(xMaxIndex+1)])
-    yRange = ":".join([str(yMinIndex), str(yMaxIndex+1)])
-    args[xDimensionIndex] = xRange
-    args[yDimensionIndex] = yRange
-    args = ",".join(args)
-    execstring = "inArray" + "[" + args + "]"        
-    return eval(execstring)
+    #Get a subset of a multidimensional array (all other dimensions are taken completely)
+    args = [slice(None)] * rank
+    args[xDimensionIndex] = slice(xMinIndex, xMaxIndex+1)
+    args[yDimensionIndex] = slice(yMinIndex, yMaxIndex+1)
+    if zDimensionIndex is not None:
+        args[zDimensionIndex] = slice(zMinIndex, None)
+    return inArray[tuple(args)]
+
+
+def getRegionTile(unionData, tile, unionIndices, regionIndices, xDimensionIndex, yDimensionIndex, rank=1, zDimensionIndex=None, zMinIndex=0):
+    """
+        Function Description: Extracts the part of a region from a tile of the union hyperslab (bounding box of all regions).
+
+        Parameters
+        ----------
+        unionData: array
+            Values of the tile of the union hyperslab
+        tile: slice
+            Latitude rows of the tile (relative to the union hyperslab)
+        unionIndices: list
+            xMin, yMin, xMax and yMax index of the union hyperslab
+        regionIndices: list
+            xMin, yMin, xMax and yMax index of the region
+        xDimensionIndex: int
+            Index of x-Dimension
+        yDimensionIndex: int
+            Index of y-Dimension
+        rank: int
+            Rank of the variable array (number of dimensions)
+        zDimensionIndex: int
+            Index of the level Dimension (None if the levels are taken completely)
+        zMinIndex: int
+            Index of the first level (relative to the union hyperslab)
+
+        Returns
+        -------
+        rows: slice
+            Latitude rows in the output of the region (None if the region does not intersect the tile)
+        array
+            Values of the region within the tile
+    """
+    [xUnionMinIndex, yUnionMinIndex, xUnionMaxIndex, yUnionMaxIndex] = unionIndices
+    [xMinIndex, yMinIndex, xMaxIndex, yMaxIndex] = regionIndices
+    rowStart = max(yMinIndex, yUnionMinIndex + tile.start)
+    rowStop = min(yMaxIndex + 1, yUnionMinIndex + tile.stop)
+    if rowStart >= rowStop:
+        return [None, None]
+
+    regionData = getSlice(unionData, xMinIndex - xUnionMinIndex, rowStart - yUnionMinIndex - tile.start, xMaxIndex - xUnionMinIndex, 
+                            rowStop - 1 - yUnionMinIndex - tile.start, xDimensionIndex, yDimensionIndex, rank, zDimensionIndex, zMinIndex)
+    return [slice(rowStart - yMinIndex, rowStop - yMinIndex), regionData]
+
+
+def getLevelsAbove(heightData, MaxHeight):
+    """
+        Function Description: 
+        Get the smallest number of model levels above 'MaxHeight' of all columns. The levels above are 
+        never used by the HeightAssignment. Columns with missing geometric height are skipped.
+
+        Parameters
+        ----------
+        heightData: array
+            Geometric height (levels, latitude, longitude), levels ordered from top to bottom
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+
+        Returns
+        -------
+        int
+            Number of levels above 'MaxHeight' (None if no column has a valid geometric height)
+    """
+    heightData = np.ma.getdata(heightData)
+    validColumns = heightData[0] >= -100000
+    if not np.any(validColumns):
+        return None
+    levelsAbove = np.sum(heightData[:-2] > MaxHeight, axis=0)      # Levels considered for the interpolation (see VerticalInterpolation.py)
+    return int(np.min(levelsAbove[validColumns]))
 
 
 def getIndex(inList,inValue):
     """
         Function Description: 
         Get the index of the nearest value specified by 'inValue' in a given list 'inList'. 
-        Used to determine the indices of the xMin, xMax, yMin, yMax values describing the 'extent'.
+        Used to determine the indices of the xMin, xMax, yMin, yMax values describing the 'extent'
+        (binary search, see CoordinateIndex.py).
 
         Parameters
         ----------
@@ -84,30 +167,38 @@ def getIndex(inList,inValue):
             Index of the value which is nearest to 'inValue'
     """
     #Get index of the nearest value with the list
-    inList = copy.deepcopy(inList)
-    inListReverse = False
-    vIndex = -1
-    if inList[0] > inList[len(inList)-1]:
-        inListReverse = True
-        inList.reverse()
-        
-    vDiff = abs(inList[len(inList)-1] - inList[0])
-    i = 0
-    for v in inList:
-        vCurrDiff = abs(inValue - v)
-        if vCurrDiff < vDiff:
-            vDiff = vCurrDiff
-            vIndex = i
-        i = i + 1
-    if inListReverse:
-        vIndex = len(inList) - 1  - vIndex
-    return vIndex
+    return nearest_index(inList, inValue)
     
     
 
 
 
-def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyExtent, current_geodatabase, Timestamp):
+def region_timestamp(regionName, Timestamp):
+    """
+        Function Description: 
+        Prefixes the timestamp with the name of the region, used for the names of the output 
+        files and layers of every region.
+
+        Parameters
+        ----------
+        regionName: string
+            Name of the region ("" for a single unnamed extent)
+        Timestamp: string
+            Timestamp of the current NetCDF file 
+
+        Returns
+        -------
+        string
+            Timestamp of the region
+    """
+    if not regionName:
+        return Timestamp
+    return regionName + "_" + Timestamp
+
+
+
+
+def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyExtent, current_geodatabase, Timestamp, MaxHeight = None):
 
     """
         Function Description: 
@@ -128,6 +219,9 @@ def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyEx
             x/y coordinates of the desired boundaries to clip the input file
         current_geodatabase: string
             Path to the current project geodatabase (to save the output file)
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system. Model levels which are not needed
+            to interpolate up to MaxHeight are dropped (None keeps all levels)
         
 
         Returns
@@ -136,11 +230,52 @@ def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyEx
             Name of the output NetCDF file 
         
     """
-    arcpy.AddMessage('\nSTART Clipping NetCDF File')
+    # Single region without name (see ClipNetCDFMultiRegion)
+    unique_names = ClipNetCDFMultiRegion(inNetCDFFileName, ncVarName, xDimension, yDimension, {"": xyExtent}, current_geodatabase, Timestamp, MaxHeight)
 
+    return unique_names[""]
 
-    unique_name = arcpy.CreateUniqueName(Timestamp +"_Clipped_netCDF.nc", workspace= current_geodatabase)
-    outNetCDFFileName = unique_name
+
+
+
+def ClipNetCDFMultiRegion(inNetCDFFileName, ncVarName, xDimension, yDimension, regions: dict, current_geodatabase, Timestamp, MaxHeight = None):
+
+    """
+        Function Description: 
+        Clips the input NetCDF file to the extents (longitude/latitude) of several regions. Every variable
+        is read once within the bounding box of all regions (union hyperslab) and written to one output 
+        netCDF file per region. Only the Variables specified in "ncVarName" are included in the output files.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Name of the netCDF File to clip
+        ncVarName: list
+            Names of Variables to be included in the output file
+        xDimension: string
+            NetCDF Dimension for x-Coordinate (longitude)
+        yDimension: string
+            NetCDF Dimension for y-Coordinate (latitude)
+        regions: dict
+            Region names and x/y coordinates of the desired boundaries to clip the input file
+        current_geodatabase: string
+            Path to the current project geodatabase (to save the output files)
+        Timestamp: string
+            Timestamp of the current NetCDF file 
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system. Model levels which are not needed
+            to interpolate up to MaxHeight are dropped (None keeps all levels)
+        
+
+        Returns
+        -------
+        unique_names: dict
+            Names of the output NetCDF files per region
+        
+    """
+    arcpy.AddMessage('\nSTART Clipping NetCDF File')
+
+    ncVarHeight = 'HEIGHT'
 
     #Define message constants so they may be translated easily
     msgInvalidParameter = "Invalid parameter."
@@ -150,16 +285,19 @@ def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyEx
     # Split the Input varNames variables
     ncVarName = ncVarName.split(",")
 
-    #Get XMin, YMin, XMax, and YMax from extennt
-    xyExtentVal = xyExtent.split()
-    xMin = float(xyExtentVal[0])
-    yMin = float(xyExtentVal[1])
-    xMax = float(xyExtentVal[2])
-    yMax = float(xyExtentVal[3])
+    #Get XMin, YMin, XMax, and YMax from the extent of every region
+    regionNames = list(regions.keys())
+    regionExtents = []
+    for regionName in regionNames:
+        xyExtentVal = regions[regionName].split()
+        if len(xyExtentVal) != 4:
+            arcpy.AddError("Extent of region " + regionName + " is invalid.")
+            raise Exception (msgInvalidParameter)
+        regionExtents.append([float(extentVal) for extentVal in xyExtentVal])
 
     # 1. Load NetCDF File
     #1.0 Open the netCDF file and get variables
-    inNetCDFFile = NetCDFFile(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
 
     # Combine the Dimensions from all Input Variables
@@ -179,96 +317,134 @@ def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyEx
             raise Exception (msgInvalidParameter)
         arcpy.AddMessage("... netCDF variable " + varName + " exists")
 
-    # 2.0 Create outNetCDFFile
-    outNetCDFFile = NetCDFFile(outNetCDFFileName, 'w')
-    arcpy.AddMessage("... creating output netCDF file " + outNetCDFFileName)  
-
-    #3.0 Find xmin, ymin, xmax, and ymax index 
-    #3.1. Find xmin and xmax index
-    ncCoordVar = inNetCDFFile.variables[xDimension]        
-    ncCoordVarData = ncCoordVar[:]
-    ncCoordVarDataList = list(ncCoordVarData)        
-    xMinIndex = getIndex(ncCoordVarDataList, xMin)                
-    xMaxIndex = getIndex(ncCoordVarDataList, xMax)        
-    if xMinIndex > xMaxIndex:
-        TempMinIndex = xMinIndex
-        xMinIndex = xMaxIndex
-        xMaxIndex = TempMinIndex
-        
-    #3.2. Find ymin and ymax index        
-    ncCoordVar = inNetCDFFile.variables[yDimension]        
-    ncCoordVarData = ncCoordVar[:]
-    ncCoordVarDataList = list(ncCoordVarData)        
-    yMinIndex = getIndex(ncCoordVarDataList, yMin)                
-    yMaxIndex = getIndex(ncCoordVarDataList, yMax)        
-    if yMinIndex > yMaxIndex:
-        TempMinIndex = yMinIndex
-        yMinIndex = yMaxIndex
-        yMaxIndex = TempMinIndex
+    # 2.0 Create outNetCDFFile for every region
+    unique_names = dict()
+    outNetCDFFiles = []
+    for regionName in regionNames:
+        unique_name = create_stage_name(region_timestamp(regionName, Timestamp) + "_Clipped_netCDF.nc", current_geodatabase)
+        unique_names[regionName] = unique_name
+        outNetCDFFiles.append(create_stage_file(unique_name))
+        arcpy.AddMessage("... creating output netCDF file " + unique_name)  
+
+    #3.0 Find xmin, ymin, xmax, and ymax index of every region (resolved once per grid and extent, see CoordinateIndex.py)
+    xCoordVarData = inNetCDFFile.variables[xDimension][:]
+    yCoordVarData = inNetCDFFile.variables[yDimension][:]
+    regionIndices = []
+    for [xMin, yMin, xMax, yMax] in regionExtents:
+        [xMinIndex, xMaxIndex] = get_extent_indices(xCoordVarData, xMin, xMax)
+        [yMinIndex, yMaxIndex] = get_extent_indices(yCoordVarData, yMin, yMax)
+        regionIndices.append([xMinIndex, yMinIndex, xMaxIndex, yMaxIndex])
+
+    #3.1 Bounding box of all regions (union hyperslab, read once per variable)
+    xUnionMinIndex = min([indices[0] for indices in regionIndices])
+    yUnionMinIndex = min([indices[1] for indices in regionIndices])
+    xUnionMaxIndex = max([indices[2] for indices in regionIndices])
+    yUnionMaxIndex = max([indices[3] for indices in regionIndices])
+    yUnionSize = yUnionMaxIndex - yUnionMinIndex + 1
+    unionIndices = [xUnionMinIndex, yUnionMinIndex, xUnionMaxIndex, yUnionMaxIndex]
+
+    #3.2 Find the first model level needed to interpolate up to MaxHeight in every region (levels are ordered from top to bottom)
+    #    The same number of levels is dropped in all level dimensions (full and half levels), thus the level indices of 
+    #    the geometric height still match the level indices of the variables
+    levelDimNames = []
+    regionLevelStarts = [0] * len(regionIndices)
+    if MaxHeight is not None and ncVarHeight in ncVarName:
+        height = inNetCDFFile.variables[ncVarHeight]
+        heightDimNames = list(height.dimensions)
+        nHeightLevels = height.shape[0]
+        for varName in ncVarName:
+            ncVar = inNetCDFFile.variables[varName]
+            if varName == ncVarHeight:
+                levelDimName = ncVar.dimensions[0]
+            elif len(ncVar.dimensions) == 4:
+                levelDimName = ncVar.dimensions[1]
+            else:
+                continue
+            if levelDimName not in levelDimNames and inNetCDFFile.dimensions[levelDimName].size >= nHeightLevels - 1:
+                levelDimNames.append(levelDimName)
+
+        regionLevelsAbove = [None] * len(regionIndices)
+        for tile in latitude_tiles(yUnionSize):
+            heightData = getSlice(height, xUnionMinIndex, yUnionMinIndex + tile.start, xUnionMaxIndex, yUnionMinIndex + tile.stop - 1, 
+                                    heightDimNames.index(xDimension), heightDimNames.index(yDimension), len(heightDimNames))
+            for regionNumber in range(len(regionIndices)):
+                [rows, regionHeightData] = getRegionTile(heightData, tile, unionIndices, regionIndices[regionNumber], 
+                                                            heightDimNames.index(xDimension), heightDimNames.index(yDimension), len(heightDimNames))
+                if rows is None:
+                    continue
+                levelsAbove = getLevelsAbove(regionHeightData, MaxHeight)
+                if levelsAbove is not None and (regionLevelsAbove[regionNumber] is None or levelsAbove < regionLevelsAbove[regionNumber]):
+                    regionLevelsAbove[regionNumber] = levelsAbove
+        regionLevelStarts = [max(0, levelsAbove - BracketingLevels) if levelsAbove is not None else 0 for levelsAbove in regionLevelsAbove]
+        for regionName, levelStart in zip(regionNames, regionLevelStarts):
+            arcpy.AddMessage("... dropping " + str(levelStart) + " model levels above " + str(MaxHeight) + " m" + (" in region " + regionName if regionName else ""))
                     
 
-    #4.0 Adjust x and y dimension sizes based on the given extent
-    xDimensionSize = xMaxIndex - xMinIndex + 1
-    yDimensionSize = yMaxIndex - yMinIndex + 1
+    #4.0 Adjust x and y dimension sizes based on the extent of every region
+    regionDimensionSizes = [[xMaxIndex - xMinIndex + 1, yMaxIndex - yMinIndex + 1] for [xMinIndex, yMinIndex, xMaxIndex, yMaxIndex] in regionIndices]
 
 
-    #5.0 Create dimension and coordinate variables in outNetCDFFile
-    for dimName in dimNames:       
-        #Set output dimension size    
-        if dimName == xDimension:
-            dimSize = xDimensionSize
-        elif dimName == yDimension:
-            dimSize = yDimensionSize
-        else:
-            dimSize = inNetCDFFile.dimensions[dimName].size
+    #5.0 Create dimension and coordinate variables in every outNetCDFFile
+    for outNetCDFFile, [xMinIndex, yMinIndex, xMaxIndex, yMaxIndex], [xDimensionSize, yDimensionSize], levelStart in zip(outNetCDFFiles, regionIndices, regionDimensionSizes, regionLevelStarts):
+        for dimName in dimNames:       
+            #Set output dimension size    
+            if dimName == xDimension:
+                dimSize = xDimensionSize
+            elif dimName == yDimension:
+                dimSize = yDimensionSize
+            elif dimName in levelDimNames:
+                dimSize = inNetCDFFile.dimensions[dimName].size - levelStart
+            else:
+                dimSize = inNetCDFFile.dimensions[dimName].size
             
-        #Adjust output dimension size if it is NONE (NONE is returned for UNLIITED size)
-        #Getting actual size in file from shape
-        if dimSize == None:
-            ncCoordVar = inNetCDFFile.variables[dimName]
-            dimSize = list(ncCoordVar.shape)[0]
-
-        #5.1 Create dimension in outnetCDFfile
-        outNetCDFFile.createDimension(dimName,dimSize) 
+            #Adjust output dimension size if it is NONE (NONE is returned for UNLIITED size)
+            #Getting actual size in file from shape
+            if dimSize == None:
+                ncCoordVar = inNetCDFFile.variables[dimName]
+                dimSize = list(ncCoordVar.shape)[0]
+
+            #5.1 Create dimension in outnetCDFfile
+            outNetCDFFile.createDimension(dimName,dimSize) 
         
-        #5.2 Check if dimension is alos a variable i.e. coordinate variable
-        if dimName in ncVarNames:
-            # Get coordinate variable    
-            ncCoordVar = inNetCDFFile.variables[dimName]
+            #5.2 Check if dimension is alos a variable i.e. coordinate variable
+            if dimName in ncVarNames:
+                # Get coordinate variable    
+                ncCoordVar = inNetCDFFile.variables[dimName]
                 
-            # Get data: a subset if x or y dimension else get all
-            if dimName == xDimension:                
-                ncCoordVarData = ncCoordVar[xMinIndex:xMaxIndex+1]            
-            elif dimName == yDimension:                
-                ncCoordVarData = ncCoordVar[yMinIndex:yMaxIndex+1]                
-            else:
-                ncCoordVarData = ncCoordVar[:]
+                # Get data: a subset if x or y dimension else get all
+                if dimName == xDimension:                
+                    ncCoordVarData = ncCoordVar[xMinIndex:xMaxIndex+1]            
+                elif dimName == yDimension:                
+                    ncCoordVarData = ncCoordVar[yMinIndex:yMaxIndex+1]                
+                elif dimName in levelDimNames:
+                    ncCoordVarData = ncCoordVar[levelStart:]
+                else:
+                    ncCoordVarData = ncCoordVar[:]
                 
-            #5.2.1 Create coordinate variable in outnetCDFfile           
-            outNcCoordVar = outNetCDFFile.createVariable(dimName, 'f4', (dimName,), fill_value = -3.4028235e+38)
+                #5.2.1 Create coordinate variable in outnetCDFfile           
+                outNcCoordVar = outNetCDFFile.createVariable(dimName, 'f4', (dimName,), fill_value = -3.4028235e+38)
                 
-            outNcCoordVar[:] = ncCoordVarData
-            CoordVarAttributes = dir(ncCoordVar) 
-            for CoordVarAttrib in CoordVarAttributes:
-                if CoordVarAttrib not in ['assignValue', 'getValue', 'typecode', 'coordinates', '_FillValue', '__array__', '__class__', '__delattr__', '__delitem__', '__dir__', '__doc__', 
-                '__eq__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__len__', 
-                '__lt__', '__ne__', '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 
-                '__unicode__', '_assign_vlen', '_check_safecast', '_cmptype', '_enumtype', '_get', '_getdims', '_getname', '_grp', '_grpid', '_has_lsd', '_iscompound', '_isenum', 
-                '_isprimitive', '_isvlen', '_name', '_ncstring_attrs__', '_nunlimdim', '_pack', '_put', '_toma', '_use_get_vars', '_varid', '_vltype', 'always_mask', 
-                'chartostring', 'chunking', 'datatype', 'delncattr', 'dimensions', 'dtype', 'endian', 'filters', 'getValue', 'get_dims', 'get_var_chunk_cache', 'getncattr', 
-                'group', 'mask', 'name', 'ncattrs', 'ndim', 'renameAttribute', 'scale', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale', 
-                'set_collective', 'set_ncstring_attrs', 'set_var_chunk_cache', 'setncattr', 'setncattr_string', 'setncatts','shape', 'size', 'use_nc_get_vars']:
-                    CoordAttribValue = netCDF4.Variable.getncattr(ncCoordVar, CoordVarAttrib)
-                    netCDF4.Variable.setncattr(outNcCoordVar, CoordVarAttrib, CoordAttribValue)
-    arcpy.AddMessage("... writing dimensions and coordinate variables")
+                outNcCoordVar[:] = ncCoordVarData
+                CoordVarAttributes = dir(ncCoordVar) 
+                for CoordVarAttrib in CoordVarAttributes:
+                    if CoordVarAttrib not in ['assignValue', 'getValue', 'typecode', 'coordinates', '_FillValue', '__array__', '__class__', '__delattr__', '__delitem__', '__dir__', '__doc__', 
+                    '__eq__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__len__', 
+                    '__lt__', '__ne__', '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 
+                    '__unicode__', '_assign_vlen', '_check_safecast', '_cmptype', '_enumtype', '_get', '_getdims', '_getname', '_grp', '_grpid', '_has_lsd', '_iscompound', '_isenum', 
+                    '_isprimitive', '_isvlen', '_name', '_ncstring_attrs__', '_nunlimdim', '_pack', '_put', '_toma', '_use_get_vars', '_varid', '_vltype', 'always_mask', 
+                    'chartostring', 'chunking', 'datatype', 'delncattr', 'dimensions', 'dtype', 'endian', 'filters', 'getValue', 'get_dims', 'get_var_chunk_cache', 'getncattr', 
+                    'group', 'mask', 'name', 'ncattrs', 'ndim', 'renameAttribute', 'scale', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale', 
+                    'set_collective', 'set_ncstring_attrs', 'set_var_chunk_cache', 'setncattr', 'setncattr_string', 'setncatts','shape', 'size', 'use_nc_get_vars']:
+                        CoordAttribValue = netCDF4.Variable.getncattr(ncCoordVar, CoordVarAttrib)
+                        netCDF4.Variable.setncattr(outNcCoordVar, CoordVarAttrib, CoordAttribValue)
+        arcpy.AddMessage("... writing dimensions and coordinate variables")
 
 
     #6.0 Get the netCDF variable objects
     for varName in ncVarName:
         ncVar = inNetCDFFile.variables[varName]
-        ncVarData = ncVar[:]    
         ncVarShape = ncVar.shape
-        ncVarRank = len(ncVarData.shape)
+        ncVarRank = len(ncVarShape)
         ncVarDimNames = ncVar.dimensions 
         
         #6.1 Check if X, Y dimensions exist
@@ -284,71 +460,88 @@ def ClipNetCDFMultiVar(inNetCDFFileName, ncVarName, xDimension, yDimension, xyEx
         #6.2 Get dimension names of the specified variable and find out X Y dimension indices
         xDimensionIndex = list(ncVarDimNames).index(xDimension)
         yDimensionIndex = list(ncVarDimNames).index(yDimension)
+        zDimensionIndex = None
+        for dimName in levelDimNames:
+            if dimName in ncVarDimNames:
+                zDimensionIndex = list(ncVarDimNames).index(dimName)
+        unionLevelStart = min(regionLevelStarts)
         
-        #6.3 Create variable in outnetCDFfile 
-        outNcVar = outNetCDFFile.createVariable(varName, 'f4', ncVarDimNames, fill_value = -3.4028235e+38)    
-        outNcVar[:] = getSlice(ncVarData, xMinIndex, yMinIndex, xMaxIndex, yMaxIndex,xDimensionIndex, yDimensionIndex, ncVarRank)
+        #6.3 Create variable in every outnetCDFfile 
+        outNcVars = [outNetCDFFile.createVariable(varName, 'f4', ncVarDimNames, fill_value = -3.4028235e+38) for outNetCDFFile in outNetCDFFiles]
+
+        #6.4 Read the union hyperslab in latitude bands (see TileProcessing.py) and write the rows of every region
+        for tile in latitude_tiles(yUnionSize):
+            ncVarData = getSlice(ncVar, xUnionMinIndex, yUnionMinIndex + tile.start, xUnionMaxIndex, yUnionMinIndex + tile.stop - 1, 
+                                    xDimensionIndex, yDimensionIndex, ncVarRank, zDimensionIndex, unionLevelStart)
+            for outNcVar, indices, levelStart in zip(outNcVars, regionIndices, regionLevelStarts):
+                [rows, regionData] = getRegionTile(ncVarData, tile, unionIndices, indices, xDimensionIndex, yDimensionIndex, ncVarRank, 
+                                                    zDimensionIndex, levelStart - unionLevelStart)
+                if rows is None:     # Region does not intersect the tile
+                    continue
+                outNcVar[tile_index(ncVarDimNames, rows, yDimension)] = regionData
         arcpy.AddMessage("... writing variable " + varName)
 
-        #6.4 Get variable attributes, write all except 'coordinates'
-        #    Also determine if grid_mapping exists or not
-        bGridMappingExists = False
-        ncGridMappingVarName = ""
-        allAttributes = dir(ncVar)
-
-        for attrib in allAttributes:
-            if attrib not in ['assignValue', 'getValue', 'typecode', 'coordinates', '_FillValue', '__array__', '__class__', '__delattr__', '__delitem__', '__dir__', '__doc__', 
-                    '__eq__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__len__', 
-                    '__lt__', '__ne__', '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 
-                    '__unicode__', '_assign_vlen', '_check_safecast', '_cmptype', '_enumtype', '_get', '_getdims', '_getname', '_grp', '_grpid', '_has_lsd', '_iscompound', '_isenum', 
-                    '_isprimitive', '_isvlen', '_name', '_ncstring_attrs__', '_nunlimdim', '_pack', '_put', '_toma', '_use_get_vars', '_varid', '_vltype', 'always_mask', 
-                    'chartostring', 'chunking', 'datatype', 'delncattr', 'dimensions', 'dtype', 'endian', 'filters', 'getValue', 'get_dims', 'get_var_chunk_cache', 'getncattr', 
-                    'group', 'mask', 'name', 'ncattrs', 'ndim', 'renameAttribute', 'scale', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale', 
-                    'set_collective', 'set_ncstring_attrs', 'set_var_chunk_cache', 'setncattr', 'setncattr_string', 'setncatts','shape', 'size', 'use_nc_get_vars']:
-                attribValue = netCDF4.Variable.getncattr(ncVar, attrib)
-                netCDF4.Variable.setncattr(outNcVar, attrib, attribValue)
-                if attrib == "grid_mapping":
-                    bGridMappingExists = True
-                    ncGridMappingVarName = attribValue
-
-        arcpy.AddMessage("... writing variable attributes for " + varName)
+        for outNetCDFFile, outNcVar in zip(outNetCDFFiles, outNcVars):
+            #6.5 Get variable attributes, write all except 'coordinates'
+            #    Also determine if grid_mapping exists or not
+            bGridMappingExists = False
+            ncGridMappingVarName = ""
+            allAttributes = dir(ncVar)
+
+            for attrib in allAttributes:
+                if attrib not in ['assignValue', 'getValue', 'typecode', 'coordinates', '_FillValue', '__array__', '__class__', '__delattr__', '__delitem__', '__dir__', '__doc__', 
+                        '__eq__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__len__', 
+                        '__lt__', '__ne__', '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__setitem__', '__sizeof__', '__str__', '__subclasshook__', 
+                        '__unicode__', '_assign_vlen', '_check_safecast', '_cmptype', '_enumtype', '_get', '_getdims', '_getname', '_grp', '_grpid', '_has_lsd', '_iscompound', '_isenum', 
+                        '_isprimitive', '_isvlen', '_name', '_ncstring_attrs__', '_nunlimdim', '_pack', '_put', '_toma', '_use_get_vars', '_varid', '_vltype', 'always_mask', 
+                        'chartostring', 'chunking', 'datatype', 'delncattr', 'dimensions', 'dtype', 'endian', 'filters', 'getValue', 'get_dims', 'get_var_chunk_cache', 'getncattr', 
+                        'group', 'mask', 'name', 'ncattrs', 'ndim', 'renameAttribute', 'scale', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale', 
+                        'set_collective', 'set_ncstring_attrs', 'set_var_chunk_cache', 'setncattr', 'setncattr_string', 'setncatts','shape', 'size', 'use_nc_get_vars']:
+                    attribValue = netCDF4.Variable.getncattr(ncVar, attrib)
+                    netCDF4.Variable.setncattr(outNcVar, attrib, attribValue)
+                    if attrib == "grid_mapping":
+                        bGridMappingExists = True
+                        ncGridMappingVarName = attribValue
+
+            arcpy.AddMessage("... writing variable attributes for " + varName)
         
         
-        #6.5 Get grid_mapping variable object if exists
-        if bGridMappingExists:
-            ncGridMappingVar = inNetCDFFile.variables[ncGridMappingVarName]        
-            ncGridMappingVarShape = ncGridMappingVar.shape        
-            ncGridMappingVarDimNames = ncGridMappingVar.dimensions      
+            #6.6 Get grid_mapping variable object if exists
+            if bGridMappingExists:
+                ncGridMappingVar = inNetCDFFile.variables[ncGridMappingVarName]        
+                ncGridMappingVarShape = ncGridMappingVar.shape        
+                ncGridMappingVarDimNames = ncGridMappingVar.dimensions      
             
-            #6.5.1 Create grid mapping variable in outnetCDFfile 
-            outNcGridMappingVar = outNetCDFFile.createVariable(ncGridMappingVarName, ncGridMappingVar.dtype, ncGridMappingVarDimNames)   
-            allGridMappingAttributes = dir(ncGridMappingVar)
-            for gridmappingattrib in allGridMappingAttributes:
-                if gridmappingattrib not in ['assignValue', 'getValue', 'typecode']:
-                    gridmappingAttribValue = getattr(ncGridMappingVar, gridmappingattrib)
-                    setattr(outNcGridMappingVar, gridmappingattrib, gridmappingAttribValue)
-            arcpy.AddMessage("... writing grid_mapping for " + varName)
+                #6.6.1 Create grid mapping variable in outnetCDFfile 
+                outNcGridMappingVar = outNetCDFFile.createVariable(ncGridMappingVarName, ncGridMappingVar.dtype, ncGridMappingVarDimNames)   
+                allGridMappingAttributes = dir(ncGridMappingVar)
+                for gridmappingattrib in allGridMappingAttributes:
+                    if gridmappingattrib not in ['assignValue', 'getValue', 'typecode']:
+                        gridmappingAttribValue = getattr(ncGridMappingVar, gridmappingattrib)
+                        setattr(outNcGridMappingVar, gridmappingattrib, gridmappingAttribValue)
+                arcpy.AddMessage("... writing grid_mapping for " + varName)
 
     #7.0 Write all global attributes
-    globalAllAtributes = dir(inNetCDFFile)
-    for globalAttribute in globalAllAtributes:
-        if globalAttribute not in ['close', 'createDimension', 'createVariable', 'flush', 'sync', '__class__', '__delattr__', '__dir__', '__doc__', '__enter__', '__eq__', 
-        '__exit__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__lt__', '__ne__', 
-        '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__sizeof__', '__str__', '__subclasshook__', '__unicode__', '_close', 
-        '_close_mem', '_enddef', '_getname', '_grpid', '_isopen', '_ncstring_attrs__', '_redef', 'cmptypes', 'createCompoundType', 'createDimension', 'createEnumType', 'createGroup', 'createVLType',
-        'data_model', 'delncattr', 'dimensions', 'disk_format', 'enumtypes', 'file_format','filepath', 'get_variables_by_attributes', 'getncattr', 'groups', 'isopen', 'keepweakref', 'name', 'ncattrs',
-        'parent', 'path', 'renameAttribute', 'renameDimension', 'renameGroup', 'renameVariable', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale',
-        'set_fill_off','set_fill_on', 'set_ncstring_attrs', 'setncattr', 'setncattr_string', 'setncatts', 'variables','vltypes','fromcdl','tocdl']:
-            globalAttributeValue = netCDF4.Dataset.getncattr(inNetCDFFile, globalAttribute)
-            netCDF4.Dataset.setncattr(outNetCDFFile, globalAttribute, globalAttributeValue)
-    arcpy.AddMessage("... writing global attributes")
+    for outNetCDFFile in outNetCDFFiles:
+        globalAllAtributes = dir(inNetCDFFile)
+        for globalAttribute in globalAllAtributes:
+            if globalAttribute not in ['close', 'createDimension', 'createVariable', 'flush', 'sync', '__class__', '__delattr__', '__dir__', '__doc__', '__enter__', '__eq__', 
+            '__exit__', '__format__', '__ge__', '__getattr__', '__getattribute__', '__getitem__', '__gt__', '__hash__', '__init__', '__init_subclass__', '__le__', '__lt__', '__ne__', 
+            '__new__', '__orthogonal_indexing__', '__reduce__', '__reduce_ex__', '__repr__', '__setattr__', '__sizeof__', '__str__', '__subclasshook__', '__unicode__', '_close', 
+            '_close_mem', '_enddef', '_getname', '_grpid', '_isopen', '_ncstring_attrs__', '_redef', 'cmptypes', 'createCompoundType', 'createDimension', 'createEnumType', 'createGroup', 'createVLType',
+            'data_model', 'delncattr', 'dimensions', 'disk_format', 'enumtypes', 'file_format','filepath', 'get_variables_by_attributes', 'getncattr', 'groups', 'isopen', 'keepweakref', 'name', 'ncattrs',
+            'parent', 'path', 'renameAttribute', 'renameDimension', 'renameGroup', 'renameVariable', 'set_always_mask', 'set_auto_chartostring', 'set_auto_mask', 'set_auto_maskandscale', 'set_auto_scale',
+            'set_fill_off','set_fill_on', 'set_ncstring_attrs', 'setncattr', 'setncattr_string', 'setncatts', 'variables','vltypes','fromcdl','tocdl']:
+                globalAttributeValue = netCDF4.Dataset.getncattr(inNetCDFFile, globalAttribute)
+                netCDF4.Dataset.setncattr(outNetCDFFile, globalAttribute, globalAttributeValue)
+        arcpy.AddMessage("... writing global attributes")
     
     #8.0 Syncronize and close netCDF files
-    outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    for outNetCDFFile, regionName in zip(outNetCDFFiles, regionNames):
+        outNetCDFFile.sync()    
+        close_stage_file(outNetCDFFile, unique_names[regionName])
     inNetCDFFile.close()
     
     arcpy.AddMessage('END Clipping NetCDF File\n\n')
 
-    return unique_name
-       
\ No newline at end of file
+    return unique_names
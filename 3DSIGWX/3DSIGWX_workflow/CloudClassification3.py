@@ -24,12 +24,33 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from TileProcessing import *
+from StageHandoff import *
+from ClassifierEngine import *
+from IsosurfaceMesh import get_okta_color
+
+
+# Rule table CLC [%] -> Okta (see ClassifierEngine.py)
+# If CLC = 0% the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
+CloudClassificationRules = [
+    [0, {'CLC': (0, 6.25, "neither")}],
+    [1, {'CLC': (6.25, 18.75, "left")}],
+    [2, {'CLC': (18.75, 31.25, "left")}],
+    [3, {'CLC': (31.25, 43.75, "left")}],
+    [4, {'CLC': (43.75, 56.25, "left")}],
+    [5, {'CLC': (56.25, 68.75, "left")}],
+    [6, {'CLC': (68.75, 81.25, "left")}],
+    [7, {'CLC': (81.25, 93.75, "left")}],
+    [8, {'CLC': (93.75, 100, "both")}],
+]
+
 
 
 def cloud_classification(CLCData):
     """
         Function Description: 
-        Classifying the CLC value at each (t,z,lat,lon)-Datapoint to a Okta value. 
+        Classifying the CLC value at each (t,z,lat,lon)-Datapoint to a Okta value
+        with the rule table "CloudClassificationRules". 
 
         Parameters
         ----------
@@ -42,50 +63,38 @@ def cloud_classification(CLCData):
             Classified CLC values
     """
     fill_value = -3.4028235e+38
-    
-    CLCData = np.array(CLCData)
-    shapeCLCData = np.shape(CLCData)
-    shapeCLCData = tuple(shapeCLCData) 
-
-    outVariableData = np.empty(shapeCLCData)    # Create empty output array
 
     arcpy.AddMessage('... Classifying Data')
     # Classify CLC Values to Categories 
-    for time in range(shapeCLCData[0]):
-        for zcoord in range(shapeCLCData[1]):
-            arcpy.AddMessage('    Z-Coordinate: ' + str(zcoord))
-            for i in range(shapeCLCData[2]):   # latitude
-                for j in range(shapeCLCData[3]): # longitude 
-                    if (CLCData[time, zcoord, i, j] > 0) & (CLCData[time, zcoord, i, j] < 6.25):
-                        outVariableData[time, zcoord, i, j] = 0
-                    
-                    elif (CLCData[time, zcoord, i, j] >= 6.25) & (CLCData[time, zcoord, i, j] < 18.75):
-                        outVariableData[time, zcoord, i, j] = 1
-
-                    elif (CLCData[time, zcoord, i, j] >= 18.75) & (CLCData[time, zcoord, i, j] < 31.25):
-                        outVariableData[time, zcoord, i, j] = 2
-
-                    elif (CLCData[time, zcoord, i, j] >= 31.25) & (CLCData[time, zcoord, i, j] < 43.75):
-                        outVariableData[time, zcoord, i, j] = 3
-
-                    elif (CLCData[time, zcoord, i, j] >= 43.75 ) & (CLCData[time, zcoord, i, j] < 56.25):
-                        outVariableData[time, zcoord, i, j] = 4
-
-                    elif (CLCData[time, zcoord, i, j] >= 56.25) & (CLCData[time, zcoord, i, j] < 68.75):
-                        outVariableData[time, zcoord, i, j] = 5
+    outVariableData = apply_rule_table(CloudClassificationRules, {'CLC': CLCData}, fill_value)
+    
+    return outVariableData
 
-                    elif (CLCData[time, zcoord, i, j] >= 68.75) & (CLCData[time, zcoord, i, j] < 81.25):
-                        outVariableData[time, zcoord, i, j] = 6
 
-                    elif (CLCData[time, zcoord, i, j] >= 81.25) & (CLCData[time, zcoord, i, j] < 93.75):
-                        outVariableData[time, zcoord, i, j] = 7
+def get_cloud_isosurfaces(CloudClasses):
+    """
+        Function Description: 
+        Defines the isosurfaces of the CLC for the isosurface meshes (see IsosurfaceMesh.py):
+        the lower bound of the okta class in the rule table "CloudClassificationRules" and the
+        color of the class in the web app (white to grey, more opaque for higher classes).
 
-                    elif (CLCData[time, zcoord, i, j] >= 93.75) & (CLCData[time, zcoord, i, j] <= 100):
-                        outVariableData[time, zcoord, i, j] = 8
-                    else:
-                        outVariableData[time, zcoord, i, j] = fill_value    # If CLC = 0% the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
-    
-    return outVariableData
+        Parameters
+        ----------
+        CloudClasses: list
+            Okta classes (1 - 8, the lower bound of class 0 would enclose the whole domain)
+        
+        Returns
+        -------
+        IsoSurfaces: list
+            [surface name, CLC isovalue, color (red, green, blue, alpha)] per okta class
+    """
+    IsoSurfaces = []
+    for [okta, conditions] in CloudClassificationRules:
+        if okta in CloudClasses:
+            if conditions['CLC'][0] <= 0:
+                raise Exception("Invalid isosurface cloud class " + str(okta) + ", the lower bound of the class encloses the whole domain")
+            IsoSurfaces.append([str(okta) + "Oktas", conditions['CLC'][0], get_okta_color(okta)])
+    return IsoSurfaces
 
                 
 
@@ -121,7 +130,7 @@ def CloudClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     msgInvalidParameters = "Invalid number of parameters."
     ErrorDesc = "error while running"
     
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name      
     ncVarCLC = 'CLC'
     outVarCloud = 'CloudClassification'
@@ -130,7 +139,7 @@ def CloudClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 1. Import NetCDF Input File with CLC Values
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
     ncDimNames = inNetCDFFile.dimensions.keys()
     ncDimNames = list(ncDimNames) 
@@ -158,14 +167,12 @@ def CloudClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     # 2. Extract CLC Values from netCDF Input File
     # 2.1 Get netCDF CLC variable object
     ncVarCLCObj = inNetCDFFile.variables[ncVarCLC]
-    ncVarCLCData = inNetCDFFile.variables[ncVarCLC][:]
 
     
-    # 3. Classification of CLC Values 
-    classifiedVariableData = cloud_classification(ncVarCLCData)
+    # 3. Classification of CLC Values (tile by tile when writing the output variable, see 6.)
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4_CLASSIC')
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')
 
 
     # 5. Create Dimensions
@@ -218,7 +225,10 @@ def CloudClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     # 6. Create Variable CloudClassification with new classified values
     ncVarCloudDim = list(inNetCDFFile.variables[ncVarCLC].dimensions)
     outNcVar = outNetCDFFile.createVariable(outVarCloud, 'f4', (ncVarCloudDim), fill_value = -3.4028235e+38)
-    outNcVar[:, :, :, :] = classifiedVariableData[:]                    
+    for tile in latitude_tiles(len(inNetCDFFile.dimensions[yDimension])):     # Classify and write in latitude bands (see TileProcessing.py)
+        ncVarCLCData = ncVarCLCObj[tile_index(ncVarCloudDim, tile, yDimension)]
+        classifiedVariableData = cloud_classification(ncVarCLCData)
+        outNcVar[tile_index(ncVarCloudDim, tile, yDimension)] = classifiedVariableData[:]                    
 
     # 7. Get Variable Attributes and assign to new outVariable
         #    Also determine if grid_mapping exists or not
@@ -276,7 +286,7 @@ def CloudClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 10. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
 
     arcpy.AddMessage('END Classifying Cloud Area Fraction\n\n')
@@ -0,0 +1,260 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  CloudPyramid
+ Source Name:       CloudPyramid.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file (CloudClassification)
+                    Coarsening factors (e.g. 2,4,8)
+
+ Description:       Multi-resolution pyramid of the okta grid of the CloudClassification.
+                    Every level coarsens the columns by a factor (e.g. 2x2, 4x4 and 8x8
+                    grid points) and pairs the Z levels. The cells of a level hold the
+                    block maximum (variable CloudClassification, thus the layers can be
+                    drawn with the renderer of the full resolution) and the block mean
+                    (CloudClassificationMean) of the classified cells in the block.
+                    All levels are computed in a single pass over the full resolution cube:
+                    the first level reduces the cube with strided reshapes to block sums,
+                    counts and maxima, every further level reduces the sums, counts and
+                    maxima of the previous level (same result as from the full resolution).
+                    Every level is written to its own NetCDF file, which can be published
+                    as separate layer (overview at national scale).
+
+                    Usage: python CloudPyramid.py NetCDF-file [factors]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, time
+from netCDF4 import Dataset
+import netCDF4
+
+from MergeManifest import open_merged_file, iterate_merged_timesteps
+
+
+# Coarsening factors of the columns (see set_cloud_pyramid, no pyramid if empty) and of the Z levels
+pyramidSettings = {"factors": [], "zFactor": 2}
+
+
+def set_cloud_pyramid(Factors, zFactor = 2):
+    """
+        Function Description:
+        Defines the levels of the cloud pyramid.
+
+        Parameters
+        ----------
+        Factors: list
+            Coarsening factors of the columns (e.g. [2, 4, 8]), every factor must be a
+            multiple of the previous one. No pyramid is created if empty
+        zFactor: int
+            Number of Z levels merged to one level (for all pyramid levels)
+
+        Returns
+        -------
+
+    """
+    Factors = sorted(set(int(factor) for factor in (Factors or [])))
+    for previousFactor, factor in zip([1] + Factors, Factors):
+        if previousFactor < 1 or factor % previousFactor != 0:
+            raise Exception("Invalid cloud pyramid factors " + str(Factors) + ", every factor must be a multiple of the previous one")
+    pyramidSettings["factors"] = Factors
+    pyramidSettings["zFactor"] = max(int(zFactor), 1)
+
+
+def reduce_blocks(Data, blockShape, padValue, reduction):
+    """
+        Function Description:
+        Reduces the blocks of the last axes of an array with a strided reshape. The axes are
+        padded to a multiple of the block size first.
+
+        Parameters
+        ----------
+        Data: array
+            Input array (the block shape applies to the last axes)
+        blockShape: tuple
+            Size of the blocks along the last axes
+        padValue: float
+            Value of the padded cells (neutral element of the reduction)
+        reduction: function
+            Reduction of the blocks (e.g. np.sum, np.max)
+
+        Returns
+        -------
+        reducedData: array
+            Reduced array (one value per block)
+    """
+    leadingShape = Data.shape[:Data.ndim - len(blockShape)]
+    blockedShape = Data.shape[Data.ndim - len(blockShape):]
+    padding = [(0, 0)] * len(leadingShape) + [(0, -size % block) for size, block in zip(blockedShape, blockShape)]
+    if any(after for _, after in padding):
+        Data = np.pad(Data, padding, constant_values = padValue)
+    reshapedShape = list(leadingShape)
+    for size, block in zip(Data.shape[len(leadingShape):], blockShape):
+        reshapedShape += [size // block, block]
+    blockAxes = tuple(len(leadingShape) + 2 * axis + 1 for axis in range(len(blockShape)))
+    return reduction(Data.reshape(reshapedShape), axis = blockAxes)
+
+
+def build_class_pyramid(ClassData, factors, zFactor = 2):
+    """
+        Function Description:
+        Computes the block maximum and block mean of the classified cells for every level of
+        the pyramid in a single pass over the full resolution cube.
+
+        Parameters
+        ----------
+        ClassData: masked array
+            Class values (..., Z, latitude, longitude), masked cells are not classified
+        factors: list
+            Coarsening factors of the columns, ascending, every factor a multiple of the previous
+        zFactor: int
+            Number of Z levels merged to one level
+
+        Returns
+        -------
+        levels: list
+            [factor, block maximum, block mean] per level (masked where no cell is classified)
+    """
+    valid = ~np.ma.getmaskarray(ClassData)
+    Data = np.ma.getdata(ClassData)
+    Sums = np.where(valid, Data, 0).astype(np.float64)
+    Counts = valid.astype(np.int32)
+    Maxima = np.where(valid, Data, -np.inf).astype(np.float64)
+
+    levels = []
+    previousFactor = 1
+    zStep = zFactor
+    for factor in factors:
+        blockShape = (zStep, factor // previousFactor, factor // previousFactor)
+        Sums = reduce_blocks(Sums, blockShape, 0, np.sum)
+        Counts = reduce_blocks(Counts, blockShape, 0, np.sum)
+        Maxima = reduce_blocks(Maxima, blockShape, -np.inf, np.max)
+        empty = Counts == 0
+        levels.append([factor, np.ma.masked_array(Maxima, mask = empty), np.ma.masked_array(Sums / np.maximum(Counts, 1), mask = empty)])
+        previousFactor = factor
+        zStep = 1
+    return levels
+
+
+def coarsen_coordinates(Coordinates, factor):
+    """
+        Function Description:
+        Computes the coordinates of the blocks (mean of the coordinates in the block, the
+        last block may be smaller).
+
+        Parameters
+        ----------
+        Coordinates: array
+            Coordinates of a dimension
+        factor: int
+            Block size
+
+        Returns
+        -------
+        blockCoordinates: array
+            Coordinates of the blocks
+    """
+    Coordinates = np.asarray(Coordinates, dtype = np.float64)
+    sums = reduce_blocks(Coordinates, (factor,), 0, np.sum)
+    counts = reduce_blocks(np.ones(len(Coordinates)), (factor,), 0, np.sum)
+    return sums / counts
+
+
+def CreateCloudPyramid(inNetCDFFileName, DimensionNames, VariableName, current_geodatabase, LayerName, Timestamp, factors = None):
+    """
+        Function Description:
+        Writes the levels of the pyramid of a classified NetCDF file to one NetCDF file per
+        level (dimensions, attributes and grid mapping as in the input file). The time steps
+        are processed one after the other.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to merged NetCDF file or manifest of a virtual merge (.json)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        VariableName: string
+            Name of the classified variable (e.g. CloudClassification)
+        current_geodatabase: string
+            Path to the folder of the output files
+        LayerName: string
+            Name of Layer (corresponds to Meteorological Parameter)
+        Timestamp: string
+            Timestamp of the current NetCDF file
+        factors: list
+            Coarsening factors of the columns (None uses the factors of set_cloud_pyramid)
+
+        Returns
+        -------
+        pyramidFiles: list
+            [level layer name (e.g. Clouds2x), path to NetCDF file] per level
+    """
+    if isinstance(VariableName, (list, tuple)):
+        [VariableName] = VariableName
+    if factors is None:
+        factors = pyramidSettings["factors"]
+    zFactor = pyramidSettings["zFactor"]
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    inNetCDFFile = open_merged_file(inNetCDFFileName)
+    ncVar = inNetCDFFile.variables[VariableName]
+    varAttributes = {attrib: ncVar.getncattr(attrib) for attrib in ncVar.ncattrs() if attrib != '_FillValue'}
+
+    # 1. Create the output file of every level (dimensions, coordinates and attributes)
+    pyramidFiles = []
+    outNetCDFFiles = []
+    for factor in factors:
+        levelName = LayerName + str(factor) + "x"
+        outNetCDFFileName = os.path.join(current_geodatabase, Timestamp + "_" + levelName + "_pyramid.nc").replace(os.sep, '/')
+        outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4')
+        blockFactors = {timeDimension: 1, zDimension: zFactor, yDimension: factor, xDimension: factor}
+        for dimName in ncVar.dimensions:
+            outNetCDFFile.createDimension(dimName, None if dimName == timeDimension else -(-len(inNetCDFFile.dimensions[dimName]) // blockFactors[dimName]))
+            if dimName in inNetCDFFile.variables:
+                ncCoordVar = inNetCDFFile.variables[dimName]
+                outNcCoordVar = outNetCDFFile.createVariable(dimName, 'f4', (dimName,), fill_value = -3.4028235e+38)
+                if dimName != timeDimension:
+                    outNcCoordVar[:] = coarsen_coordinates(np.ma.getdata(ncCoordVar[:]), blockFactors[dimName])
+                outNcCoordVar.setncatts({attrib: ncCoordVar.getncattr(attrib) for attrib in ncCoordVar.ncattrs() if attrib != '_FillValue'})
+        for outVarName, longName in [[VariableName, "block maximum"], [VariableName + "Mean", "block mean"]]:
+            outNcVar = outNetCDFFile.createVariable(outVarName, 'f4', ncVar.dimensions, fill_value = -3.4028235e+38)
+            outNcVar.setncatts(varAttributes)
+            outNcVar.setncattr("cell_methods", "Z: latitude: longitude: " + ("maximum" if outVarName == VariableName else "mean"))
+            outNcVar.setncattr("pyramid_level", levelName + " (" + longName + " of " + str(factor) + "x" + str(factor) + " columns and " + str(zFactor) + " Z levels)")
+        if "grid_mapping" in varAttributes and varAttributes["grid_mapping"] in inNetCDFFile.variables:
+            ncGridMappingVar = inNetCDFFile.variables[varAttributes["grid_mapping"]]
+            outNcGridMappingVar = outNetCDFFile.createVariable(ncGridMappingVar.name, ncGridMappingVar.dtype, ncGridMappingVar.dimensions)
+            outNcGridMappingVar.setncatts({attrib: ncGridMappingVar.getncattr(attrib) for attrib in ncGridMappingVar.ncattrs()})
+        outNetCDFFile.setncatts({attrib: inNetCDFFile.getncattr(attrib) for attrib in inNetCDFFile.ncattrs()})
+        pyramidFiles.append([levelName, outNetCDFFileName])
+        outNetCDFFiles.append(outNetCDFFile)
+
+    # 2. Compute all levels of a time step at once and write them to the output files
+    hasTimeVariable = timeDimension in inNetCDFFile.variables
+    for timeStep, timeValue, [ClassData] in iterate_merged_timesteps(inNetCDFFileName, [VariableName], True, timeDimension):
+        levels = build_class_pyramid(ClassData, factors, zFactor)
+        for outNetCDFFile, [factor, blockMaximum, blockMean] in zip(outNetCDFFiles, levels):
+            outNetCDFFile.variables[VariableName][timeStep] = blockMaximum
+            outNetCDFFile.variables[VariableName + "Mean"][timeStep] = blockMean
+            if hasTimeVariable:
+                outNetCDFFile.variables[timeDimension][timeStep] = timeValue
+
+    for outNetCDFFile in outNetCDFFiles:
+        outNetCDFFile.close()
+    inNetCDFFile.close()
+
+    return pyramidFiles
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    set_cloud_pyramid([int(factor) for factor in sys.argv[2].split(",")] if len(sys.argv) > 2 else [2, 4, 8])
+    [outFolder, inFileName] = os.path.split(os.path.abspath(sys.argv[1]))
+    startTime = time.perf_counter()
+    pyramidFiles = CreateCloudPyramid(sys.argv[1], ['time', 'Z', 'latitude', 'longitude'], 'CloudClassification', outFolder, "Clouds", os.path.splitext(inFileName)[0])
+    for [levelName, outNetCDFFileName] in pyramidFiles:
+        print(levelName + ": " + outNetCDFFileName)
+    print("%d levels written in %.2f s" % (len(pyramidFiles), time.perf_counter() - startTime))
@@ -0,0 +1,237 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  CloudRegions
+ Source Name:       CloudRegions.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file or manifest of a virtual merge (CloudClassification)
+                    Output file (GeoPackage, GeoJSON text sequence or Feature Class)
+
+ Description:       Merging of the classified cloud voxels to cloud regions. The voxels of
+                    the CloudClassification cube with equal okta class which are connected
+                    in 3D (Z, latitude, longitude) are labelled as one region with
+                    scipy.ndimage.label (one labelling pass per okta class and time step).
+                    Every region is written as a single feature at its centroid with the
+                    bounding volume (longitude, latitude, base and top), its size in meters
+                    and the number of voxels, instead of one feature per voxel. Thus a
+                    closed cloud deck results in a few features instead of thousands.
+                    The features are written with the writers of PointExport.py.
+
+                    Usage: python CloudRegions.py NetCDF-file Variable output-file [time]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, time
+from netCDF4 import Dataset
+from scipy import ndimage
+
+from SceneLayerPackage import *
+from MergeManifest import open_merged_file, iterate_merged_timesteps
+
+
+# Merge the cloud voxels to regions (see set_cloud_regions) and neighbourhood of the voxels
+# (1: faces, 2: faces and edges, 3: faces, edges and corners)
+regionSettings = {"enabled": False, "connectivity": 1}
+
+
+def set_cloud_regions(CloudRegions, connectivity = 1):
+    """
+        Function Description:
+        Defines if the Cloud Scene Layer contains one feature per cloud region instead of one
+        feature per classified voxel.
+
+        Parameters
+        ----------
+        CloudRegions: bool
+            If true, the connected voxels of equal okta class are merged to regions
+        connectivity: int
+            Neighbourhood of connected voxels (1: 6, 2: 18, 3: 26 neighbours)
+
+        Returns
+        -------
+
+    """
+    regionSettings["enabled"] = bool(CloudRegions)
+    regionSettings["connectivity"] = min(max(int(connectivity), 1), 3)
+
+
+def label_class_regions(ClassData, connectivity = 1):
+    """
+        Function Description:
+        Labels the connected regions of equal class values in a 3D cube. Each class value
+        is labelled in one vectorized pass (scipy.ndimage.label), the labels of the classes
+        are numbered consecutively.
+
+        Parameters
+        ----------
+        ClassData: masked array
+            Class values (Z, latitude, longitude), masked cells are not part of a region
+        connectivity: int
+            Neighbourhood of connected voxels (1: 6, 2: 18, 3: 26 neighbours)
+
+        Returns
+        -------
+        labels: array
+            Region number of every cell (0 outside of the regions)
+        regionClasses: array
+            Class value of every region (index = region number - 1)
+    """
+    structure = ndimage.generate_binary_structure(3, connectivity)
+    valid = ~np.ma.getmaskarray(ClassData)
+    Data = np.ma.getdata(ClassData)
+    labels = np.zeros(Data.shape, dtype = np.int32)
+    regionClasses = []
+    for classValue in np.unique(Data[valid]):
+        classMask = valid & (Data == classValue)
+        [classLabels, regionCount] = ndimage.label(classMask, structure = structure)
+        labels[classMask] = classLabels[classMask] + len(regionClasses)
+        regionClasses.extend([classValue] * regionCount)
+    return labels, np.array(regionClasses, dtype = np.float64)
+
+
+def get_region_columns(labels, regionClasses, zData, yData, xData):
+    """
+        Function Description:
+        Computes the aggregate values of the labelled regions: centroid, bounding volume,
+        size in meters (voxel edges, not voxel centres) and number of voxels.
+
+        Parameters
+        ----------
+        labels: array
+            Region number of every cell (see label_class_regions)
+        regionClasses: array
+            Class value of every region
+        zData, yData, xData: array
+            Coordinates of the Z, latitude and longitude dimension
+
+        Returns
+        -------
+        regions: dict
+            Columns of the regions (name -> array, one value per region)
+    """
+    regionCount = len(regionClasses)
+    [zIndex, yIndex, xIndex] = np.nonzero(labels)
+    regionIndex = labels[zIndex, yIndex, xIndex] - 1
+
+    # 1. Number of voxels and centroid
+    voxelCount = np.bincount(regionIndex, minlength = regionCount).astype(np.float64)
+    centroids = [np.bincount(regionIndex, weights = coordinates[index], minlength = regionCount) / np.maximum(voxelCount, 1)
+                 for coordinates, index in [(zData, zIndex), (yData, yIndex), (xData, xIndex)]]
+
+    # 2. Bounding volume from the index bounds of the regions
+    bounds = np.zeros((regionCount, 6))
+    for regionNumber, regionSlices in enumerate(ndimage.find_objects(labels, max_label = regionCount)):
+        if regionSlices is None:
+            continue
+        for axis, coordinates in enumerate([zData, yData, xData]):
+            axisCoordinates = coordinates[regionSlices[axis]]
+            bounds[regionNumber, axis] = axisCoordinates.min()
+            bounds[regionNumber, axis + 3] = axisCoordinates.max()
+
+    # 3. Size in meters (including half a voxel on each side)
+    [zSpacing, ySpacing, xSpacing] = [float(np.abs(np.diff(coordinates)).mean()) if len(coordinates) > 1 else 0.0 for coordinates in [zData, yData, xData]]
+    return {"Z": centroids[0],
+            "latitude": centroids[1],
+            "longitude": centroids[2],
+            "VoxelCount": voxelCount,
+            "Base": bounds[:, 0],
+            "Top": bounds[:, 3],
+            "MinLatitude": bounds[:, 1],
+            "MaxLatitude": bounds[:, 4],
+            "MinLongitude": bounds[:, 2],
+            "MaxLongitude": bounds[:, 5],
+            "Width": (bounds[:, 5] - bounds[:, 2] + xSpacing) * MetersPerDegree * np.cos(np.radians(centroids[1])),
+            "Depth": (bounds[:, 4] - bounds[:, 1] + ySpacing) * MetersPerDegree,
+            "Height": bounds[:, 3] - bounds[:, 0] + zSpacing}
+
+
+def extract_cloud_regions(inNetCDFFileName, VariableName, DimensionNames, timeEnabled = False):
+    """
+        Function Description:
+        Merges the classified voxels of a NetCDF file to regions of equal class, time step by
+        time step. Without time the first time step is used (as extract_voxel_points does).
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        VariableName: string
+            Name of the classified variable (e.g. CloudClassification)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        timeEnabled: bool
+            If true, all time steps are merged and the time is added as column
+
+        Returns
+        -------
+        regions: dict
+            Columns of the regions (dimension, variable and aggregate name -> array), the
+            dimension columns hold the centroid, thus the writers of the points can be used
+    """
+    if isinstance(VariableName, (list, tuple)):
+        [VariableName] = VariableName
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+
+    inNetCDFFile = open_merged_file(inNetCDFFileName)
+    zData = np.ma.getdata(inNetCDFFile.variables[zDimension][:]).astype(np.float64)
+    yData = np.ma.getdata(inNetCDFFile.variables[yDimension][:]).astype(np.float64)
+    xData = np.ma.getdata(inNetCDFFile.variables[xDimension][:]).astype(np.float64)
+    inNetCDFFile.close()
+
+    columns = {}
+    for timeStep, timeValue, [ClassData] in iterate_merged_timesteps(inNetCDFFileName, [VariableName], timeEnabled, timeDimension):
+        [labels, regionClasses] = label_class_regions(ClassData, regionSettings["connectivity"])
+        regions = get_region_columns(labels, regionClasses, zData, yData, xData)
+        regions = {**({timeDimension: np.full(len(regionClasses), timeValue)} if timeEnabled else {}),
+                   zDimension: regions.pop("Z"), yDimension: regions.pop("latitude"), xDimension: regions.pop("longitude"),
+                   VariableName: regionClasses, **regions}
+        for name, column in regions.items():
+            columns.setdefault(name, []).append(column)
+
+    return {name: np.concatenate(column).astype(np.float64) for name, column in columns.items()}
+
+
+def export_cloud_regions(inNetCDFFileName, VariableName, DimensionNames, outFileName, timeEnabled = False):
+    """
+        Function Description:
+        Merges the classified voxels to regions and writes them with the writer of the output
+        file (see PointWriters in PointExport.py).
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        VariableName: string
+            Name of the classified variable
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        outFileName: string
+            Path to output file (.gpkg, .geojsons/.geojsonl or Feature Class)
+        timeEnabled: bool
+            If true, all time steps are merged and the time is added as column
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+        regionCount: int
+            Number of exported regions
+    """
+    regions = extract_cloud_regions(inNetCDFFileName, VariableName, DimensionNames, timeEnabled)
+    [LayerName, extension] = os.path.splitext(os.path.basename(outFileName))
+    writer = PointWriters.get(extension.lower(), write_feature_class)
+    writer(regions, outFileName, LayerName, DimensionNames)
+    return [outFileName, len(regions[DimensionNames[3]])]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    timeEnabled = len(sys.argv) > 4 and sys.argv[4].lower() in ("time", "true", "1")
+    startTime = time.perf_counter()
+    [outFileName, regionCount] = export_cloud_regions(sys.argv[1], sys.argv[2], ['time', 'Z', 'latitude', 'longitude'], sys.argv[3], timeEnabled)
+    print("%d regions exported to %s in %.2f s" % (regionCount, outFileName, time.perf_counter() - startTime))
@@ -32,12 +32,16 @@ from importlib import reload
 from HeightAssignment import *
 from CloudClassification3 import *
 from MergeNetCDF import *
+from StageHandoff import *
 from CreateSceneLayer import *
 from ShareSceneLayer import *
+from CloudPyramid import *
+from IsosurfaceMesh import *
+from InstancedSymbols import *
 from arcpy import env
 
 def CloudWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, Timestamp, descriptionDate,
-                    username_arcgis, password_arcgis, timeEnabled = False):
+                    username_arcgis, password_arcgis, timeEnabled = False, heightAssigned = False, appendMerge = False):
     """
         Function Description:   Workflow to classify the cloud coverage according to their CLC
                                 Values in Oktas.
@@ -70,6 +74,12 @@ def CloudWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_fo
             Password of ArcGIS account
         timeEnabled: bool
             If true, time dimension is added to the feature layer
+        heightAssigned: bool
+            If true, the input files are the output of the shared HeightAssignment of all
+            variables and no further interpolation is needed
+        appendMerge: bool
+            If true, the files are appended to an existing merged file of the same Timestamp
+            (e.g. a newly arriving forecast hour) instead of merging all files again
         
         Returns
         -------
@@ -93,25 +103,60 @@ def CloudWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_fo
     
             # 2. HeightAssignment
             ncVarName_HeightAssign = ['CLC']  # variable to be interpolated
-            height_assigned_file = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+            if heightAssigned:
+                height_assigned_file = InFileName     # Already interpolated by the shared HeightAssignment
+            else:
+                height_assigned_file = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+
+            # 2.1 Isosurface meshes (.glb) of the CLC at the lower bound of the okta classes
+            if meshSettings["cloudClasses"]:
+                meshFiles = CreateIsosurfaceMeshes(height_assigned_file, 'CLC', get_cloud_isosurfaces(meshSettings["cloudClasses"]), ['time', 'Z', 'latitude', 'longitude'],
+                                                   os.path.join(tempLayerFolder, "Meshes"), LayerName, Timestamp, counter)
+                arcpy.AddMessage("... " + str(len(meshFiles)) + " isosurface meshes written")
 
             # 3. CloudClassification
             [cloud_classified_file, CloudClassificationVariableName] = CloudClassification(height_assigned_file, current_folder, LayerName, Timestamp)
+            if not heightAssigned:
+                release_stage_files([height_assigned_file])   # Intermediate file is no longer needed
             file_names.append(cloud_classified_file)
             
             counter += 1
         
         # 4. Merging Files
-        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp)
-
-        # 5. Create NetCDF Feature Layer (.lyrx file)
-        outFeatureLayerName = CreateNetCDFFeatureLayer(merged_NetCDFfileName, DimensionNames_mergedFile, CloudClassificationVariableName, current_geodatabase, current_folder, 
-                                                        tempLayerFolder, LayerName, Timestamp, timeEnabled)
+        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp, None, appendMerge)
+        release_stage_files(file_names)
+
+        # 5. Create NetCDF Feature Layer (.lyrx file), or a Layer of the cloud regions (one feature per region of connected voxels)
+        if regionSettings["enabled"]:
+            outFeatureLayerName = CreateCloudRegionLayer(merged_NetCDFfileName, DimensionNames_mergedFile, CloudClassificationVariableName, current_geodatabase,
+                                                         tempLayerFolder, LayerName, Timestamp, timeEnabled)
+        else:
+            outFeatureLayerName = CreateNetCDFFeatureLayer(merged_NetCDFfileName, list(DimensionNames_mergedFile), CloudClassificationVariableName, current_geodatabase, current_folder, 
+                                                            tempLayerFolder, LayerName, Timestamp, timeEnabled)
         
         # 6. Share NetCDF Feature Layer (hosting on ArcGIS Online)
         #       Creates .slpk package file and shares package to ArcGIS Online
         ShareSceneLayerFunction(outFeatureLayerName, tempLayerFolder, LayerName, Timestamp, descriptionDate, username_arcgis, password_arcgis)
 
+        # 7. Pyramid of coarsened okta grids (e.g. Clouds2x, Clouds4x, Clouds8x), every level is shared as its own layer
+        if pyramidSettings["factors"]:
+            arcpy.AddMessage("... creating cloud pyramid with factors " + str(pyramidSettings["factors"]))
+            pyramidFiles = CreateCloudPyramid(merged_NetCDFfileName, DimensionNames_mergedFile, CloudClassificationVariableName, current_folder, LayerName, Timestamp)
+            for [levelName, pyramid_NetCDFfileName] in pyramidFiles:
+                if regionSettings["enabled"]:
+                    levelFeatureLayerName = CreateCloudRegionLayer(pyramid_NetCDFfileName, DimensionNames_mergedFile, CloudClassificationVariableName, current_geodatabase,
+                                                                   tempLayerFolder, levelName, Timestamp, timeEnabled)
+                else:
+                    levelFeatureLayerName = CreateNetCDFFeatureLayer(pyramid_NetCDFfileName, list(DimensionNames_mergedFile), [CloudClassificationVariableName, CloudClassificationVariableName + "Mean"],
+                                                                     current_geodatabase, current_folder, tempLayerFolder, levelName, Timestamp, timeEnabled)
+                ShareSceneLayerFunction(levelFeatureLayerName, tempLayerFolder, levelName, Timestamp, descriptionDate, username_arcgis, password_arcgis)
+
+        # 8. Instanced cloud symbols (.glb) per time step and level band (one draw call per okta class in the web app)
+        if instanceSettings["enabled"]:
+            instanceFiles = CreateInstancedSymbols(merged_NetCDFfileName, CloudClassificationVariableName, get_cloud_symbols(instanceSettings["symbolFolder"]),
+                                                   DimensionNames_mergedFile, os.path.join(tempLayerFolder, "Instances"), LayerName, Timestamp)
+            arcpy.AddMessage("... " + str(len(instanceFiles)) + " instanced symbol batches written")
+
 
         arcpy.AddMessage('SUCCESS: Cloud Classification Workflow ended without interruptions')
     
@@ -0,0 +1,130 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  CoordinateIndex
+ Source Name:       CoordinateIndex.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Coordinate variable (latitude or longitude)
+                    Extent values
+
+ Description:       Resolves the values of an extent to the indices of the nearest grid points
+                    on a coordinate axis (ascending or descending). The nearest value is found 
+                    with a binary search instead of scanning the whole axis. The resolved index 
+                    bounds are kept in memory per coordinate axis (fingerprint of the coordinate 
+                    values) and extent, thus the clipping of further timestamps on the same grid 
+                    does not search again. The cache holds the most recently used bounds only.
+                    
+  
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import hashlib
+from collections import OrderedDict
+
+
+# Resolved index bounds per (coordinate fingerprint, minimum value, maximum value), least recently used first
+extentIndexCache = OrderedDict()
+# Maximum number of entries of the extent index cache
+ExtentCacheEntries = 256
+
+
+def coordinate_fingerprint(CoordinateData):
+    """
+        Function Description:
+        Hash of the coordinate values, used to identify the grid in the extent index cache.
+
+        Parameters
+        ----------
+        CoordinateData: array
+            Values of the coordinate variable
+
+        Returns
+        -------
+        key: string
+            Hexadecimal hash
+    """
+    CoordinateData = np.ascontiguousarray(np.ma.getdata(CoordinateData))
+    keyHash = hashlib.blake2b(digest_size=20)
+    keyHash.update(str((CoordinateData.shape, CoordinateData.dtype.str)).encode())
+    keyHash.update(CoordinateData.tobytes())
+    return keyHash.hexdigest()
+
+
+def nearest_index(CoordinateData, inValue):
+    """
+        Function Description:
+        Get the index of the nearest value to 'inValue' on a monotonic coordinate axis. 
+        Only the two neighbours of the binary search position are compared. If two values are 
+        equally near, the lower value is taken. If no value is nearer than the range of 
+        the axis, -1 is returned (len(CoordinateData) for a descending axis).
+
+        Parameters
+        ----------
+        CoordinateData: array
+            Values of the coordinate variable (ascending or descending)
+        inValue: float
+            Desired Value
+
+        Returns
+        -------
+        int
+            Index of the value which is nearest to 'inValue'
+    """
+    CoordinateData = np.asarray(np.ma.getdata(CoordinateData), dtype=np.float64)
+    nValues = len(CoordinateData)
+    bReverse = CoordinateData[0] > CoordinateData[nValues-1]
+    if bReverse:
+        CoordinateData = CoordinateData[::-1]
+
+    # The nearest value is the last value below or the first value above 'inValue'
+    position = int(np.searchsorted(CoordinateData, inValue, side='left'))
+    vDiff = abs(CoordinateData[nValues-1] - CoordinateData[0])
+    vIndex = -1
+    for candidate in (position - 1, position):
+        if 0 <= candidate < nValues:
+            candidate = int(np.searchsorted(CoordinateData, CoordinateData[candidate], side='left'))     # First of equal values
+            vCurrDiff = abs(inValue - CoordinateData[candidate])
+            if vCurrDiff < vDiff:
+                vDiff = vCurrDiff
+                vIndex = candidate
+    if bReverse:
+        vIndex = nValues - 1 - vIndex
+    return vIndex
+
+
+def get_extent_indices(CoordinateData, vMin, vMax):
+    """
+        Function Description:
+        Resolves the minimum and maximum value of an extent to the index bounds on the 
+        coordinate axis. Already resolved bounds are taken from the extent index cache, 
+        which keeps the last ExtentCacheEntries bounds.
+
+        Parameters
+        ----------
+        CoordinateData: array
+            Values of the coordinate variable (ascending or descending)
+        vMin: float
+            Minimum value of the extent
+        vMax: float
+            Maximum value of the extent
+
+        Returns
+        -------
+        minIndex: int
+            Lower index bound
+        maxIndex: int
+            Upper index bound (inclusive)
+    """
+    key = (coordinate_fingerprint(CoordinateData), float(vMin), float(vMax))
+    if key in extentIndexCache:
+        extentIndexCache.move_to_end(key)
+        return extentIndexCache[key]
+    minIndex = nearest_index(CoordinateData, vMin)
+    maxIndex = nearest_index(CoordinateData, vMax)
+    if minIndex > maxIndex:
+        minIndex, maxIndex = maxIndex, minIndex
+    extentIndexCache[key] = (minIndex, maxIndex)
+    while len(extentIndexCache) > ExtentCacheEntries:
+        extentIndexCache.popitem(last=False)
+    return (minIndex, maxIndex)
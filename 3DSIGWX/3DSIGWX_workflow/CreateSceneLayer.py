@@ -8,7 +8,11 @@
                     Output Temporary SceneLayer
 
  Description:       Function to Create a NetCDF Feature Layer and then a Scene Layer
-                    File (.lyrx)
+                    File (.lyrx). With the sparse point export only the populated voxels
+                    are written to the Feature Class (see PointExport.py). With the native
+                    Scene Layer Package the .slpk file is written directly from the populated
+                    voxels (see SceneLayerPackage.py). CreateCloudRegionLayer writes one feature
+                    per cloud region instead of one per voxel (see CloudRegions.py)
                     
   
 ----------------------------------------------------------------------------------'''
@@ -20,6 +24,50 @@ import numpy as np
 import sys, os, copy
 from netCDF4 import Dataset
 import netCDF4
+from PointExport import *
+from SceneLayerPackage import *
+from CloudRegions import *
+
+
+# Write only the populated voxels to the Feature Class (see set_sparse_point_export) or
+# directly to a Scene Layer Package (see set_native_scene_package)
+pointExportSettings = {"sparse": False, "nativePackage": False}
+
+
+def set_sparse_point_export(SparsePoints):
+    """
+        Function Description:
+        Defines if the Feature Class of the Scene Layer is created from a NetCDF Feature Layer
+        (all voxels) or with the sparse point export (populated voxels only).
+
+        Parameters
+        ----------
+        SparsePoints: bool
+            If true, the sparse point export is used
+
+        Returns
+        -------
+
+    """
+    pointExportSettings["sparse"] = bool(SparsePoints)
+
+
+def set_native_scene_package(NativePackage):
+    """
+        Function Description:
+        Defines if the Scene Layer Package is written directly by the I3S writer (see
+        SceneLayerPackage.py) instead of a Layer File for CreatePointSceneLayerPackage.
+
+        Parameters
+        ----------
+        NativePackage: bool
+            If true, CreateNetCDFFeatureLayer returns the path to a Scene Layer Package (.slpk)
+
+        Returns
+        -------
+
+    """
+    pointExportSettings["nativePackage"] = bool(NativePackage)
 
 
 def CreateNetCDFFeatureLayer (InNetCDFFileName, DimensionNames, VariableName, current_geodatabase, current_projectfolder, temporary_LayerFolder, LayerName, Timestamp, 
@@ -53,7 +101,7 @@ def CreateNetCDFFeatureLayer (InNetCDFFileName, DimensionNames, VariableName, cu
         Returns
         -------
         outFeatureLayerPath: string
-            Path to Scene Layer Package
+            Path to Layer File (without extension) or to Scene Layer Package (.slpk)
     """
 
     arcpy.AddMessage("\nSTART Create Scene Layer")
@@ -64,6 +112,19 @@ def CreateNetCDFFeatureLayer (InNetCDFFileName, DimensionNames, VariableName, cu
     yDimension = DimensionNames[2]
     xDimension = DimensionNames[3]
     
+    pointDimensionNames = [timeDimension, zDimension, yDimension, xDimension]
+
+    # Scene Layer Package written directly from the populated voxels (no NetCDF Feature Layer and Layer File)
+    if pointExportSettings["nativePackage"]:
+        os.makedirs(temporary_LayerFolder, exist_ok=True)
+        outSceneLayerPackage = os.path.join(temporary_LayerFolder, LayerName+ "_" + Timestamp + "_pointFL.slpk")
+        outSceneLayerPackage = outSceneLayerPackage.replace(os.sep, "/")
+        arcpy.AddMessage("... writing Scene Layer Package of populated voxels")
+        [outSceneLayerPackage, pointCount] = CreatePointSceneLayerPackage(InNetCDFFileName, pointDimensionNames, VariableName, outSceneLayerPackage, LayerName, timeEnabled)
+        arcpy.AddMessage("... " + str(pointCount) + " points written")
+        arcpy.AddMessage("END Create Scene Layer\n\n")
+        return outSceneLayerPackage
+
     # 2. Create Input Variables for MakeNetCDFFeatureLayer Function
     inVariables = VariableName
     inXVariable = xDimension
@@ -84,22 +145,29 @@ def CreateNetCDFFeatureLayer (InNetCDFFileName, DimensionNames, VariableName, cu
     valueSelectionMethod = ""
 
 
-    
-    # 3. Create NetCDF Feature Layer with function MakeNetCDFFeatureLayer
-    arcpy.AddMessage("... creating NetCDF Feature Layer")
-    outNetCDFFeatureLayer = arcpy.MakeNetCDFFeatureLayer_md(InNetCDFFileName, inVariables, inXVariable, 
-                                inYVariable, outNetCDFFeatureLayerName, rowDimensions, ZVariable, MVariable, dimensionValues, valueSelectionMethod)
-
-    # 4. Save NetCDF Feature Layer to a .lyrx Layer File
-    # NetCDF Feature Layer can not be stored in a Point Scene Layer directly from a NetCDF Feature Layer .lyrx File
-    # Workaround: 
-    #   - First copy the Feature Class of the NetCDF Feature Layer and store in the current geodatabase. 
-    #   - Then Make a new Point Feature Layer based on the copied Feature Class in the gdb 
-    #   - Save the new Point Feature Layer as a .lyrx Layer File (This .lyrx File can then be used to create a Point Scene Layer in the ShareSceneLayer Function)
     outFeatureClass = os.path.join(current_geodatabase, LayerName+ "_" + Timestamp + "_pointFC")
     outFeatureClass = outFeatureClass.replace(os.sep, "/")
-    arcpy.AddMessage("... copy Feature Class of NetCDF Feature Layer")
-    CopiedFeatureClass = arcpy.CopyFeatures_management(outNetCDFFeatureLayer, out_feature_class=outFeatureClass)
+
+    if pointExportSettings["sparse"]:
+        # 3. Write the populated voxels directly to the Feature Class (see PointExport.py)
+        arcpy.AddMessage("... exporting populated voxels to Feature Class")
+        [outFeatureClass, pointCount] = export_voxel_points(InNetCDFFileName, inVariables, pointDimensionNames, outFeatureClass, timeEnabled)
+        arcpy.AddMessage("... " + str(pointCount) + " points exported")
+    else:
+        # 3. Create NetCDF Feature Layer with function MakeNetCDFFeatureLayer
+        arcpy.AddMessage("... creating NetCDF Feature Layer")
+        outNetCDFFeatureLayer = arcpy.MakeNetCDFFeatureLayer_md(InNetCDFFileName, inVariables, inXVariable, 
+                                    inYVariable, outNetCDFFeatureLayerName, rowDimensions, ZVariable, MVariable, dimensionValues, valueSelectionMethod)
+
+        # 4. Save NetCDF Feature Layer to a .lyrx Layer File
+        # NetCDF Feature Layer can not be stored in a Point Scene Layer directly from a NetCDF Feature Layer .lyrx File
+        # Workaround: 
+        #   - First copy the Feature Class of the NetCDF Feature Layer and store in the current geodatabase. 
+        #   - Then Make a new Point Feature Layer based on the copied Feature Class in the gdb 
+        #   - Save the new Point Feature Layer as a .lyrx Layer File (This .lyrx File can then be used to create a Point Scene Layer in the ShareSceneLayer Function)
+        arcpy.AddMessage("... copy Feature Class of NetCDF Feature Layer")
+        CopiedFeatureClass = arcpy.CopyFeatures_management(outNetCDFFeatureLayer, out_feature_class=outFeatureClass)
+
     outFeatureLayerName = LayerName+ "_" + Timestamp + "_pointFL"
     outFeatureLayerPath = os.path.join(temporary_LayerFolder, outFeatureLayerName)
     outFeatureLayerPath = outFeatureLayerPath.replace(os.sep, "/")
@@ -112,3 +180,71 @@ def CreateNetCDFFeatureLayer (InNetCDFFileName, DimensionNames, VariableName, cu
 
     return outFeatureLayerPath
 
+
+def CreateCloudRegionLayer(InNetCDFFileName, DimensionNames, VariableName, current_geodatabase, temporary_LayerFolder, LayerName, Timestamp, timeEnabled=False):
+    """
+        Function Description:   Merges the connected voxels of equal okta class to cloud regions
+                                (see CloudRegions.py) and writes one feature per region to a
+                                Feature Class and a Scene Layer File (.lyrx), or directly to a
+                                Scene Layer Package with the native Scene Layer Package.
+
+        Parameters
+        ----------
+        InNetCDFFileName: string
+            Path to merged NetCDF file or manifest of a virtual merge (.json)
+        DimensionNames: list
+            List of all NetCDF Dimensions
+        VariableName: string
+            Name of the classified variable (CloudClassification)
+        current_geodatabase: string
+            Path to work GDB
+        temporary_LayerFolder: string
+            Path to Folder, where temporary Scene Layer files are stored
+        LayerName: string
+            Name of Layer (corresponds to Meteorological Parameter)
+        Timestamp: string
+            Timestamp of the current NetCDF file
+        timeEnabled: bool
+            If true, the regions of all time steps are written with the time as field
+
+        Returns
+        -------
+        outFeatureLayerPath: string
+            Path to Layer File (without extension) or to Scene Layer Package (.slpk)
+    """
+
+    arcpy.AddMessage("\nSTART Create Cloud Region Layer")
+
+    # 1. Merge the voxels to regions
+    regionDimensionNames = [DimensionNames[0], DimensionNames[1], DimensionNames[2], DimensionNames[3]]
+    arcpy.AddMessage("... merging connected voxels to regions")
+    regions = extract_cloud_regions(InNetCDFFileName, VariableName, regionDimensionNames, timeEnabled)
+    arcpy.AddMessage("... " + str(len(regions[regionDimensionNames[3]])) + " regions")
+
+    # 2. Scene Layer Package written directly from the regions
+    if pointExportSettings["nativePackage"]:
+        os.makedirs(temporary_LayerFolder, exist_ok=True)
+        outSceneLayerPackage = os.path.join(temporary_LayerFolder, LayerName+ "_" + Timestamp + "_regionFL.slpk")
+        outSceneLayerPackage = outSceneLayerPackage.replace(os.sep, "/")
+        arcpy.AddMessage("... writing Scene Layer Package of cloud regions")
+        write_point_scene_layer_package(regions, outSceneLayerPackage, LayerName, regionDimensionNames)
+        arcpy.AddMessage("END Create Cloud Region Layer\n\n")
+        return outSceneLayerPackage
+
+    # 3. Write the regions to the Feature Class and save a Layer File (.lyrx)
+    outFeatureClass = os.path.join(current_geodatabase, LayerName+ "_" + Timestamp + "_regionFC")
+    outFeatureClass = outFeatureClass.replace(os.sep, "/")
+    arcpy.AddMessage("... writing regions to Feature Class")
+    write_feature_class(regions, outFeatureClass, LayerName, regionDimensionNames)
+
+    outFeatureLayerName = LayerName+ "_" + Timestamp + "_regionFL"
+    outFeatureLayerPath = os.path.join(temporary_LayerFolder, outFeatureLayerName)
+    outFeatureLayerPath = outFeatureLayerPath.replace(os.sep, "/")
+    outFeatureLayer = arcpy.MakeFeatureLayer_management(outFeatureClass, outFeatureLayerName)
+    arcpy.AddMessage("... saving Feature Layer as Layer File (.lyrx)")
+    arcpy.SaveToLayerFile_management(outFeatureLayer, outFeatureLayerPath)
+
+    arcpy.AddMessage("END Create Cloud Region Layer\n\n")
+
+    return outFeatureLayerPath
+
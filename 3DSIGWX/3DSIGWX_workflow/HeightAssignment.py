@@ -28,20 +28,24 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from VerticalInterpolation import *
+from TileProcessing import *
+from StageHandoff import *
+
 
 def reclassify_height(GeometricHeight, VariableData, zCoordinates, AmountofLayers, MaxHeight, fillValue):
     """
         Function Description: 
         Creating new z-Coordinates with "nVertLayers"-Layers. Assigning a Geometric Height to each Level Based
         Datapoint of the COSMO Output. Interpolating the Values of the variable "VariableData" to the new 
-        z-Coordinates.
+        z-Coordinates. All timestamps are interpolated at once, the geometric height does not change in time.
 
         Parameters
         ----------
         GeometricHeight: array
             array of netCDF variable "height"
         VariableData: array
-            Values from the Variable to interpolate
+            Values from the Variable to interpolate (time, levels, latitude, longitude)
         zCoordinates: int
             Vertical Layer numbers
         AmountofLayers: int
@@ -58,10 +62,6 @@ def reclassify_height(GeometricHeight, VariableData, zCoordinates, AmountofLayer
     """
     GeometricHeight = np.array(GeometricHeight)
     
-    # Define Fixed Z layer spacing 
-    maxHeight =  np.max(GeometricHeight)
-    minHeight = np.min(GeometricHeight)
-    min_indices = np.empty(3)
     shapeVariableData = list(np.shape(VariableData))
     shapeVariableData[1] = AmountofLayers
     shapeVariableData = tuple(shapeVariableData)
@@ -69,44 +69,55 @@ def reclassify_height(GeometricHeight, VariableData, zCoordinates, AmountofLayer
     
     arcpy.AddMessage('... Interpolating Data')
     # Reclassify Height 
-    for height in zCoordinates:
-        for i in range(GeometricHeight.shape[1]):       # latitude
-            for j in range(GeometricHeight.shape[2]):   # longitude
-                if GeometricHeight[0,i,j] < -100000:    # Check for NaN Values in Geometric Height
-                    pass
-                else:
-                    delta_height = (abs(height - GeometricHeight[:-2,i,j]))     # Distance from every geometric height layer at point (x[j], y[i]) to the Z-Coordinate "height"
-                    min_indices[0] =np.where(np.isclose(delta_height, np.sort(delta_height)[0]))[0][0]
-                    min_indices[1] =np.where(np.isclose(delta_height, np.sort(delta_height)[1]))[0][0]
-                    min_indices[2] =np.where(np.isclose(delta_height, np.sort(delta_height)[2]))[0][0]
-
-                    # Check, if z-Coordinate is between the two geometric height layers geometricHeight[min_indices[0]] and geometricHeight[min_indices[1]]
-                    if (height - GeometricHeight[int(min_indices[0]),i,j]) * (height - GeometricHeight[int(min_indices[1]),i,j]) < 0:
-                        # Interpolation
-                        heightDiffLayers = abs(GeometricHeight[int(min_indices[1]),i,j] -GeometricHeight[int(min_indices[0]),i,j])    # Difference between higher and lower layer
-                        heightDiffZCoord = abs(height-GeometricHeight[int(min_indices[0]),i,j])  # Difference between z-Coordinate (middle point) and lower Layer
-                        ratio = heightDiffZCoord/heightDiffLayers
-                        interpolatedVariableData = VariableData[0, int(min_indices[0]), i,j]- (VariableData[0, int(min_indices[0]), i,j] - VariableData[0, int(min_indices[1]), i,j])*ratio      # Time dimension also iterable (if more than one timestamp)
-                    elif (height - GeometricHeight[int(min_indices[0]),i,j]) * (height - GeometricHeight[int(min_indices[2]),i,j]) < 0:
-                        # Interpolation
-                        heightDiffLayers = abs(GeometricHeight[int(min_indices[2]),i,j] -GeometricHeight[int(min_indices[0]),i,j])    # Difference between higher and lower layer
-                        heightDiffZCoord = abs(height-GeometricHeight[int(min_indices[0]),i,j])  # Difference between z-Coordinate (middle point) and lower Layer
-                        ratio = heightDiffZCoord/heightDiffLayers
-                        interpolatedVariableData = VariableData[0, int(min_indices[0]), i,j]- (VariableData[0, int(min_indices[0]), i,j] - VariableData[0, int(min_indices[2]), i,j])*ratio      # Time dimension also iterable (if more than one timestamp)
-                    else:
-                        interpolatedVariableData = fillValue  # If z-Coordinate "height" is below the two nearest geometric height layers, set Variable Value to 0.0 (Point is below the terrain)
-
-                    heightIndex = np.where(np.isclose(zCoordinates, height))[0][0]
-                    outVariableData[0, heightIndex, i, j] = interpolatedVariableData       # Time dimension also iterable (if more than one timestamp)
-
-        arcpy.AddMessage('    height: '+ str(height))
+    # Search the lower and higher layer of every z-Coordinate in all columns at once or reuse them from the weight cache (see VerticalInterpolation.py)
+    [lowerIndex, upperIndex, weight, validMask] = get_interpolation_weights(GeometricHeight, zCoordinates, AmountofLayers, MaxHeight)
+    outVariableData[:] = apply_interpolation_weights(VariableData, lowerIndex, upperIndex, weight, validMask, fillValue)     # Same weights for every timestamp
+
     return outVariableData
 
 
 
 
 
-def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, AmountofLayers, MaxHeight, LayerName, Timestamp):
+def get_level_based_variables(inNetCDFFileName, ncVarName):
+    """
+        Function Description: 
+        Returns the variables of "ncVarName" which are stored in the level-based coordinate system
+        (time, level, latitude, longitude) of the COSMO Output file and thus have to be transformed
+        by the HeightAssignment. The geometric height itself and 2D-variables (e.g. CAPE_MU) are skipped.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Name of Input NetCDF File
+        ncVarName: string or list
+            Names of the variables in the NetCDF File (comma separated string as in the config file)
+        
+        Returns
+        -------
+        levelVarNames: list
+            Names of the level-based variables
+    """
+    if isinstance(ncVarName, str):
+        ncVarName = ncVarName.split(",")
+
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
+    levelVarNames = []
+    for varName in ncVarName:
+        varName = varName.strip()
+        if varName == 'HEIGHT' or varName not in inNetCDFFile.variables:
+            continue
+        if len(inNetCDFFile.variables[varName].dimensions) == 4:
+            levelVarNames.append(varName)
+    inNetCDFFile.close()
+
+    return levelVarNames
+
+
+
+
+
+def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, AmountofLayers, MaxHeight, LayerName, Timestamp, stride = 1):
     """
         Function Description: 
         Transforms the Variable specified by "ncVarName" from the Level Based Coordinate system of 
@@ -129,6 +140,9 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
             Name of Layer (corresponds to Meteorological Parameter)
         Timestamp: string
             Timestamp of the current NetCDF file 
+        stride: int
+            Only every stride-th latitude row and longitude column is read and interpolated 
+            (e.g. the wind barb spacing, 1 keeps the full grid)
         
         Returns
         -------
@@ -138,7 +152,7 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
     arcpy.AddMessage('\nSTART Transforming to Z-Coordinates')
 
     ncVarHeight = 'HEIGHT'
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_HeightAssigned_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_HeightAssigned_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name
     
     fill_value = -3.4028235e+38
@@ -151,7 +165,7 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
 
     # 1. Load netCDF File
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
     
     #1.2 Check if netCDF variable "Height" and "ncVarName" exist
@@ -185,9 +199,11 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
     # 2. Extract variable Geometric Height and Specified Dependent Variable from netCDF Input File
     # 2.1 Get the netCDF geometric height variable object 
     height = inNetCDFFile.variables[ncVarHeight]
-    heightData = height[:]    
     heightShape = height.shape
-    heightRank = len(heightData.shape)
+    # Size of the (subsampled) horizontal output grid
+    yDimensionSize = len(range(0, heightShape[1], stride))
+    xDimensionSize = len(range(0, heightShape[2], stride))
+    heightRank = len(heightShape)
     heightDimNames = height.dimensions 
 
     
@@ -196,7 +212,7 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
     
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4_CLASSIC')
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')
     arcpy.AddMessage("... creating output netCDF file " + outNetCDFFileName)    
     
 
@@ -204,9 +220,9 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
     for dimName in ncDimNames:       
         #Set output dimension size    
         if dimName == xDimension:
-            dimSize = len(inNetCDFFile.variables[dimName])
+            dimSize = xDimensionSize
         elif dimName == yDimension:
-            dimSize = len(inNetCDFFile.variables[dimName])
+            dimSize = yDimensionSize
         elif dimName == zDimension:
             dimSize = len(zCoordinates)      
         else:
@@ -226,8 +242,11 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
             # Get coordinate variable    
             ncCoordVar = inNetCDFFile.variables[dimName]
             
-            # Get data of variable
-            ncCoordVarData = ncCoordVar[:] 
+            # Get data of variable (horizontal coordinates with the stride of the subsampled grid)
+            if dimName in (xDimension, yDimension):
+                ncCoordVarData = ncCoordVar[::stride]
+            else:
+                ncCoordVarData = ncCoordVar[:] 
             
             #5.2.1 Create coordinate variable in outnetCDFfile           
             outNcCoordVar = outNetCDFFile.createVariable(dimName, 'f4', (dimName,), fill_value = -3.4028235e+38)
@@ -256,24 +275,21 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
             outNcCoordVar[:] = zCoordinates[:]      # Assign new z-Coordinate values from reclassify_height function output to Height coordinate variable 
             
     # 6. Write Output Variables
+    outNcVars = []
     for varName in ncVarName:
         # 6.1 Get the specified dependent variable object from netCDF Input File
         ncVarObj = inNetCDFFile.variables[varName]
-        ncVarData = inNetCDFFile.variables[varName][:]
 
-        # 6.2 Interpolation of dependent variable data
-        [interpolatedVariableData] = reclassify_height(heightData, ncVarData, zCoordinates, AmountofLayers, MaxHeight, fill_value)
-
-        # 6.3. Create Variable with new dimension "height" in outNetCDF file and assign values
+        # 6.2 Create Variable with new dimension "height" in outNetCDF file (values are assigned tile by tile in 6.5)
         ncVarDim = list(inNetCDFFile.variables[varName].dimensions)
         for index, value in enumerate((ncVarDim)):
             if value in ['z_1', 'z_2','z_5']:
                 ncVarDim[index] = zDimension
 
         outNcVar = outNetCDFFile.createVariable(varName, 'f4', (ncVarDim), fill_value = -3.4028235e+38)
-        outNcVar[:, :, :, :] = interpolatedVariableData[:]                    
+        outNcVars.append(outNcVar)
 
-        # 6.4 Get Variable Attributes and assign to new outVariable
+        # 6.3 Get Variable Attributes and assign to new outVariable
             #    Also determine if grid_mapping exists or not
         bGridMappingExists = False
         ncGridMappingVarName = ""
@@ -299,13 +315,13 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
         arcpy.AddMessage("... writing variable attributes for " + varName)
         
         
-        # 6.5 Get grid_mapping variable object if exists
-        if bGridMappingExists:
+        # 6.4 Get grid_mapping variable object if exists (only written once if several variables share it)
+        if bGridMappingExists and ncGridMappingVarName not in outNetCDFFile.variables:
             ncGridMappingVar = inNetCDFFile.variables[ncGridMappingVarName]        
             ncGridMappingVarShape = ncGridMappingVar.shape        
             ncGridMappingVarDimNames = ncGridMappingVar.dimensions         
             
-            #6.5.1 Create grid mapping variable in outnetCDFfile 
+            #6.4.1 Create grid mapping variable in outnetCDFfile 
             outNcGridMappingVar = outNetCDFFile.createVariable(ncGridMappingVarName, ncGridMappingVar.typecode(), ncGridMappingVarDimNames)   
             
             allGridMappingAttributes = dir(ncGridMappingVar)
@@ -315,20 +331,39 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
                     setattr(outNcGridMappingVar, gridmappingattrib, gridmappingAttribValue)
             arcpy.AddMessage("... writing grid_mapping for " + varName)
 
+    # 6.5 Interpolation of dependent variable data in latitude bands (see TileProcessing.py)
+    #     The geometric height of a tile is shared by all variables (interpolation weights are reused from the cache)
+    #     With a stride > 1 only the rows and columns of the subsampled grid are read
+    for tile in latitude_tiles(yDimensionSize):
+        heightData = height[tile_index(height.dimensions, tile, yDimension, stride, xDimension)]
+        ncVarDataList = []
+        for varName in ncVarName:
+            ncVarObj = inNetCDFFile.variables[varName]
+            ncVarDataList.append(ncVarObj[tile_index(ncVarObj.dimensions, tile, yDimension, stride, xDimension)])
+
+        if interpolationSettings["workers"] > 1:
+            # Columns of the tile are interpolated on the process pool (see VerticalInterpolation.py)
+            arcpy.AddMessage('... Interpolating Data on ' + str(interpolationSettings["workers"]) + ' worker processes')
+            interpolatedVariableDataList = interpolate_parallel(heightData, ncVarDataList, zCoordinates, AmountofLayers, MaxHeight, fill_value)
+        else:
+            interpolatedVariableDataList = [reclassify_height(heightData, ncVarData, zCoordinates, AmountofLayers, MaxHeight, fill_value) for ncVarData in ncVarDataList]
+
+        for outNcVar, interpolatedVariableData in zip(outNcVars, interpolatedVariableDataList):
+            outNcVar[:, :, tile, :] = interpolatedVariableData[:]
+
+    arcpy.AddMessage("... interpolation weight cache: " + str(weightCacheStatistics["hits"]) + " hits, " + str(weightCacheStatistics["misses"]) + " misses")
+
     # 7. Add a new NetCDF Variable for the Vertical Level Numbers 
     outNcVarLevels = outNetCDFFile.createVariable('LayerLevel', 'f4', ("time", "Z", "latitude", "longitude"), fill_value = -3.4028235e+38)
     shapeNcVarLevels = ["0", "0", "0", "0"]
-    shapeNcVarLevels[0] = 1 # Time Dimension
+    shapeNcVarLevels[0] = inNetCDFFile.dimensions[ncDimNames[0]].size # Time Dimension
     shapeNcVarLevels[1] = AmountofLayers
-    shapeNcVarLevels[2] = np.shape(heightData)[1]
-    shapeNcVarLevels[3] = np.shape(heightData)[2]
-    shapeNcVarLevels = tuple(shapeNcVarLevels)
-    outVarLevelsData = np.empty(shapeNcVarLevels)
-    for levels in range(AmountofLayers):
-        for i in range(heightData.shape[1]):       # latitude
-            for j in range(heightData.shape[2]):   # longitude
-                outVarLevelsData[0, levels, i, j] = AmountofLayers - levels
-    outNcVarLevels[:, :, :, :] = outVarLevelsData[:]
+    shapeNcVarLevels[3] = xDimensionSize
+    for tile in latitude_tiles(yDimensionSize):
+        shapeNcVarLevels[2] = tile.stop - tile.start
+        outVarLevelsData = np.empty(tuple(shapeNcVarLevels))
+        outVarLevelsData[:] = (AmountofLayers - np.arange(AmountofLayers)).reshape(1, -1, 1, 1)
+        outNcVarLevels[:, :, tile, :] = outVarLevelsData[:]
 
 
     # 8. Write all global attributes
@@ -348,7 +383,7 @@ def HeightAssignment(inNetCDFFileName, ncVarName: list, current_geodatabase, Amo
 
     # 9. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
 
     arcpy.AddMessage('END Transforming to Z-Coordinates\n\n')
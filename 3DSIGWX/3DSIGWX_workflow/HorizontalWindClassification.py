@@ -24,9 +24,18 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from TileProcessing import *
+from StageHandoff import *
 
 
-def HorizontalWind_classification(Wind_U_Data, Wind_V_Data):
+# Lower bounds of the compass wind sectors NE, E, SE, S, SW, W, NW and N in [°] (N from 337.5° to 22.5°)
+WindSectorEdges = [22.5, 67.5, 112.5, 157.5, 202.5, 247.5, 292.5, 337.5]
+# Upper bounds of the wind speed classes in [kn] (last class: wind speed >= 95 kn)
+WindSpeedBinEdges = [7.5, 15, 25, 35, 45, 55, 65, 75, 85, 95]
+
+
+
+def HorizontalWind_classification(Wind_U_Data, Wind_V_Data, rowOffset = 0, barbStride = 5):
     """
         Function Description:   Function to classify the horizontal wind speed and wind direction at each
                                 grid point. For the wind direction the following eight directions are used:
@@ -38,6 +47,11 @@ def HorizontalWind_classification(Wind_U_Data, Wind_V_Data):
             Array of the northward wind component
         Wind_V_Data: array
             Array of the eastward wind component
+        rowOffset: int
+            Latitude index of the first row (if only a tile of the domain is classified)
+        barbStride: int
+            Only every barbStride-th grid point in latitude and longitude direction is used 
+            for the wind barbs (1 if the grid was already subsampled in the HeightAssignment)
         
         Returns
         -------
@@ -50,401 +64,35 @@ def HorizontalWind_classification(Wind_U_Data, Wind_V_Data):
     """
     fill_value = -3.4028235e+38
     
-    Wind_U_Data = np.array(Wind_U_Data)
+    Wind_U_Data = np.ma.getdata(Wind_U_Data)
+    Wind_V_Data = np.ma.getdata(Wind_V_Data)
     shapeWind_U_Data = np.shape(Wind_U_Data)
-    shapeWind_U_Data = tuple(shapeWind_U_Data) 
-
-    Wind_V_Data = np.array(Wind_V_Data)
-    shapeWind_V_Data = np.shape(Wind_V_Data)
-    shapeWind_V_Data = tuple(shapeWind_V_Data) 
-
-    WindDirectionData = np.empty(shapeWind_U_Data)  # Create empty output array for Wind Direction values
-    WindSpeedData = np.empty(shapeWind_U_Data)      # Create empty output array for Wind Speed Values
-    WindItem = np.empty(shapeWind_U_Data)           # Create empty output array for Wind Item Values
 
     arcpy.AddMessage('... Calculating Wind Direction and Windspeed')
-    # Classify CLC Values to Categories 
-    for time in range(shapeWind_U_Data[0]):
-        for zcoord in range(shapeWind_U_Data[1]):
-            arcpy.AddMessage('    Z-Coordinate: ' + str(zcoord))
-            for i in range(shapeWind_U_Data[2]):        # latitude
-                for j in range(shapeWind_U_Data[3]):    # longitude
-                    if (i % 5 == 0) & (j % 5 == 0):
-                        # Calculating Horizontal Wind Speed
-                        if (Wind_U_Data[time, zcoord, i, j]  > -1000) & (Wind_V_Data[time, zcoord, i, j]  > -1000):
-                            WindSpeedData[time, zcoord, i, j] = np.sqrt(Wind_U_Data[time, zcoord, i, j]**2 + Wind_V_Data[time, zcoord, i, j]**2)*1.943844 # To calculate the values from m/s to knots
-                        else:
-                            WindSpeedData[time, zcoord, i, j] = fill_value
-
-                        # Calculating Wind Direction
-                        if WindSpeedData[time, zcoord, i, j] > 0:
-                            if np.arctan2(Wind_U_Data[time, zcoord, i, j], Wind_V_Data[time, zcoord, i, j]) < 0:
-                                WindDirection = 360 - abs(np.rad2deg(np.arctan2(Wind_U_Data[time, zcoord, i, j], Wind_V_Data[time, zcoord, i, j])))
-                            else:
-                                WindDirection = np.rad2deg(np.arctan2(Wind_U_Data[time, zcoord, i, j], Wind_V_Data[time, zcoord, i, j]))
-
-                        # Classification of Wind Direction into classical compass winds (N, NE, E, SE, S, SW, W, NW)¨
-                            if ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 0
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 1
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 2
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 3
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 4
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 5
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 6
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 7.5):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 7
-
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 8
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 9
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 10
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 11
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 12
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 13
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 14
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 15):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 15
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 16
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 17
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 18
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 19
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 20
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 21
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 22
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 25):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 23
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 24
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 25
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 26
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 27
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 28
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 29
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 30
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 35):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 31
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 32
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 33
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 34
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 35
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 36
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 37
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 38
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 45):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 39
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 40
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 41
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 42
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 43
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 44
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 45
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 46
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 55):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 47
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 48
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 49
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 50
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 51
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 52
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 53
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 54
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 65):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 55
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 56
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 57
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 58
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 59
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 60
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 61
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 62
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 75):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 63
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 64
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j]< 85):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 65
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 66
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 67
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 68
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 69
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 70
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 85):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 71
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 72
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 73
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 74
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 75
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 76
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 77
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 78
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] < 95):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 79
-                            
-                            elif ((WindDirection >= 337.5) or (WindDirection < 22.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 0
-                                WindItem[time, zcoord, i, j] = 80
-                            
-                            elif ((WindDirection >= 22.5) & (WindDirection < 67.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 1
-                                WindItem[time, zcoord, i, j] = 81
-
-                            elif ((WindDirection >= 67.5) & (WindDirection < 112.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 2
-                                WindItem[time, zcoord, i, j] = 82
-                            
-                            elif ((WindDirection >= 112.5) & (WindDirection < 157.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 3
-                                WindItem[time, zcoord, i, j] = 83
-                            
-                            elif ((WindDirection >= 157.5) & (WindDirection < 202.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 4
-                                WindItem[time, zcoord, i, j] = 84
-                            
-                            elif (WindDirection >= 202.5) & (WindDirection < 247.5) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 5
-                                WindItem[time, zcoord, i, j] = 85
-                            
-                            elif ((WindDirection >= 247.5) & (WindDirection < 292.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 6
-                                WindItem[time, zcoord, i, j] = 86
-                            
-                            elif ((WindDirection >= 292.5) & (WindDirection < 337.5)) & (WindSpeedData[time, zcoord, i, j] >= 95):
-                                WindDirectionData[time, zcoord, i, j] = 7
-                                WindItem[time, zcoord, i, j] = 87
-                            
-                            
-
-                        else:
-                            WindDirectionData[time, zcoord, i, j] = fill_value   # If no Wind Speed the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
-                            WindItem[time, zcoord, i, j] = fill_value
-                    else:
-                        WindDirectionData[time, zcoord, i, j] = fill_value
-                        WindItem[time, zcoord, i, j] = fill_value
-                        WindSpeedData[time, zcoord, i, j] = fill_value
+    # Only every barbStride-th grid point in latitude and longitude direction is used for the wind barbs
+    sampledRows = (np.arange(shapeWind_U_Data[2]) + rowOffset) % barbStride == 0
+    sampledColumns = np.arange(shapeWind_U_Data[3]) % barbStride == 0
+    sampledPoints = sampledRows[:, np.newaxis] & sampledColumns[np.newaxis, :]
+
+    with np.errstate(over='ignore', invalid='ignore'):      # Fill values of U and V are excluded afterwards
+        # Calculating Horizontal Wind Speed
+        validWind = (Wind_U_Data > -1000) & (Wind_V_Data > -1000)
+        WindSpeedData = np.sqrt(Wind_U_Data**2 + Wind_V_Data**2).astype(np.float64)*1.943844 # To calculate the values from m/s to knots
+        WindSpeedData = np.where(validWind & sampledPoints, WindSpeedData, fill_value)
+
+        # Calculating Wind Direction
+        windAngle = np.arctan2(Wind_U_Data, Wind_V_Data)
+        WindDirection = np.rad2deg(windAngle).astype(np.float64)
+        WindDirection = np.where(windAngle < 0, 360 - np.abs(WindDirection), WindDirection)
+
+    # Classification of Wind Direction into classical compass winds (N, NE, E, SE, S, SW, W, NW) and of the Wind Speed
+    # WindItem = sector + 8 * wind speed class determines the wind barb in the web app
+    windSector = np.searchsorted(WindSectorEdges, WindDirection, side='right') % 8
+    windSpeedClass = np.searchsorted(WindSpeedBinEdges, WindSpeedData, side='right')
+    hasWindSpeed = WindSpeedData > 0     # If no Wind Speed the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
+    WindDirectionData = np.where(hasWindSpeed, windSector, fill_value).astype(np.float64)
+    WindItem = np.where(hasWindSpeed, windSector + 8*windSpeedClass, fill_value).astype(np.float64)
+
     return [WindDirectionData, WindSpeedData, WindItem]
 
                 
@@ -452,7 +100,7 @@ def HorizontalWind_classification(Wind_U_Data, Wind_V_Data):
 
 
 
-def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerName, Timestamp):
+def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerName, Timestamp, barbStride = 5):
     """
         Function Description:   Function to classify the horizontal wind speed and wind direction at each
                                 grid point and write to a output NetCDF file. For the wind direction the 
@@ -469,6 +117,9 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
             Name of Layer (corresponds to Meteorological Parameter)
         Timestamp: string
             Timestamp of the current NetCDF file 
+        barbStride: int
+            Only every barbStride-th grid point in latitude and longitude direction is used 
+            for the wind barbs (1 if the grid was already subsampled in the HeightAssignment)
 
         Returns
         -------
@@ -484,7 +135,7 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
     msgInvalidParameters = "Invalid number of parameters."
     ErrorDesc = "error while running"
     
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name      
     ncVarU = 'U'
     ncVarV = 'V'
@@ -496,7 +147,7 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
 
     # 1. Import NetCDF Input File with CLC Values
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
     ncDimNames = inNetCDFFile.dimensions.keys()
     
@@ -525,17 +176,14 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
     # 2. Extract Horizontal Wind Speed Values from netCDF Input File
     # 2.1 Get netCDF Wind components variable objects (U,V)
     ncVarUObj = inNetCDFFile.variables[ncVarU]
-    ncVarUData = inNetCDFFile.variables[ncVarU][:]
     ncVarVObj = inNetCDFFile.variables[ncVarV]
-    ncVarVData = inNetCDFFile.variables[ncVarV][:]
 
     
 
-    # 3. Classification of CLC Values 
-    [WindDirectionData, WindSpeedData, WindItem] = HorizontalWind_classification(ncVarUData, ncVarVData)
+    # 3. Classification of CLC Values (tile by tile when writing the output variables, see 10.)
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4_CLASSIC')
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')
 
 
     # 5. Create Dimensions
@@ -590,29 +238,34 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
     # 6. Create Variables for WindDirection and Windspeed 
     outNcVarDim = list(inNetCDFFile.variables[ncVarU].dimensions)
     outNcVarWindDirection = outNetCDFFile.createVariable(outVarWindDirection, 'f4', (outNcVarDim), fill_value = -3.4028235e+38)
-    outNcVarWindDirection[:, :, :, :] = WindDirectionData[:]          
 
     # 7. Create Variables for WindDirection and Windspeed 
     outNcVarWindSpeed = outNetCDFFile.createVariable(outVarWindSpeed, 'f4', (outNcVarDim), fill_value = -3.4028235e+38)
-    outNcVarWindSpeed[:, :, :, :] = WindSpeedData[:]
 
     # 8. Create Variables for WindItem
     outNcVarWindItem = outNetCDFFile.createVariable(outVarWindItem, 'f4', (outNcVarDim), fill_value = -3.4028235e+38)  
-    outNcVarWindItem[:, :, :, :] = WindItem[:]       
 
     # 9. Create Variable for LayerLevel
-    ncVarLayerLevelData = inNetCDFFile.variables["LayerLevel"][:]
-    for z in range(np.shape(ncVarLayerLevelData)[1]):
-        for i in range(np.shape(ncVarLayerLevelData)[2]):
-            for j in range(np.shape(ncVarLayerLevelData)[3]):
-                if not ((i % 5 == 0) & (j % 5 ==0)):
-                    ncVarLayerLevelData[0, z, i, j] = fill_value
-
-    outNcVarLayerLevelDim = list(inNetCDFFile.variables["LayerLevel"].dimensions)
+    ncVarLayerLevelObj = inNetCDFFile.variables["LayerLevel"]
+    outNcVarLayerLevelDim = list(ncVarLayerLevelObj.dimensions)
     outNcVarLayerLevel = outNetCDFFile.createVariable("LayerLevel", 'f4', (outNcVarLayerLevelDim), fill_value = -3.4028235e+38)
-    outNcVarLayerLevel[:, :, :, :] = ncVarLayerLevelData[:]
 
-    # 10. Write all global attributes
+    # 10. Classify and write the variables in latitude bands (see TileProcessing.py)
+    for tile in latitude_tiles(len(inNetCDFFile.dimensions[yDimension])):
+        ncVarUData = ncVarUObj[tile_index(ncVarUObj.dimensions, tile, yDimension)]
+        ncVarVData = ncVarVObj[tile_index(ncVarVObj.dimensions, tile, yDimension)]
+        [WindDirectionData, WindSpeedData, WindItem] = HorizontalWind_classification(ncVarUData, ncVarVData, tile.start, barbStride)
+        outNcVarWindDirection[tile_index(outNcVarDim, tile, yDimension)] = WindDirectionData[:]
+        outNcVarWindSpeed[tile_index(outNcVarDim, tile, yDimension)] = WindSpeedData[:]
+        outNcVarWindItem[tile_index(outNcVarDim, tile, yDimension)] = WindItem[:]
+
+        ncVarLayerLevelData = ncVarLayerLevelObj[tile_index(outNcVarLayerLevelDim, tile, yDimension)]
+        sampledRows = np.arange(tile.start, tile.stop) % barbStride == 0
+        sampledColumns = np.arange(np.shape(ncVarLayerLevelData)[3]) % barbStride == 0
+        ncVarLayerLevelData[:, :, ~(sampledRows[:, np.newaxis] & sampledColumns[np.newaxis, :])] = fill_value     # All timestamps
+        outNcVarLayerLevel[tile_index(outNcVarLayerLevelDim, tile, yDimension)] = ncVarLayerLevelData[:]
+
+    # 11. Write all global attributes
     globalAllAtributes = dir(inNetCDFFile)
     for globalAttribute in globalAllAtributes:
         if globalAttribute not in ['close', 'createDimension', 'createVariable', 'flush', 'sync', '__class__', '__delattr__', '__dir__', '__doc__', '__enter__', '__eq__', 
@@ -627,9 +280,9 @@ def HorizontalWindClassification(inNetCDFFileName, current_geodatabase, LayerNam
     arcpy.AddMessage("... writing global attributes")
 
 
-    # 11. Synchronize and close NetCDF files
+    # 12. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
 
     arcpy.AddMessage('END Calculating Wind Direction and Wind Speed\n\n')
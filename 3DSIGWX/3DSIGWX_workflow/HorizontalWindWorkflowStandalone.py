@@ -31,13 +31,15 @@ import traceback
 # Import Geoprocessing Modules
 from HeightAssignment import *
 from MergeNetCDF import *
+from StageHandoff import *
 from CreateSceneLayer import *
 from ShareSceneLayer import *
 from HorizontalWindClassification import *
+from InstancedSymbols import *
 from arcpy import env
 
 def HorizontalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, Timestamp, descriptionDate,
-                            username_arcgis, password_arcgis, timeEnabled = False):
+                            username_arcgis, password_arcgis, timeEnabled = False, heightAssigned = False, barbStride = 5, appendMerge = False):
     """
         Function Description:   Geoprocessing Workflow to create a hosted Scene Layer containing 
                                 Horizontal Wind speeds and the wind direction at each grid point 
@@ -72,6 +74,15 @@ def HorizontalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, c
             Password of ArcGIS account
         timeEnabled: bool
             If true, time dimension is added to the feature layer
+        heightAssigned: bool
+            If true, the input files are the output of the shared HeightAssignment of all
+            variables and no further interpolation is needed
+        barbStride: int
+            Spacing of the wind barbs in grid points. Without shared HeightAssignment only
+            every barbStride-th grid point is read and interpolated
+        appendMerge: bool
+            If true, the files are appended to an existing merged file of the same Timestamp
+            (e.g. a newly arriving forecast hour) instead of merging all files again
         
         Returns
         -------
@@ -95,17 +106,32 @@ def HorizontalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, c
     
             # 1. HeightAssignment
             ncVarName_HeightAssign = ['U', 'V']  # variable to be interpolated
-            height_assigned_file_UV = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+            if heightAssigned:
+                height_assigned_file_UV = InFileName     # Already interpolated by the shared HeightAssignment
+                classificationStride = barbStride        # Wind barbs are sampled on the full grid
+            else:
+                # Subsampled grid of the wind barbs is interpolated only
+                height_assigned_file_UV = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp, barbStride)
+                classificationStride = 1
     
             # 2. CloudClassification
-            [HorizontalWind_file, HorizontalWind_VarNames] = HorizontalWindClassification(height_assigned_file_UV, current_folder, LayerName, Timestamp)
+            [HorizontalWind_file, HorizontalWind_VarNames] = HorizontalWindClassification(height_assigned_file_UV, current_folder, LayerName, Timestamp, classificationStride)
+            if not heightAssigned:
+                release_stage_files([height_assigned_file_UV])   # Intermediate file is no longer needed
 
             file_names.append(HorizontalWind_file)
             
             counter += 1
         
         # 3. Merging Files
-        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp)
+        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp, None, appendMerge)
+        release_stage_files(file_names)
+
+        # 3.1 Instanced wind barbs (.glb) per wind speed class, time step and level band (heading from the wind direction sector)
+        if instanceSettings["enabled"]:
+            instanceFiles = CreateInstancedSymbols(merged_NetCDFfileName, "WindItem", get_wind_barb_symbols(instanceSettings["symbolFolder"]), DimensionNames_mergedFile,
+                                                   os.path.join(tempLayerFolder, "Instances"), LayerName, Timestamp, ["WindDirection", 45.0])
+            arcpy.AddMessage("... " + str(len(instanceFiles)) + " instanced symbol batches written")
 
         # 4. Create NetCDF Feature Layer (.lyrx file)
         HorizontalWind_VarNames.append("LayerLevel")    # Additional Variable Name indicating the Layer Levels (integer 0-maxHeight)
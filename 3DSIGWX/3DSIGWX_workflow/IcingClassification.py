@@ -23,12 +23,23 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from TileProcessing import *
+from StageHandoff import *
+from ClassifierEngine import *
+
+
+# Rule table T [K] and QC [kg/kg] -> Icing (see ClassifierEngine.py)
+# Icing is possible between 0°C and -40°C if liquid water is present
+IcingClassificationRules = [
+    [1, {'T': (233.15, 273.15, "both"), 'QC': (0, None, "neither")}],
+]
+
 
 
 def Icing_classification(T_Data, QC_Data):
     """
         Function Description:   Function to classify the icing at each grid point based on a temperature
-                                below 0°C and the liquid water content.
+                                below 0°C and the liquid water content (rule table "IcingClassificationRules").
 
         Parameters
         ----------
@@ -43,29 +54,10 @@ def Icing_classification(T_Data, QC_Data):
             Icing areas
     """
     fill_value = -3.4028235e+38
-    
-    T_Data = np.array(T_Data)
-    shape_T_Data = np.shape(T_Data)
-    shape_T_Data = tuple(shape_T_Data) 
-
-    QC_Data = np.array(QC_Data)
-    shape_QC_Data = np.shape(QC_Data)
-    shape_QC_Data = tuple(shape_QC_Data) 
 
-    IcingData = np.empty(shape_T_Data)    # Create empty output array for Icing values
-    
     arcpy.AddMessage('... Calculating Icing Warning')
-    # Classify CLC Values to Categories 
-    for time in range(shape_T_Data[0]):
-        for zcoord in range(shape_T_Data[1]):
-            arcpy.AddMessage('    Z-Coordinate: ' + str(zcoord))
-            for i in range(shape_T_Data[2]):        # latitude
-                for j in range(shape_T_Data[3]):    # longitude 
-                    # Analysing if Icing is possible
-                    if (273.15 >= T_Data[time, zcoord, i, j]  >= 233.15) & (QC_Data[time, zcoord, i, j]  > 0):
-                        IcingData[time, zcoord, i, j] = 1
-                    else:
-                        IcingData[time, zcoord, i, j] = fill_value
+    # Analysing if Icing is possible
+    IcingData = apply_rule_table(IcingClassificationRules, {'T': T_Data, 'QC': QC_Data}, fill_value)
     
     return [IcingData]
 
@@ -107,7 +99,7 @@ def IcingClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     
     
     #inNetCDFFileName = "HeightAssigned_netCDF.nc"
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name      
     #outNetCDFFileName = "Icing_netCDF.nc"
     ncVarT = 'T'
@@ -119,7 +111,7 @@ def IcingClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 1. Import NetCDF Input File with all Values
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
     ncDimNames = inNetCDFFile.dimensions.keys()
     ncDimNames = list(ncDimNames) 
@@ -148,17 +140,14 @@ def IcingClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     # 2. Extract Icing Values from netCDF Input File
     # 2.1 Get netCDF Icing components variable objects (T, QC)
     ncVarTObj = inNetCDFFile.variables[ncVarT]
-    ncVarTData = inNetCDFFile.variables[ncVarT][:]
     ncVarQCObj = inNetCDFFile.variables[ncVarQC]
-    ncVarQCData = inNetCDFFile.variables[ncVarQC][:]
 
     
 
-    # 3. Classification of Icing Values 
-    [IcingData] = Icing_classification(ncVarTData, ncVarQCData)
+    # 3. Classification of Icing Values (tile by tile when writing the output variable, see 6.)
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4_CLASSIC')
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')
 
 
     # 5. Create Dimensions
@@ -211,7 +200,11 @@ def IcingClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     # 6. Create Variables for Icing
     outNcVarDim = list(inNetCDFFile.variables[ncVarT].dimensions)
     outNcVarIcing = outNetCDFFile.createVariable(outVarIcing, 'f4', (outNcVarDim), fill_value = -3.4028235e+38)
-    outNcVarIcing[:, :, :, :] = IcingData[:]          
+    for tile in latitude_tiles(len(inNetCDFFile.dimensions[yDimension])):     # Classify and write in latitude bands (see TileProcessing.py)
+        ncVarTData = ncVarTObj[tile_index(ncVarTObj.dimensions, tile, yDimension)]
+        ncVarQCData = ncVarQCObj[tile_index(ncVarQCObj.dimensions, tile, yDimension)]
+        [IcingData] = Icing_classification(ncVarTData, ncVarQCData)
+        outNcVarIcing[tile_index(outNcVarDim, tile, yDimension)] = IcingData[:]          
          
 
 
@@ -232,7 +225,7 @@ def IcingClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 8. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
 
     arcpy.AddMessage('END Calculating Icing Warning\n\n')
@@ -29,13 +29,15 @@ import traceback
 # Import Geoprocessing Modules
 from HeightAssignment import *
 from MergeNetCDF import *
+from StageHandoff import *
 from CreateSceneLayer import *
 from ShareSceneLayer import *
 from IcingClassification import *
+from IsosurfaceMesh import *
 from arcpy import env
 
 def IcingWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, Timestamp, descriptionDate,
-                    username_arcgis, password_arcgis, timeEnabled = False):
+                    username_arcgis, password_arcgis, timeEnabled = False, heightAssigned = False, appendMerge = False):
     """
         Function Description:   Function to create a hosted Scene Layer containing 
                                 information if icing may occur at a specific grid point 
@@ -70,6 +72,12 @@ def IcingWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_fo
             Password of ArcGIS account
         timeEnabled: bool
             If true, time dimension is added to the feature layer
+        heightAssigned: bool
+            If true, the input files are the output of the shared HeightAssignment of all
+            variables and no further interpolation is needed
+        appendMerge: bool
+            If true, the files are appended to an existing merged file of the same Timestamp
+            (e.g. a newly arriving forecast hour) instead of merging all files again
         
         Returns
         -------
@@ -93,17 +101,29 @@ def IcingWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_fo
     
             # 1. HeightAssignment
             ncVarName_HeightAssign = ['QC', 'T']  # variable to be interpolated
-            height_assigned_file_QCT = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+            if heightAssigned:
+                height_assigned_file_QCT = InFileName     # Already interpolated by the shared HeightAssignment
+            else:
+                height_assigned_file_QCT = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
     
             # 2. IcingClassification
             [Icing_file, Icing_VarNames] = IcingClassification(height_assigned_file_QCT, current_folder, LayerName, Timestamp)
+            if not heightAssigned:
+                release_stage_files([height_assigned_file_QCT])   # Intermediate file is no longer needed
 
             file_names.append(Icing_file)
             
             counter += 1
         
         # 3. Merging Files
-        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp)
+        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp, None, appendMerge)
+        release_stage_files(file_names)
+
+        # 3.1 Isosurface meshes (.glb) of the icing areas, one per time step
+        if meshSettings["icing"]:
+            meshFiles = CreateIsosurfaceMeshes(merged_NetCDFfileName, Icing_VarNames, [["Icing", 0.5, [0.55, 0.8, 1.0, 0.6]]], DimensionNames_mergedFile,
+                                               os.path.join(tempLayerFolder, "Meshes"), LayerName, Timestamp)
+            arcpy.AddMessage("... " + str(len(meshFiles)) + " isosurface meshes written")
 
         # 4. Create NetCDF Feature Layer (.lyrx file)
         outFeatureLayerName = CreateNetCDFFeatureLayer(merged_NetCDFfileName, DimensionNames_mergedFile, Icing_VarNames, current_geodatabase, current_folder, 
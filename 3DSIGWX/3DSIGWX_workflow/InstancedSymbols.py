@@ -0,0 +1,533 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  InstancedSymbols
+ Source Name:       InstancedSymbols.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file (CloudClassification or HorizontalWind)
+                    Output folder of the symbol batches (.glb)
+                    Level bands (optional, e.g. 3000,5000)
+
+ Description:       Batches of the 3D symbols of the web app (cumulus cloud, wind barbs) with
+                    GPU instancing. Instead of one symbol per feature, one binary glTF (.glb)
+                    is written per symbol type, time step and level band, which holds the
+                    symbol model once and the transforms of all its instances (translation,
+                    rotation and scale) in the extension EXT_mesh_gpu_instancing. Each class
+                    of the symbol (e.g. okta class or wind speed class) is a node with its
+                    own material, thus a batch is drawn with one draw call per class.
+                    The transforms are computed vectorized from the classified cubes: every
+                    classified voxel is an instance, the heading of the wind barbs is taken
+                    from the wind direction sector. The translations are local coordinates
+                    in meters (x east, y up, z south) around the origin stored in the extras
+                    of the glTF scene, as for the isosurface meshes (see IsosurfaceMesh.py).
+
+                    Usage: python InstancedSymbols.py NetCDF-file Clouds|HorizontalWind output-folder [level bands]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, json, struct, time
+
+from IsosurfaceMesh import grid_to_local, compute_vertex_normals, pack_glb, get_okta_color
+from MergeManifest import open_merged_file, iterate_merged_timesteps
+
+
+# Instanced symbol batches (see set_instanced_symbols), boundaries of the level bands [m] (one band if empty)
+# and folder of the symbol models of the web app
+instanceSettings = {"enabled": False, "levelBands": [],
+                    "symbolFolder": os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "3DSIGWX_webapp", "3D_symbols")}
+
+# Component types and number of components of the glTF accessors
+ComponentTypes = {5120: '<i1', 5121: '<u1', 5122: '<i2', 5123: '<u2', 5125: '<u4', 5126: '<f4'}
+ComponentCounts = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT4": 16}
+
+# Size of the cloud symbol of the web app (width, height and depth in [m]) and the okta classes drawn (0 oktas are not drawn)
+CloudSymbolSize = [1120, 400, 1620]
+CloudSymbolOktas = [1, 2, 3, 4, 5, 6, 7, 8]
+# Wind speed of the wind barb of each wind speed class of the HorizontalWind_classification in [kn] (barb_05knots.glb ... barb_100knots.glb)
+WindBarbSpeeds = [5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
+# Size of the wind barb symbol of the web app (width, height and depth in [m]) and color ramp of the wind speed [kn]
+WindBarbSize = [300, 150, 2000]
+WindSpeedColorStops = [[0, "#ffe3aa"], [25, "#ffc655"], [50, "#ff7100"], [75, "#ff0000"], [100, "#801164"]]
+
+
+def set_instanced_symbols(InstancedSymbols, LevelBands = None):
+    """
+        Function Description:
+        Defines if the Cloud and HorizontalWind workflows write instanced symbol batches.
+
+        Parameters
+        ----------
+        InstancedSymbols: bool
+            If true, a batch (.glb) per symbol type, time step and level band is written
+        LevelBands: list
+            Boundaries of the level bands in [m] (e.g. [3000, 5000] for the bands below 3000 m,
+            3000 - 5000 m and above 5000 m), one band if empty
+
+        Returns
+        -------
+
+    """
+    instanceSettings["enabled"] = bool(InstancedSymbols)
+    instanceSettings["levelBands"] = sorted(float(levelBand) for levelBand in (LevelBands or []))
+
+
+def get_cloud_symbols(symbolFolder):
+    """
+        Function Description:
+        Defines the cloud symbol of the instanced symbol batches: the cumulus cloud of the web
+        app with one class break per okta class of the CloudClassification.
+
+        Parameters
+        ----------
+        symbolFolder: string
+            Path to the folder of the symbol models of the web app (3D_symbols)
+
+        Returns
+        -------
+        Symbols: list
+            [symbol name, path to symbol model, size, [[class name, minimum, maximum, color] per okta class]]
+    """
+    classBreaks = [[str(okta) + "Oktas", okta, okta, get_okta_color(okta)] for okta in CloudSymbolOktas]
+    return [["Cloud", os.path.join(symbolFolder, "Cloud", "cumulus_cloud.glb"), CloudSymbolSize, classBreaks]]
+
+
+def get_wind_barb_symbols(symbolFolder):
+    """
+        Function Description:
+        Defines the wind barb symbols of the instanced symbol batches: one symbol per wind speed
+        class with the WindItem values of its eight wind sectors as class break and the color
+        of the wind speed in the web app.
+
+        Parameters
+        ----------
+        symbolFolder: string
+            Path to the folder of the symbol models of the web app (3D_symbols)
+
+        Returns
+        -------
+        Symbols: list
+            [symbol name, path to symbol model, size, [[class name, minimum, maximum, color]]] per wind speed class
+    """
+    stopSpeeds = [speed for [speed, color] in WindSpeedColorStops]
+    stopColors = np.array([[int(color[index:index + 2], 16) / 255 for index in (1, 3, 5)] for [speed, color] in WindSpeedColorStops])
+    Symbols = []
+    for [windSpeedClass, barbSpeed] in enumerate(WindBarbSpeeds):
+        barbName = "barb_" + str(barbSpeed).zfill(2) + "knots"
+        color = [float(np.interp(barbSpeed, stopSpeeds, stopColors[:, channel])) for channel in range(3)] + [1.0]
+        Symbols.append([barbName, os.path.join(symbolFolder, "Wind_Barbs_Objects", barbName + ".glb"), WindBarbSize,
+                        [[barbName, 8 * windSpeedClass, 8 * windSpeedClass + 7, color]]])
+    return Symbols
+
+
+
+def read_accessor(gltf, binData, accessorIndex):
+    """
+        Function Description:
+        Reads the values of an accessor of a glTF asset (interleaved buffer views are supported,
+        sparse accessors are not).
+
+        Parameters
+        ----------
+        gltf: dict
+            JSON description of the asset
+        binData: bytes
+            Binary buffer of the asset
+        accessorIndex: int
+            Index of the accessor
+
+        Returns
+        -------
+        values: array
+            Values of the accessor (count, number of components)
+    """
+    accessor = gltf["accessors"][accessorIndex]
+    if "sparse" in accessor or "bufferView" not in accessor:
+        raise Exception("Sparse glTF accessors are not supported")
+    bufferView = gltf["bufferViews"][accessor["bufferView"]]
+    dtype = np.dtype(ComponentTypes[accessor["componentType"]])
+    componentCount = ComponentCounts[accessor["type"]]
+    elementSize = dtype.itemsize * componentCount
+    stride = bufferView.get("byteStride", elementSize)
+    offset = bufferView.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    values = np.ndarray((accessor["count"], componentCount), dtype = dtype, buffer = binData, offset = offset, strides = (stride, dtype.itemsize))
+    return values.astype(np.float64 if dtype.kind == 'f' else np.int64)
+
+
+def get_node_matrix(node):
+    """
+        Function Description:
+        Computes the local transformation matrix of a glTF node (matrix or translation,
+        rotation and scale).
+
+        Parameters
+        ----------
+        node: dict
+            glTF node
+
+        Returns
+        -------
+        matrix: array
+            4x4 transformation matrix
+    """
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype = np.float64).reshape(4, 4).T     # glTF matrices are column-major
+    [x, y, z, w] = node.get("rotation", [0.0, 0.0, 0.0, 1.0])
+    rotation = np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                         [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                         [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+    matrix = np.eye(4)
+    matrix[:3, :3] = rotation * np.array(node.get("scale", [1.0, 1.0, 1.0]))[np.newaxis, :]
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def read_symbol_model(inGlbFileName):
+    """
+        Function Description:
+        Reads the triangles of a symbol model (.glb) as one mesh. The transformations of the
+        nodes are applied to the vertices (mirroring nodes are flipped), thus the model can be
+        placed by the transforms of the instances only.
+
+        Parameters
+        ----------
+        inGlbFileName: string
+            Path to the symbol model (binary glTF)
+
+        Returns
+        -------
+        positions: array
+            Coordinates of the vertices
+        normals: array
+            Unit normals of the vertices
+        triangles: array
+            Vertex indices of the triangles
+    """
+    with open(inGlbFileName, 'rb') as glbFile:
+        glbData = glbFile.read()
+    [magic, version, length] = struct.unpack_from('<III', glbData, 0)
+    if magic != 0x46546C67 or version != 2:
+        raise Exception(inGlbFileName + " is not a binary glTF 2.0 file")
+    gltf = None
+    binData = b''
+    chunkOffset = 12
+    while chunkOffset < length:
+        [chunkLength, chunkType] = struct.unpack_from('<II', glbData, chunkOffset)
+        chunkData = glbData[chunkOffset + 8: chunkOffset + 8 + chunkLength]
+        if chunkType == 0x4E4F534A:
+            gltf = json.loads(chunkData.decode('utf-8'))
+        elif chunkType == 0x004E4942:
+            binData = chunkData
+        chunkOffset += 8 + chunkLength
+
+    # 1. Transformation matrices of the nodes of the scene (depth first)
+    scene = gltf["scenes"][gltf.get("scene", 0)]
+    meshNodes = []
+    stack = [[nodeIndex, np.eye(4)] for nodeIndex in scene["nodes"]]
+    while stack:
+        [nodeIndex, parentMatrix] = stack.pop()
+        node = gltf["nodes"][nodeIndex]
+        matrix = parentMatrix @ get_node_matrix(node)
+        if "mesh" in node:
+            meshNodes.append([node["mesh"], matrix])
+        stack.extend([childIndex, matrix] for childIndex in node.get("children", []))
+
+    # 2. Triangles of all primitives, transformed to the coordinates of the scene
+    positions = []
+    normals = []
+    triangles = []
+    vertexCount = 0
+    for [meshIndex, matrix] in meshNodes:
+        normalMatrix = np.linalg.inv(matrix[:3, :3]).T
+        for primitive in gltf["meshes"][meshIndex]["primitives"]:
+            if primitive.get("mode", 4) != 4:
+                continue
+            primitivePositions = read_accessor(gltf, binData, primitive["attributes"]["POSITION"])
+            if "indices" in primitive:
+                primitiveTriangles = read_accessor(gltf, binData, primitive["indices"]).reshape(-1, 3)
+            else:
+                primitiveTriangles = np.arange(len(primitivePositions)).reshape(-1, 3)
+            if np.linalg.det(matrix[:3, :3]) < 0:
+                primitiveTriangles = primitiveTriangles[:, ::-1]
+            primitivePositions = primitivePositions @ matrix[:3, :3].T + matrix[:3, 3]
+            if "NORMAL" in primitive["attributes"]:
+                primitiveNormals = read_accessor(gltf, binData, primitive["attributes"]["NORMAL"]) @ normalMatrix.T
+                primitiveNormals /= np.maximum(np.linalg.norm(primitiveNormals, axis = 1), 1e-12)[:, np.newaxis]
+            else:
+                primitiveNormals = compute_vertex_normals(primitivePositions, primitiveTriangles)
+            positions.append(primitivePositions)
+            normals.append(primitiveNormals)
+            triangles.append(primitiveTriangles + vertexCount)
+            vertexCount += len(primitivePositions)
+    if not triangles:
+        raise Exception(inGlbFileName + " contains no triangles")
+    return np.concatenate(positions), np.concatenate(normals), np.concatenate(triangles)
+
+
+def get_heading_rotations(headings):
+    """
+        Function Description:
+        Computes the rotation quaternions of headings (clockwise from north, as the heading of
+        the symbols in the web app) around the up axis of glTF (y).
+
+        Parameters
+        ----------
+        headings: array
+            Headings in [°]
+
+        Returns
+        -------
+        rotations: array
+            Unit quaternions (x, y, z, w) of the rotations
+    """
+    halfAngles = np.radians(np.asarray(headings, dtype = np.float64)) / 2
+    rotations = np.zeros((len(halfAngles), 4))
+    rotations[:, 1] = -np.sin(halfAngles)      # Clockwise seen from above (y up, -z north)
+    rotations[:, 3] = np.cos(halfAngles)
+    return rotations
+
+
+def get_instance_groups(ClassData, zData, ClassBreaks, levelBands, HeadingData = None, headingFactor = 1.0):
+    """
+        Function Description:
+        Computes the instances of the classified voxels of a cube vectorized and groups them by
+        level band and class break.
+
+        Parameters
+        ----------
+        ClassData: masked array
+            Class values (Z, latitude, longitude), masked cells have no instance
+        zData: array
+            Coordinates of the Z dimension [m]
+        ClassBreaks: list
+            [minimum, maximum] class value per class break (not overlapping)
+        levelBands: list
+            Boundaries of the level bands [m], ascending
+        HeadingData: masked array
+            Values of the heading variable (Z, latitude, longitude), no rotation if None
+        headingFactor: float
+            Factor of the heading variable to degrees (e.g. 45 for the wind direction sectors)
+
+        Returns
+        -------
+        voxels: array
+            Grid indices (Z, latitude, longitude) of the instances, sorted by group
+        headings: array
+            Heading of the instances in [°]
+        groups: list
+            [level band, class break, first instance, number of instances] per group
+    """
+    valid = ~np.ma.getmaskarray(ClassData)
+    [zIndex, yIndex, xIndex] = np.nonzero(valid)
+    values = np.ma.getdata(ClassData)[zIndex, yIndex, xIndex]
+
+    # 1. Class break of the instances (breaks sorted by their minimum)
+    minimums = np.array([minimum for [minimum, maximum] in ClassBreaks], dtype = np.float64)
+    maximums = np.array([maximum for [minimum, maximum] in ClassBreaks], dtype = np.float64)
+    breakOrder = np.argsort(minimums)
+    sortedBreak = np.searchsorted(minimums[breakOrder], values, side = 'right') - 1
+    breakIndex = breakOrder[np.maximum(sortedBreak, 0)]
+    inBreak = (sortedBreak >= 0) & (values <= maximums[breakIndex])
+
+    # 2. Level band of the instances
+    bandIndex = np.searchsorted(levelBands, zData[zIndex], side = 'right')
+
+    # 3. Sort the instances by group (level band, class break)
+    groupKeys = (bandIndex * len(ClassBreaks) + breakIndex)[inBreak]
+    order = np.argsort(groupKeys, kind = 'stable')
+    voxels = np.stack([zIndex, yIndex, xIndex], axis = 1)[inBreak][order]
+    if HeadingData is None:
+        headings = np.zeros(len(voxels))
+    else:
+        headings = np.ma.getdata(HeadingData)[voxels[:, 0], voxels[:, 1], voxels[:, 2]].astype(np.float64) * headingFactor
+    [keys, firstInstances, instanceCounts] = np.unique(groupKeys[order], return_index = True, return_counts = True)
+    groups = [[int(key) // len(ClassBreaks), int(key) % len(ClassBreaks), int(first), int(count)] for key, first, count in zip(keys, firstInstances, instanceCounts)]
+    return voxels, headings, groups
+
+
+def write_instanced_glb(positions, normals, triangles, instanceGroups, outFileName, symbolName, extras = None):
+    """
+        Function Description:
+        Writes a symbol model with the transforms of its instances as binary glTF 2.0 (.glb,
+        extension EXT_mesh_gpu_instancing). Every group is a node with the shared geometry, its
+        own material and the translations, rotations and scales of its instances.
+
+        Parameters
+        ----------
+        positions: array
+            Coordinates of the vertices of the model
+        normals: array
+            Normals of the vertices of the model
+        triangles: array
+            Vertex indices of the triangles of the model
+        instanceGroups: list
+            [group name, color (red, green, blue, alpha), translations, rotations, scales] per group
+        outFileName: string
+            Path to output file (.glb)
+        symbolName: string
+            Name of the symbol
+        extras: dict
+            Application specific data of the scene (e.g. origin of the local coordinates)
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+    """
+    [indexType, componentType] = ['<u2', 5123] if len(positions) < 65536 else ['<u4', 5125]
+    bufferViews = []
+    accessors = []
+    bufferData = b''
+
+    def add_accessor(values, dtype, componentType, accessorType, target = None, bounds = False):
+        nonlocal bufferData
+        data = np.ascontiguousarray(values, dtype = dtype).tobytes()
+        bufferView = {"buffer": 0, "byteOffset": len(bufferData), "byteLength": len(data)}
+        if target is not None:
+            bufferView["target"] = target
+        accessor = {"bufferView": len(bufferViews), "componentType": componentType, "count": int(len(values) if accessorType != "SCALAR" else np.size(values)), "type": accessorType}
+        if bounds:
+            accessor.update({"min": values.min(axis = 0).astype(np.float32).tolist(), "max": values.max(axis = 0).astype(np.float32).tolist()})
+        bufferViews.append(bufferView)
+        accessors.append(accessor)
+        bufferData += data + b'\x00' * (-len(data) % 4)
+        return len(accessors) - 1
+
+    # 1. Geometry of the model (shared by all groups)
+    attributes = {"POSITION": add_accessor(positions, '<f4', 5126, "VEC3", 34962, True),
+                  "NORMAL": add_accessor(normals, '<f4', 5126, "VEC3", 34962)}
+    indices = add_accessor(triangles, indexType, componentType, "SCALAR", 34963)
+
+    # 2. One node per group with the transforms of its instances
+    nodes = []
+    meshes = []
+    materials = []
+    for [groupName, color, translations, rotations, scales] in instanceGroups:
+        materials.append({"name": groupName, "doubleSided": True, "alphaMode": "BLEND" if color[3] < 1 else "OPAQUE",
+                          "pbrMetallicRoughness": {"baseColorFactor": [float(value) for value in color], "metallicFactor": 0.0, "roughnessFactor": 1.0}})
+        meshes.append({"name": groupName, "primitives": [{"attributes": attributes, "indices": indices, "material": len(materials) - 1, "mode": 4}]})
+        nodes.append({"name": groupName, "mesh": len(meshes) - 1,
+                      "extensions": {"EXT_mesh_gpu_instancing": {"attributes": {"TRANSLATION": add_accessor(translations, '<f4', 5126, "VEC3"),
+                                                                                "ROTATION": add_accessor(rotations, '<f4', 5126, "VEC4"),
+                                                                                "SCALE": add_accessor(scales, '<f4', 5126, "VEC3")}}}})
+
+    gltf = {"asset": {"version": "2.0", "generator": "3D-SigWX InstancedSymbols"},
+            "extensionsUsed": ["EXT_mesh_gpu_instancing"],
+            "extensionsRequired": ["EXT_mesh_gpu_instancing"],
+            "scene": 0,
+            "scenes": [{"name": symbolName, "nodes": list(range(len(nodes))), "extras": extras or {}}],
+            "nodes": nodes,
+            "meshes": meshes,
+            "materials": materials,
+            "buffers": [{"byteLength": len(bufferData)}],
+            "bufferViews": bufferViews,
+            "accessors": accessors}
+    return pack_glb(gltf, bufferData, outFileName)
+
+
+def CreateInstancedSymbols(inNetCDFFileName, VariableName, Symbols, DimensionNames, outFolder, LayerName, Timestamp, HeadingVariable = None, timeOffset = 0, levelBands = None):
+    """
+        Function Description:
+        Writes the instanced symbol batches of a classified NetCDF file, one batch per symbol,
+        time step and level band with instances (Timestamp_LayerName_SymbolName_BandNumber_TimeStep.glb).
+        The instances are placed at the classified voxels and scaled to the size of the symbol.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        VariableName: string
+            Name of the classified variable (e.g. CloudClassification or WindItem)
+        Symbols: list
+            [symbol name, path to symbol model (.glb), size [width, height, depth] in meters,
+            [[class name, minimum, maximum, color (red, green, blue, alpha)] per class break]] per symbol
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        outFolder: string
+            Path to the folder of the batches
+        LayerName: string
+            Name of Layer (corresponds to Meteorological Parameter)
+        Timestamp: string
+            Timestamp of the current NetCDF file
+        HeadingVariable: list
+            [variable name, factor to degrees] of the heading of the symbols, no rotation if None
+        timeOffset: int
+            Number of the first time step of the file
+        levelBands: list
+            Boundaries of the level bands [m] (None uses the level bands of set_instanced_symbols)
+
+        Returns
+        -------
+        instanceFiles: list
+            [symbol name, level band, time step, path to batch (.glb), number of instances] per batch
+    """
+    if isinstance(VariableName, (list, tuple)):
+        [VariableName] = VariableName
+    if levelBands is None:
+        levelBands = instanceSettings["levelBands"]
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    os.makedirs(outFolder, exist_ok = True)
+
+    # 1. Symbol models and class breaks of all symbols
+    models = [read_symbol_model(modelFileName) for [symbolName, modelFileName, size, classBreaks] in Symbols]
+    ClassBreaks = [[minimum, maximum] for [symbolName, modelFileName, size, classBreaks] in Symbols for [breakName, minimum, maximum, color] in classBreaks]
+    breakSymbols = [[symbolIndex, breakName, color] for symbolIndex, [symbolName, modelFileName, size, classBreaks] in enumerate(Symbols) for [breakName, minimum, maximum, color] in classBreaks]
+    # Scale of the model to the size of the symbol (width: x, height: y, depth: z)
+    modelScales = [np.array(size, dtype = np.float64) / np.where(np.ptp(positions, axis = 0) > 0, np.ptp(positions, axis = 0), 1.0)
+                   for [positions, normals, triangles], [symbolName, modelFileName, size, classBreaks] in zip(models, Symbols)]
+    bandBounds = [None] + list(levelBands) + [None]
+
+    inNetCDFFile = open_merged_file(inNetCDFFileName)
+    zData = np.ma.getdata(inNetCDFFile.variables[zDimension][:]).astype(np.float64)
+    yData = np.ma.getdata(inNetCDFFile.variables[yDimension][:]).astype(np.float64)
+    xData = np.ma.getdata(inNetCDFFile.variables[xDimension][:]).astype(np.float64)
+    inNetCDFFile.close()
+
+    instanceFiles = []
+    for timeStep, timeValue, VariableData in iterate_merged_timesteps(inNetCDFFileName, [VariableName] + ([HeadingVariable[0]] if HeadingVariable else []), True, timeDimension):
+        # 2. Instances of all symbols of the time step
+        HeadingData = VariableData[1] if HeadingVariable else None
+        [voxels, headings, groups] = get_instance_groups(VariableData[0], zData, ClassBreaks, levelBands,
+                                                         HeadingData, HeadingVariable[1] if HeadingVariable else 1.0)
+        if not groups:
+            continue
+        [translations, origin, flipOrientation] = grid_to_local(voxels.astype(np.float64), zData, yData, xData)
+        rotations = get_heading_rotations(headings)
+
+        # 3. One batch per symbol and level band
+        batches = {}
+        for [bandIndex, breakIndex, firstInstance, instanceCount] in groups:
+            [symbolIndex, breakName, color] = breakSymbols[breakIndex]
+            instances = slice(firstInstance, firstInstance + instanceCount)
+            batches.setdefault((symbolIndex, bandIndex), []).append([breakName, color, translations[instances], rotations[instances],
+                                                                     np.tile(modelScales[symbolIndex], (instanceCount, 1))])
+        for (symbolIndex, bandIndex), instanceGroups in sorted(batches.items()):
+            symbolName = Symbols[symbolIndex][0]
+            batchName = Timestamp + "_" + LayerName + "_" + symbolName + "_Band" + str(bandIndex) + "_" + str(timeOffset + timeStep).zfill(2)
+            outFileName = os.path.join(outFolder, batchName + ".glb").replace(os.sep, '/')
+            [positions, normals, triangles] = models[symbolIndex]
+            write_instanced_glb(positions, normals, triangles, instanceGroups, outFileName, batchName,
+                                {"origin": origin + [0.0], "spatialReference": 4326, "variable": VariableName, "symbol": symbolName,
+                                 "levelBand": bandBounds[bandIndex: bandIndex + 2], "timeStep": timeOffset + timeStep})
+            instanceFiles.append([symbolName, bandIndex, timeOffset + timeStep, outFileName, sum(len(group[2]) for group in instanceGroups)])
+
+    return instanceFiles
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    set_instanced_symbols(True, [float(levelBand) for levelBand in sys.argv[4].split(",")] if len(sys.argv) > 4 else [])
+    if sys.argv[2] == "HorizontalWind":
+        [VariableName, Symbols, HeadingVariable] = ["WindItem", get_wind_barb_symbols(instanceSettings["symbolFolder"]), ["WindDirection", 45.0]]
+    else:
+        [VariableName, Symbols, HeadingVariable] = ["CloudClassification", get_cloud_symbols(instanceSettings["symbolFolder"]), None]
+    startTime = time.perf_counter()
+    instanceFiles = CreateInstancedSymbols(sys.argv[1], VariableName, Symbols, ['time', 'Z', 'latitude', 'longitude'], sys.argv[3], sys.argv[2],
+                                           os.path.splitext(os.path.basename(sys.argv[1]))[0], HeadingVariable)
+    for [symbolName, bandIndex, timeStep, outFileName, instanceCount] in instanceFiles:
+        print(outFileName + ": " + str(instanceCount) + " instances")
+    print("%d batches written in %.2f s" % (len(instanceFiles), time.perf_counter() - startTime))
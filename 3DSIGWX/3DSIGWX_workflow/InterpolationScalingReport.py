@@ -0,0 +1,159 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  InterpolationScalingReport
+ Source Name:       InterpolationScalingReport.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Clipped NetCDF file (optional, synthetic COSMO columns otherwise)
+                    Worker counts (optional, e.g. 1,2,4,8,16,32)
+
+ Description:       Measures the run time of the parallel interpolation of the HeightAssignment
+                    (see VerticalInterpolation.py) for different numbers of worker processes and 
+                    prints the speed-up compared to the interpolation in a single process.
+                    The weight cache is disabled, so every run computes the interpolation weights.
+
+                    Usage: python InterpolationScalingReport.py [NetCDF file] [worker counts]
+                    
+  
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, time
+from netCDF4 import Dataset
+
+from VerticalInterpolation import *
+
+
+def synthetic_columns(nLevels, nLatitude, nLongitude, nTime):
+    """
+        Function Description: 
+        Creates a geometric height field and a variable with the shape of a COSMO-1E file.
+
+        Parameters
+        ----------
+        nLevels: int
+            Number of model levels
+        nLatitude: int
+            Number of latitude rows
+        nLongitude: int
+            Number of longitude columns
+        nTime: int
+            Number of timestamps
+
+        Returns
+        -------
+        GeometricHeight: array
+            Geometric height (levels, latitude, longitude)
+        VariableData: array
+            Variable values (time, levels, latitude, longitude)
+    """
+    rng = np.random.default_rng(0)
+    terrain = rng.uniform(200, 4000, (nLatitude, nLongitude))
+    levelSpacing = np.geomspace(20, 1000, nLevels)[::-1]
+    GeometricHeight = (terrain[np.newaxis] + np.cumsum(levelSpacing[::-1])[::-1, np.newaxis, np.newaxis]).astype(np.float32)
+    VariableData = rng.normal(size=(nTime, nLevels, nLatitude, nLongitude)).astype(np.float32)
+    return GeometricHeight, VariableData
+
+
+def read_columns(inNetCDFFileName, ncVarName):
+    """
+        Function Description: 
+        Reads the geometric height and a level-based variable from a clipped NetCDF file.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Name of Input NetCDF File
+        ncVarName: string
+            Name of the variable to interpolate
+
+        Returns
+        -------
+        GeometricHeight: array
+            Geometric height (levels, latitude, longitude)
+        VariableData: array
+            Variable values (time, levels, latitude, longitude)
+    """
+    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    GeometricHeight = np.ma.getdata(inNetCDFFile.variables['HEIGHT'][:])
+    VariableData = np.ma.getdata(inNetCDFFile.variables[ncVarName][:])
+    inNetCDFFile.close()
+    return GeometricHeight, VariableData
+
+
+def scaling_report(GeometricHeight, VariableData, workerCounts, AmountofLayers = 24, MaxHeight = 7000, repetitions = 3):
+    """
+        Function Description: 
+        Interpolates the variable with every worker count and prints the best run time of
+        "repetitions" runs and the speed-up compared to the single process interpolation.
+
+        Parameters
+        ----------
+        GeometricHeight: array
+            Geometric height (levels, latitude, longitude)
+        VariableData: array
+            Variable values (time, levels, latitude, longitude)
+        workerCounts: list
+            Numbers of worker processes to measure
+        AmountofLayers: int
+            Number of Layers in new vertical coordinate system
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+        repetitions: int
+            Number of runs per worker count
+
+        Returns
+        -------
+        report: list
+            [workers, time [s], speed-up] per worker count
+    """
+    fill_value = -3.4028235e+38
+    zCoordinates = np.linspace(MaxHeight, 0, num = AmountofLayers)
+    set_weight_cache(None, 0)
+    weightCacheSettings["memoryEntries"] = 0       # Compute the weights in every run
+
+    # 1. Reference: interpolation in the current process
+    runTimes = []
+    for _ in range(repetitions):
+        startTime = time.perf_counter()
+        weights = compute_interpolation_weights(GeometricHeight, zCoordinates)
+        reference = apply_interpolation_weights(VariableData, *weights, fill_value)
+        runTimes.append(time.perf_counter() - startTime)
+    serialTime = min(runTimes)
+
+    # 2. Process pool with different numbers of workers
+    report = []
+    print("Grid (time, levels, latitude, longitude): " + str(VariableData.shape) + ", CPUs: " + str(os.cpu_count()))
+    print("{:>8} {:>10} {:>9}".format("workers", "time [s]", "speed-up"))
+    print("{:>8} {:>10.3f} {:>9.2f}".format("serial", serialTime, 1.0))
+    for nWorkers in workerCounts:
+        set_interpolation_workers(nWorkers)
+        interpolate_parallel(GeometricHeight, [VariableData], zCoordinates, AmountofLayers, MaxHeight, fill_value)   # Start the worker processes
+        runTimes = []
+        for _ in range(repetitions):
+            startTime = time.perf_counter()
+            [result] = interpolate_parallel(GeometricHeight, [VariableData], zCoordinates, AmountofLayers, MaxHeight, fill_value)
+            runTimes.append(time.perf_counter() - startTime)
+        if not np.array_equal(result, reference):
+            raise Exception("Parallel interpolation differs from the single process interpolation")
+        report.append([nWorkers, min(runTimes), serialTime / min(runTimes)])
+        print("{:>8} {:>10.3f} {:>9.2f}".format(nWorkers, min(runTimes), serialTime / min(runTimes)))
+        shutdown_interpolation_pool()
+
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        [GeometricHeight, VariableData] = read_columns(sys.argv[1], 'T')
+        workerArgument = sys.argv[2] if len(sys.argv) > 2 else None
+    else:
+        [GeometricHeight, VariableData] = synthetic_columns(80, 350, 600, 1)      # Full Extent of COSMO-1E (Switzerland)
+        workerArgument = sys.argv[1] if len(sys.argv) > 1 else None
+
+    if workerArgument:
+        workerCounts = [int(n) for n in workerArgument.split(",")]
+    else:
+        workerCounts = [n for n in [1, 2, 4, 8, 16, 32] if n <= (os.cpu_count() or 1)]
+    scaling_report(GeometricHeight, VariableData, workerCounts)
@@ -0,0 +1,547 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  IsosurfaceMesh
+ Source Name:       IsosurfaceMesh.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         NetCDF file (e.g. HeightAssignment output with CLC or merged Icing file)
+                    Variable name and isovalues
+                    Output folder of the meshes (.glb)
+
+ Description:       Extraction of isosurface meshes from the interpolated cubes (Z, latitude,
+                    longitude), e.g. the cloud area fraction CLC at the lower bound of an
+                    okta class or the icing areas. The surfaces are extracted with marching
+                    tetrahedra (every grid cell is split into six tetrahedra along its main
+                    diagonal), vectorized with numpy over all cells crossed by the surface.
+                    The cube is padded with one layer outside of the surface, thus the
+                    meshes are closed at the border of the extent. The meshes are decimated
+                    to a maximum number of triangles (vertex clustering in grid coordinates)
+                    and written as binary glTF (.glb), one mesh per isovalue and time step.
+                    The vertices are local coordinates in meters (x east, y up, z south)
+                    around the origin stored in the extras of the glTF scene (longitude,
+                    latitude).
+
+                    Usage: python IsosurfaceMesh.py NetCDF-file Variable isovalue[,isovalue] output-folder
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, json, struct, time
+from netCDF4 import Dataset
+
+from SceneLayerPackage import MetersPerDegree
+from MergeManifest import open_merged_file, iterate_merged_timesteps
+
+
+# Isosurface meshes of the cloud classes and icing (see set_isosurface_meshes)
+meshSettings = {"cloudClasses": [], "icing": False, "triangleBudget": 20000}
+
+# Corners of a grid cell (bits z, y, x) and the six tetrahedra along the diagonal 0 - 7
+CellCorners = np.array([[(corner >> 2) & 1, (corner >> 1) & 1, corner & 1] for corner in range(8)])
+CellTetrahedra = np.array([[0, 4, 6, 7], [0, 4, 5, 7], [0, 2, 6, 7], [0, 2, 3, 7], [0, 1, 5, 7], [0, 1, 3, 7]])
+
+# Number of grid cells (triangles for the decimation) processed at once
+CellBlockSize = 100000
+
+
+def set_isosurface_meshes(CloudClasses, Icing = False, TriangleBudget = 20000):
+    """
+        Function Description:
+        Defines the isosurface meshes created by the Cloud and Icing workflows.
+
+        Parameters
+        ----------
+        CloudClasses: list
+            Okta classes (1 - 8) with a mesh of the CLC at the lower bound of the class (empty: no meshes)
+        Icing: bool
+            If true, a mesh of the icing areas is created
+        TriangleBudget: int
+            Maximum number of triangles per mesh
+
+        Returns
+        -------
+
+    """
+    CloudClasses = sorted(int(cloudClass) for cloudClass in (CloudClasses or []))
+    if CloudClasses and (CloudClasses[0] < 1 or CloudClasses[-1] > 8):
+        raise Exception("Invalid isosurface cloud classes " + str(CloudClasses) + ", the classes must be 1 - 8 (the lower bound of class 0 encloses the whole domain)")
+    meshSettings["cloudClasses"] = CloudClasses
+    meshSettings["icing"] = bool(Icing)
+    meshSettings["triangleBudget"] = max(int(TriangleBudget), 1)
+
+
+def get_okta_color(okta):
+    """
+        Function Description:
+        Color of an okta class in the web app (white to grey, more opaque for higher classes),
+        used for the cloud meshes and the instanced cloud symbols (see InstancedSymbols.py).
+
+        Parameters
+        ----------
+        okta: int
+            Okta class
+
+        Returns
+        -------
+        color: list
+            Red, green, blue and alpha in 0 - 1
+    """
+    grey = 1 - (1 - 82 / 255) * okta / 8
+    return [grey, grey, grey, 0.4 + 0.05 * okta]
+
+
+def get_edge_vertices(edgeKeys, padded, isoValue):
+    """
+        Function Description:
+        Computes the vertices of the isosurface on the edges of the grid (linear
+        interpolation between the two corners of the edge).
+
+        Parameters
+        ----------
+        edgeKeys: array
+            Edges (first corner * number of cells + second corner, flat indices of the grid)
+        padded: array
+            Values of the padded cube
+        isoValue: float
+            Isovalue of the surface
+
+        Returns
+        -------
+        vertices: array
+            Vertices in grid index coordinates of the padded cube
+    """
+    [lowCorners, highCorners] = [edgeKeys // padded.size, edgeKeys % padded.size]
+    [lowValues, highValues] = [padded.ravel()[lowCorners], padded.ravel()[highCorners]]
+    weights = ((isoValue - lowValues) / (highValues - lowValues))[:, np.newaxis]
+    lowPositions = np.stack(np.unravel_index(lowCorners, padded.shape), axis = 1).astype(np.float64)
+    highPositions = np.stack(np.unravel_index(highCorners, padded.shape), axis = 1).astype(np.float64)
+    return lowPositions + weights * (highPositions - lowPositions)
+
+
+def extract_isosurface(Data, isoValue):
+    """
+        Function Description:
+        Extracts the isosurface of a 3D cube with marching tetrahedra. Cells with values
+        greater than or equal to the isovalue are inside. The triangles are oriented with the
+        normals pointing outside (towards smaller values).
+
+        Parameters
+        ----------
+        Data: array
+            Values of the cube (Z, latitude, longitude), masked values are outside
+        isoValue: float
+            Isovalue of the surface
+
+        Returns
+        -------
+        vertices: array
+            Vertices in grid index coordinates (Z, latitude, longitude)
+        triangles: array
+            Vertex indices of the triangles
+    """
+    # 1. Pad the cube with values outside of the surface (closed meshes at the border)
+    outsideValue = min(float(np.ma.min(Data)) if np.ma.count(Data) else isoValue, isoValue) - 1
+    padded = np.pad(np.ma.filled(np.ma.masked_invalid(Data).astype(np.float64), outsideValue), 1, constant_values = outsideValue)
+    inside = padded >= isoValue
+    shape = padded.shape
+
+    # 2. Cells crossed by the surface (some but not all corners inside)
+    cellShape = tuple(size - 1 for size in shape)
+    cornerInside = [inside[z:z + cellShape[0], y:y + cellShape[1], x:x + cellShape[2]] for [z, y, x] in CellCorners]
+    anyInside = np.logical_or.reduce(cornerInside)
+    allInside = np.logical_and.reduce(cornerInside)
+    cellOrigins = np.ravel_multi_index(np.nonzero(anyInside & ~allInside), shape)
+    if len(cellOrigins) == 0:
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype = np.int32)
+
+    # 3. Triangles of the cells, block by block (limits the memory of the tetrahedra)
+    cornerOffsets = np.ravel_multi_index(CellCorners.T, shape)
+    triangleKeys = []
+    for blockStart in range(0, len(cellOrigins), CellBlockSize):
+        blockOrigins = cellOrigins[blockStart:blockStart + CellBlockSize]
+
+        # 3.1 Corners of the tetrahedra crossed by the surface, inside corners first
+        tetrahedra = (blockOrigins[:, np.newaxis, np.newaxis] + cornerOffsets[CellTetrahedra]).reshape(-1, 4)
+        tetrahedraInside = inside.ravel()[tetrahedra]
+        insideCount = tetrahedraInside.sum(axis = 1)
+        crossed = (insideCount > 0) & (insideCount < 4)
+        order = np.argsort(~tetrahedraInside[crossed], axis = 1, kind = 'stable')
+        tetrahedra = np.take_along_axis(tetrahedra[crossed], order, axis = 1)
+        insideCount = insideCount[crossed]
+
+        # 3.2 Triangles as edges of the tetrahedra (one inside corner, three inside corners, two inside corners -> two triangles)
+        #     An edge is identified by its two grid corners, thus the neighbouring triangles share the vertex on the edge
+        for count, triangleEdges in [[1, [[[0, 1], [0, 2], [0, 3]]]],
+                                     [3, [[[0, 3], [1, 3], [2, 3]]]],
+                                     [2, [[[0, 2], [0, 3], [1, 3]], [[0, 2], [1, 3], [1, 2]]]]]:
+            countTetrahedra = tetrahedra[insideCount == count]
+            if len(countTetrahedra) == 0:
+                continue
+            cornerPositions = np.stack(np.unravel_index(countTetrahedra, shape), axis = 2).astype(np.float64)
+            outsideDirections = cornerPositions[:, count:].mean(axis = 1) - cornerPositions[:, :count].mean(axis = 1)
+            for edges in np.array(triangleEdges):
+                [edgeStarts, edgeEnds] = [countTetrahedra[:, edges[:, 0]], countTetrahedra[:, edges[:, 1]]]
+                edgeKeys = np.minimum(edgeStarts, edgeEnds) * padded.size + np.maximum(edgeStarts, edgeEnds)
+
+                # 3.3 Orientation: normals in the direction from the inside to the outside corners of the tetrahedra
+                corners = get_edge_vertices(edgeKeys.ravel(), padded, isoValue).reshape(-1, 3, 3)
+                normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+                flipped = np.einsum('ij,ij->i', normals, outsideDirections) < 0
+                edgeKeys[flipped] = edgeKeys[flipped][:, ::-1]
+                triangleKeys.append(edgeKeys)
+
+    # 4. Vertices on the edges (shared by the neighbouring triangles)
+    [edgeKeys, vertexIndex] = np.unique(np.concatenate(triangleKeys).ravel(), return_inverse = True)
+    vertices = get_edge_vertices(edgeKeys, padded, isoValue) - 1
+    triangles = vertexIndex.reshape(-1, 3).astype(np.int32)
+    return vertices, triangles
+
+
+def grid_to_local(vertices, zData, yData, xData):
+    """
+        Function Description:
+        Converts vertices in grid index coordinates to local coordinates in meters (glTF:
+        x east, y up, z south) around the centre of the extent.
+
+        Parameters
+        ----------
+        vertices: array
+            Vertices in grid index coordinates (Z, latitude, longitude)
+        zData, yData, xData: array
+            Coordinates of the Z [m], latitude and longitude dimension
+
+        Returns
+        -------
+        positions: array
+            Local coordinates of the vertices [m]
+        origin: list
+            Longitude and latitude of the origin
+        flipOrientation: bool
+            If true, the conversion mirrors the mesh (the triangles have to be flipped)
+    """
+    origin = [float(np.mean([xData[0], xData[-1]])), float(np.mean([yData[0], yData[-1]]))]
+    [zScale, yScale, xScale] = [1.0, MetersPerDegree, MetersPerDegree * np.cos(np.radians(origin[1]))]
+    z = np.interp(vertices[:, 0], np.arange(len(zData)), zData)
+    y = np.interp(vertices[:, 1], np.arange(len(yData)), yData)
+    x = np.interp(vertices[:, 2], np.arange(len(xData)), xData)
+    positions = np.stack([(x - origin[0]) * xScale, z * zScale, -(y - origin[1]) * yScale], axis = 1)
+    # Directions of the axes (e.g. Z coordinates from top to bottom) of the conversion (Z, latitude, longitude) -> (x, y, z)
+    [zSign, ySign, xSign] = [np.sign(coordinates[-1] - coordinates[0]) if len(coordinates) > 1 else 1 for coordinates in [zData, yData, xData]]
+    flipOrientation = np.linalg.det(np.array([[0, 0, xSign], [zSign, 0, 0], [0, -ySign, 0]])) < 0
+    return positions, origin, flipOrientation
+
+
+def cluster_vertices(positions, triangles, cellSize):
+    """
+        Function Description:
+        Vertex clustering of a mesh: the vertices in the cells of a regular grid are assigned
+        to one cluster per cell, degenerated and duplicate triangles are removed.
+
+        Parameters
+        ----------
+        positions: array
+            Coordinates of the vertices
+        triangles: array
+            Vertex indices of the triangles
+        cellSize: float
+            Size of the grid cells
+
+        Returns
+        -------
+        clusterIndex: array
+            Cluster of every vertex
+        clusterTriangles: array
+            Cluster indices of the remaining triangles
+    """
+    cells = np.floor((positions - positions.min(axis = 0)) / cellSize).astype(np.int64)
+    cellCount = cells.max(axis = 0) + 1
+    cellKeys = (cells[:, 0] * cellCount[1] + cells[:, 1]) * cellCount[2] + cells[:, 2]
+    [_, clusterIndex] = np.unique(cellKeys, return_inverse = True)
+    clusterIndex = clusterIndex.ravel()
+    clusterTriangles = clusterIndex[triangles]
+    clusterTriangles = clusterTriangles[(clusterTriangles[:, 0] != clusterTriangles[:, 1]) & (clusterTriangles[:, 1] != clusterTriangles[:, 2]) &
+                                        (clusterTriangles[:, 0] != clusterTriangles[:, 2])]
+    [_, firstIndex] = np.unique(np.sort(clusterTriangles, axis = 1), axis = 0, return_index = True)
+    return clusterIndex, clusterTriangles[np.sort(firstIndex)]
+
+
+def decimate_mesh(positions, triangles, triangleBudget):
+    """
+        Function Description:
+        Reduces a mesh to at most triangleBudget triangles by vertex clustering (see
+        cluster_vertices), the vertices of a cluster are merged to their mean. The cell size
+        is bracketed between a size above the budget and a size within the budget, then the
+        bracket is bisected, thus the decimated mesh is close to the budget.
+
+        Parameters
+        ----------
+        positions: array
+            Coordinates of the vertices
+        triangles: array
+            Vertex indices of the triangles
+        triangleBudget: int
+            Maximum number of triangles
+
+        Returns
+        -------
+        positions: array
+            Coordinates of the vertices of the decimated mesh
+        triangles: array
+            Vertex indices of the triangles of the decimated mesh
+    """
+    if len(triangles) <= triangleBudget:
+        return positions, triangles
+    area = 0.0
+    for blockStart in range(0, len(triangles), CellBlockSize):
+        corners = positions[triangles[blockStart:blockStart + CellBlockSize]]
+        area += np.linalg.norm(np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0]), axis = 1).sum() / 2
+    cellSize = max(np.sqrt(2 * area / triangleBudget), 1e-6)
+
+    # 1. Bracket: the smallest tried cell size above the budget and the largest within the budget
+    fineSize = None
+    coarseSize = None
+    while fineSize is None or coarseSize is None:
+        [clusterIndex, clusterTriangles] = cluster_vertices(positions, triangles, cellSize)
+        if len(clusterTriangles) <= triangleBudget:
+            coarseSize = cellSize
+            coarseClusters = [clusterIndex, clusterTriangles]
+            cellSize /= 1.25
+        else:
+            fineSize = cellSize
+            cellSize *= 1.25
+        if fineSize is None and cellSize < 1e-6:
+            fineSize = cellSize     # Cells smaller than the grid keep the mesh as it is
+
+    # 2. Bisection of the cell size (largest mesh within the budget, to 1 % of the cell size)
+    while coarseSize - fineSize > 0.01 * coarseSize:
+        cellSize = (fineSize + coarseSize) / 2
+        [clusterIndex, clusterTriangles] = cluster_vertices(positions, triangles, cellSize)
+        if len(clusterTriangles) <= triangleBudget:
+            coarseSize = cellSize
+            coarseClusters = [clusterIndex, clusterTriangles]
+        else:
+            fineSize = cellSize
+    [clusterIndex, clusterTriangles] = coarseClusters
+
+    # Mean position of the clusters, only the clusters used by the triangles are kept
+    clusterCount = clusterIndex.max() + 1
+    vertexCount = np.bincount(clusterIndex, minlength = clusterCount)
+    clusterPositions = np.stack([np.bincount(clusterIndex, weights = positions[:, axis], minlength = clusterCount) for axis in range(3)], axis = 1) / vertexCount[:, np.newaxis]
+    [usedClusters, triangles] = np.unique(clusterTriangles, return_inverse = True)
+    return clusterPositions[usedClusters], triangles.reshape(-1, 3)
+
+
+def compute_vertex_normals(positions, triangles):
+    """
+        Function Description:
+        Computes the normals of the vertices (area weighted mean of the triangle normals).
+
+        Parameters
+        ----------
+        positions: array
+            Coordinates of the vertices
+        triangles: array
+            Vertex indices of the triangles
+
+        Returns
+        -------
+        normals: array
+            Unit normals of the vertices
+    """
+    corners = positions[triangles]
+    faceNormals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    normals = np.stack([np.bincount(triangles.ravel(), weights = np.repeat(faceNormals[:, axis], 3), minlength = len(positions)) for axis in range(3)], axis = 1)
+    length = np.linalg.norm(normals, axis = 1)[:, np.newaxis]
+    return np.where(length > 0, normals / np.maximum(length, 1e-12), [0.0, 1.0, 0.0])
+
+
+def pack_glb(gltf, bufferData, outFileName):
+    """
+        Function Description:
+        Writes the JSON description and the binary buffer of a glTF 2.0 asset as binary glTF
+        (.glb, chunks padded to 4 bytes).
+
+        Parameters
+        ----------
+        gltf: dict
+            JSON description of the asset (the length of the buffer is set by the caller)
+        bufferData: bytes
+            Content of the binary buffer
+        outFileName: string
+            Path to output file (.glb)
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+    """
+    jsonData = json.dumps(gltf, separators = (',', ':')).encode('utf-8')
+    jsonData += b' ' * (-len(jsonData) % 4)
+    bufferData += b'\x00' * (-len(bufferData) % 4)
+
+    with open(outFileName, 'wb') as glbFile:
+        glbFile.write(struct.pack('<III', 0x46546C67, 2, 12 + 8 + len(jsonData) + 8 + len(bufferData)))
+        glbFile.write(struct.pack('<II', len(jsonData), 0x4E4F534A) + jsonData)
+        glbFile.write(struct.pack('<II', len(bufferData), 0x004E4942) + bufferData)
+    return outFileName
+
+
+def write_glb(positions, normals, triangles, outFileName, meshName, color, extras = None):
+    """
+        Function Description:
+        Writes a triangle mesh as binary glTF 2.0 (.glb) with one buffer (positions and
+        normals as float32, indices as uint16 or uint32).
+
+        Parameters
+        ----------
+        positions: array
+            Coordinates of the vertices
+        normals: array
+            Normals of the vertices
+        triangles: array
+            Vertex indices of the triangles
+        outFileName: string
+            Path to output file (.glb)
+        meshName: string
+            Name of the mesh
+        color: list
+            Base color of the material (red, green, blue, alpha in 0 - 1)
+        extras: dict
+            Application specific data of the scene (e.g. origin of the local coordinates)
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+    """
+    positionData = np.ascontiguousarray(positions, dtype = '<f4').tobytes()
+    normalData = np.ascontiguousarray(normals, dtype = '<f4').tobytes()
+    [indexType, componentType] = ['<u2', 5123] if len(positions) < 65536 else ['<u4', 5125]
+    indexData = np.ascontiguousarray(triangles, dtype = indexType).tobytes()
+    indexData += b'\x00' * (-len(indexData) % 4)
+    bufferData = positionData + normalData + indexData
+
+    gltf = {"asset": {"version": "2.0", "generator": "3D-SigWX IsosurfaceMesh"},
+            "scene": 0,
+            "scenes": [{"name": meshName, "nodes": [0], "extras": extras or {}}],
+            "nodes": [{"name": meshName, "mesh": 0}],
+            "meshes": [{"name": meshName, "primitives": [{"attributes": {"POSITION": 0, "NORMAL": 1}, "indices": 2, "material": 0, "mode": 4}]}],
+            "materials": [{"name": meshName, "doubleSided": True, "alphaMode": "BLEND" if color[3] < 1 else "OPAQUE",
+                           "pbrMetallicRoughness": {"baseColorFactor": [float(value) for value in color], "metallicFactor": 0.0, "roughnessFactor": 1.0}}],
+            "buffers": [{"byteLength": len(bufferData)}],
+            "bufferViews": [{"buffer": 0, "byteOffset": 0, "byteLength": len(positionData), "target": 34962},
+                            {"buffer": 0, "byteOffset": len(positionData), "byteLength": len(normalData), "target": 34962},
+                            {"buffer": 0, "byteOffset": len(positionData) + len(normalData), "byteLength": triangles.size * np.dtype(indexType).itemsize, "target": 34963}],
+            "accessors": [{"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+                           "min": positions.min(axis = 0).astype(np.float32).tolist(), "max": positions.max(axis = 0).astype(np.float32).tolist()},
+                          {"bufferView": 1, "componentType": 5126, "count": len(normals), "type": "VEC3"},
+                          {"bufferView": 2, "componentType": componentType, "count": int(triangles.size), "type": "SCALAR"}]}
+    return pack_glb(gltf, bufferData, outFileName)
+
+
+def create_isosurface_mesh(Data, isoValue, zData, yData, xData, triangleBudget):
+    """
+        Function Description:
+        Extracts, converts and decimates the isosurface of a cube.
+
+        Parameters
+        ----------
+        Data: array
+            Values of the cube (Z, latitude, longitude)
+        isoValue: float
+            Isovalue of the surface
+        zData, yData, xData: array
+            Coordinates of the Z [m], latitude and longitude dimension
+        triangleBudget: int
+            Maximum number of triangles
+
+        Returns
+        -------
+        positions: array
+            Local coordinates of the vertices [m]
+        triangles: array
+            Vertex indices of the triangles
+        origin: list
+            Longitude and latitude of the origin of the local coordinates
+    """
+    [vertices, triangles] = extract_isosurface(Data, isoValue)
+    # Decimation in grid coordinates (the extent in meters is much larger horizontally than vertically)
+    [vertices, triangles] = decimate_mesh(vertices, triangles, triangleBudget)
+    [positions, origin, flipOrientation] = grid_to_local(vertices, zData, yData, xData)
+    if flipOrientation:
+        triangles = triangles[:, ::-1]
+    return positions, triangles, origin
+
+
+def CreateIsosurfaceMeshes(inNetCDFFileName, VariableName, IsoSurfaces, DimensionNames, outFolder, LayerName, Timestamp, timeOffset = 0, triangleBudget = None):
+    """
+        Function Description:
+        Writes the isosurfaces of a variable as binary glTF meshes, one mesh per isosurface
+        and time step (Timestamp_LayerName_SurfaceName_TimeStep.glb). Time steps without
+        surface are skipped. In-memory intermediate files are read from their memory buffer
+        (see StageHandoff.py).
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. HeightAssignment output or merged file) or manifest of a virtual merge (.json)
+        VariableName: string
+            Name of the variable
+        IsoSurfaces: list
+            [surface name, isovalue, color (red, green, blue, alpha)] per isosurface
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        outFolder: string
+            Path to the folder of the meshes
+        LayerName: string
+            Name of Layer (corresponds to Meteorological Parameter)
+        Timestamp: string
+            Timestamp of the current NetCDF file
+        timeOffset: int
+            Number of the first time step of the file (e.g. forecast hour of the file)
+        triangleBudget: int
+            Maximum number of triangles per mesh (None uses the value of set_isosurface_meshes)
+
+        Returns
+        -------
+        meshFiles: list
+            [surface name, time step, path to mesh (.glb), number of triangles] per mesh
+    """
+    if triangleBudget is None:
+        triangleBudget = meshSettings["triangleBudget"]
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    os.makedirs(outFolder, exist_ok = True)
+
+    inNetCDFFile = open_merged_file(inNetCDFFileName)
+    zData = np.ma.getdata(inNetCDFFile.variables[zDimension][:]).astype(np.float64)
+    yData = np.ma.getdata(inNetCDFFile.variables[yDimension][:]).astype(np.float64)
+    xData = np.ma.getdata(inNetCDFFile.variables[xDimension][:]).astype(np.float64)
+    inNetCDFFile.close()
+
+    meshFiles = []
+    for timeStep, timeValue, [Data] in iterate_merged_timesteps(inNetCDFFileName, [VariableName], True, timeDimension):
+        for [surfaceName, isoValue, color] in IsoSurfaces:
+            [positions, triangles, origin] = create_isosurface_mesh(Data, isoValue, zData, yData, xData, triangleBudget)
+            if len(triangles) == 0:
+                continue
+            meshName = Timestamp + "_" + LayerName + "_" + surfaceName + "_" + str(timeOffset + timeStep).zfill(2)
+            outFileName = os.path.join(outFolder, meshName + ".glb").replace(os.sep, '/')
+            write_glb(positions, compute_vertex_normals(positions, triangles), triangles, outFileName, meshName, color,
+                      {"origin": origin + [0.0], "spatialReference": 4326, "variable": VariableName, "isoValue": float(isoValue), "timeStep": timeOffset + timeStep})
+            meshFiles.append([surfaceName, timeOffset + timeStep, outFileName, len(triangles)])
+
+    return meshFiles
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5:
+        print(__doc__)
+        sys.exit(1)
+    IsoSurfaces = [[variableValue.replace(".", "_"), float(variableValue), [1.0, 1.0, 1.0, 0.6]] for variableValue in sys.argv[3].split(",")]
+    startTime = time.perf_counter()
+    meshFiles = CreateIsosurfaceMeshes(sys.argv[1], sys.argv[2], IsoSurfaces, ['time', 'Z', 'latitude', 'longitude'], sys.argv[4], sys.argv[2], "Mesh")
+    for [surfaceName, timeStep, outFileName, triangleCount] in meshFiles:
+        print(outFileName + ": " + str(triangleCount) + " triangles")
+    print("%d meshes written in %.2f s" % (len(meshFiles), time.perf_counter() - startTime))
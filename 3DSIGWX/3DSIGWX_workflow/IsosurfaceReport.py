@@ -0,0 +1,115 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  IsosurfaceReport
+ Source Name:       IsosurfaceReport.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Triangle budget (optional, default 20000)
+
+ Description:       Measures the run time of the isosurface extraction (see IsosurfaceMesh.py)
+                    for different grid sizes up to the Full Extent of COSMO-1E (Switzerland,
+                    24 layers, 350 x 600 grid points) and prints the time of the extraction,
+                    decimation and glTF writing with the number of triangles. The CLC cubes
+                    are synthetic cloud fields, the isovalue is the lower bound of 4 oktas.
+
+                    Usage: python IsosurfaceReport.py [triangle budget]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, time, tempfile
+
+from IsosurfaceMesh import *
+
+
+def synthetic_cloud_fraction(nLayers, nLatitude, nLongitude):
+    """
+        Function Description:
+        Creates a smooth cloud area fraction field CLC [%] with cloud areas of the same size
+        in degrees for every grid size.
+
+        Parameters
+        ----------
+        nLayers: int
+            Number of Z layers
+        nLatitude: int
+            Number of latitude rows
+        nLongitude: int
+            Number of longitude columns
+
+        Returns
+        -------
+        CLCData: array
+            Cloud area fraction (Z, latitude, longitude)
+    """
+    rng = np.random.default_rng(0)
+    [Z, Y, X] = np.meshgrid(np.linspace(0, 1, nLayers), np.linspace(0, 1, nLatitude), np.linspace(0, 1, nLongitude), indexing = 'ij')
+    field = np.zeros(Z.shape)
+    for _ in range(12):
+        [kz, ky, kx] = rng.uniform(0.5, 6, 3)
+        field += np.sin(2 * np.pi * (kz * Z + rng.uniform())) * np.sin(2 * np.pi * (ky * Y + rng.uniform())) * np.sin(2 * np.pi * (kx * X + rng.uniform()))
+    return np.clip(50 + 25 * field, 0, 100)
+
+
+def isosurface_report(gridSizes, triangleBudget = 20000, isoValue = 43.75, repetitions = 3):
+    """
+        Function Description:
+        Extracts the isosurface for every grid size and prints the best run time of
+        "repetitions" runs of the extraction, the time of the decimation and glTF writing and
+        the number of triangles before and after the decimation.
+
+        Parameters
+        ----------
+        gridSizes: list
+            Grid sizes [layers, latitude rows, longitude columns]
+        triangleBudget: int
+            Maximum number of triangles per mesh
+        isoValue: float
+            Isovalue of the surface (CLC [%])
+        repetitions: int
+            Number of runs of the extraction per grid size
+
+        Returns
+        -------
+        report: list
+            [grid cells, extraction time [s], triangles, decimation and writing time [s], decimated triangles] per grid size
+    """
+    outFolder = tempfile.mkdtemp()
+    report = []
+    print("CPUs: " + str(os.cpu_count()) + ", triangle budget: " + str(triangleBudget))
+    print("{:>18} {:>10} {:>12} {:>10} {:>12} {:>10} {:>10}".format("grid", "cells", "extract [s]", "triangles", "decimate [s]", "triangles", "glb [kB]"))
+    for [nLayers, nLatitude, nLongitude] in gridSizes:
+        CLCData = synthetic_cloud_fraction(nLayers, nLatitude, nLongitude)
+        zData = np.linspace(7000, 0, nLayers)
+        yData = np.linspace(45.6, 47.9, nLatitude)
+        xData = np.linspace(5.8, 10.6, nLongitude)
+
+        # 1. Extraction
+        runTimes = []
+        for _ in range(repetitions):
+            startTime = time.perf_counter()
+            [vertices, triangles] = extract_isosurface(CLCData, isoValue)
+            runTimes.append(time.perf_counter() - startTime)
+
+        # 2. Decimation, conversion and glTF writing
+        startTime = time.perf_counter()
+        [positions, decimatedTriangles, origin] = create_isosurface_mesh(CLCData, isoValue, zData, yData, xData, triangleBudget)
+        outFileName = write_glb(positions, compute_vertex_normals(positions, decimatedTriangles), decimatedTriangles, os.path.join(outFolder, "IsosurfaceReport.glb"),
+                                "IsosurfaceReport", [1.0, 1.0, 1.0, 0.6])
+        meshTime = time.perf_counter() - startTime - min(runTimes)
+        glbSize = os.path.getsize(outFileName)
+        os.remove(outFileName)
+
+        gridName = str(nLayers) + "x" + str(nLatitude) + "x" + str(nLongitude)
+        report.append([CLCData.size, min(runTimes), len(triangles), meshTime, len(decimatedTriangles)])
+        print("{:>18} {:>10} {:>12.3f} {:>10} {:>12.3f} {:>10} {:>10.0f}".format(gridName, CLCData.size, min(runTimes), len(triangles), meshTime, len(decimatedTriangles), glbSize / 1e3))
+
+    return report
+
+
+if __name__ == "__main__":
+    triangleBudget = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    gridSizes = [[12, 44, 75], [24, 88, 150], [24, 175, 300], [24, 350, 600]]      # up to the Full Extent of COSMO-1E (Switzerland)
+    isosurface_report(gridSizes, triangleBudget)
@@ -0,0 +1,245 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  MergeManifest
+ Source Name:       MergeManifest.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file or manifest of a virtual merge (.json)
+
+ Description:       Reading of the merged files of the workflows. A virtual merge (see
+                    MergeNetCDFManifest in MergeNetCDF.py) writes a JSON manifest of the
+                    files instead of copying their data into a merged file. The manifest
+                    is read lazily: only the files of the selected time steps are opened.
+                    The exporters (points, cloud regions, pyramid, isosurface meshes and
+                    instanced symbols) read a merged file and a manifest in the same way,
+                    time step by time step (see iterate_merged_timesteps).
+                    Only depends on numpy and netCDF4, thus the exporters can be used
+                    without ArcGIS.
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import os, json
+from netCDF4 import Dataset
+
+try:
+    from StageHandoff import open_stage_file
+except ImportError:
+    # Without ArcGIS (arcpy) only NetCDF files on disk can be read
+    def open_stage_file(fileName):
+        return Dataset(fileName, 'r')
+
+
+def open_merged_manifest(manifestFileName):
+    """
+        Function Description:
+        Reads the manifest of a virtual merge (see MergeNetCDFManifest).
+
+        Parameters
+        ----------
+        manifestFileName: string
+            Path to manifest file
+
+        Returns
+        -------
+        manifest: dict
+            Files, time offsets, dimensions and attributes of the virtual merge
+    """
+    with open(manifestFileName, 'r') as manifestFile:
+        return json.load(manifestFile)
+
+
+def read_manifest_variable(manifest, varName, key = ()):
+    """
+        Function Description:
+        Reads a variable of a virtual merge. Like slicing a variable of the merged file, only
+        the files which overlap the selected time steps are opened and read.
+
+        Parameters
+        ----------
+        manifest: dict
+            Manifest of the virtual merge (see open_merged_manifest)
+        varName: string
+            Name of the variable
+        key: tuple
+            Index (int) or slice per dimension of the variable (all values if omitted)
+
+        Returns
+        -------
+        VariableData: masked array
+            Values of the selected part of the variable
+    """
+    timeDimension = manifest["timeDimension"]
+    ncVarDimNames = manifest["variables"][varName]["dimensions"]
+    if not isinstance(key, tuple):
+        key = (key,)
+    key = key + (slice(None),) * (len(ncVarDimNames) - len(key))
+
+    # Time coordinate is numbered consecutively over all files
+    if varName == timeDimension:
+        return np.ma.masked_array(manifest["time"], dtype = manifest["variables"][varName]["dtype"])[key]
+
+    # Variables without time dimension are taken from the first file
+    if timeDimension not in ncVarDimNames:
+        inNetCDFFile = Dataset(manifest["files"][0], 'r')
+        VariableData = inNetCDFFile.variables[varName][key]
+        inNetCDFFile.close()
+        return VariableData
+
+    # Split the selected time steps into one slice per file
+    timeIndex = ncVarDimNames.index(timeDimension)
+    timeKey = key[timeIndex]
+    if isinstance(timeKey, slice):
+        timeRange = range(*timeKey.indices(manifest["dimensions"][timeDimension]))
+    else:
+        timeRange = range(timeKey, timeKey + 1) if timeKey >= 0 else range(timeKey + manifest["dimensions"][timeDimension], timeKey + manifest["dimensions"][timeDimension] + 1)
+    fileSlices = []
+    for timeStep in timeRange:
+        fileIndex = int(np.searchsorted(manifest["timeOffsets"], timeStep, side = 'right')) - 1
+        localTimeStep = timeStep - manifest["timeOffsets"][fileIndex]
+        if fileSlices and fileSlices[-1][0] == fileIndex:
+            fileSlices[-1][2] = localTimeStep
+        else:
+            fileSlices.append([fileIndex, localTimeStep, localTimeStep])
+
+    VariableData = []
+    for [fileIndex, localStart, localStop] in fileSlices:
+        localKey = list(key)
+        if isinstance(timeKey, slice):
+            localKey[timeIndex] = slice(localStart, localStop + timeRange.step if localStop + timeRange.step >= 0 else None, timeRange.step)
+        else:
+            localKey[timeIndex] = localStart
+        inNetCDFFile = Dataset(manifest["files"][fileIndex], 'r')
+        VariableData.append(inNetCDFFile.variables[varName][tuple(localKey)])
+        inNetCDFFile.close()
+
+    if not isinstance(timeKey, slice):
+        return VariableData[0]
+    if not VariableData:
+        inNetCDFFile = Dataset(manifest["files"][0], 'r')
+        localKey = list(key)
+        localKey[timeIndex] = slice(0, 0)
+        VariableData.append(inNetCDFFile.variables[varName][tuple(localKey)])
+        inNetCDFFile.close()
+    # Time axis position after integer indices of the preceding dimensions are removed
+    timeAxis = timeIndex - sum(1 for dimKey in key[:timeIndex] if not isinstance(dimKey, slice))
+    return np.ma.concatenate(VariableData, axis = timeAxis)
+
+
+def iterate_manifest_timesteps(manifest, varName):
+    """
+        Function Description:
+        Iterates over the time steps of a variable of a virtual merge. Every file is opened
+        once and only one time step is in memory at once.
+
+        Parameters
+        ----------
+        manifest: dict
+            Manifest of the virtual merge (see open_merged_manifest)
+        varName: string
+            Name of the variable (with time dimension)
+
+        Returns
+        -------
+        (timeValue, VariableData): generator
+            Time value and values of the variable for each time step
+    """
+    timeDimension = manifest["timeDimension"]
+    timeIndex = manifest["variables"][varName]["dimensions"].index(timeDimension)
+    for fileIndex, fileName in enumerate(manifest["files"]):
+        inNetCDFFile = Dataset(fileName, 'r')
+        try:
+            ncVar = inNetCDFFile.variables[varName]
+            for localTimeStep in range(manifest["timeSizes"][fileIndex]):
+                localKey = [slice(None)] * len(ncVar.dimensions)
+                localKey[timeIndex] = localTimeStep
+                yield manifest["time"][manifest["timeOffsets"][fileIndex] + localTimeStep], ncVar[tuple(localKey)]
+        finally:
+            inNetCDFFile.close()    # Also if the iteration is stopped early
+
+
+def is_merged_manifest(inFileName):
+    """
+        Function Description:
+        Checks if a file is the manifest of a virtual merge (.json) instead of a NetCDF file.
+
+        Parameters
+        ----------
+        inFileName: string
+            Path to merged NetCDF file or manifest
+
+        Returns
+        -------
+        isManifest: bool
+            True if the file is a manifest
+    """
+    return os.path.splitext(inFileName)[1].lower() == ".json"
+
+
+def open_merged_file(inFileName):
+    """
+        Function Description:
+        Opens a merged NetCDF file for reading. Of a virtual merge the first file is opened,
+        its dimensions (except time), coordinates and attributes are the same in all files
+        of the manifest. The time steps are read with iterate_merged_timesteps.
+
+        Parameters
+        ----------
+        inFileName: string
+            Path to merged NetCDF file (also in-memory intermediate file) or manifest
+
+        Returns
+        -------
+        inNetCDFFile: Dataset
+            NetCDF dataset opened for reading
+    """
+    if is_merged_manifest(inFileName):
+        return Dataset(open_merged_manifest(inFileName)["files"][0], 'r')
+    return open_stage_file(inFileName)
+
+
+def iterate_merged_timesteps(inFileName, VariableNames, timeEnabled = True, timeDimension = 'time'):
+    """
+        Function Description:
+        Iterates over the time steps of variables of a merged NetCDF file or of a virtual
+        merge. Only one time step of the variables is in memory at once.
+
+        Parameters
+        ----------
+        inFileName: string
+            Path to merged NetCDF file (also in-memory intermediate file) or manifest
+        VariableNames: list
+            Names of the variables (with time dimension)
+        timeEnabled: bool
+            If false, only the first time step is read
+        timeDimension: string
+            Name of the time dimension (of the manifest if a manifest is read)
+
+        Returns
+        -------
+        (timeStep, timeValue, VariableData): generator
+            Number and value of the time step and the values of the variables (list)
+    """
+    if is_merged_manifest(inFileName):
+        manifest = open_merged_manifest(inFileName)
+        iterators = [iterate_manifest_timesteps(manifest, varName) for varName in VariableNames]
+        try:
+            for timeStep, variableSteps in enumerate(zip(*iterators)):
+                if timeStep > 0 and not timeEnabled:
+                    break
+                yield timeStep, variableSteps[0][0], [Data for timeValue, Data in variableSteps]
+        finally:
+            for iterator in iterators:
+                iterator.close()
+        return
+
+    inNetCDFFile = open_stage_file(inFileName)
+    try:
+        timeSize = len(inNetCDFFile.dimensions[timeDimension])
+        timeData = np.ma.getdata(inNetCDFFile.variables[timeDimension][:]) if timeDimension in inNetCDFFile.variables else np.arange(timeSize)
+        for timeStep in range(timeSize if timeEnabled else min(1, timeSize)):
+            yield timeStep, timeData[timeStep], [inNetCDFFile.variables[varName][timeStep] for varName in VariableNames]
+    finally:
+        inNetCDFFile.close()
@@ -8,7 +8,9 @@
                     
 
  Description:       Merge multiple netCDF files along Time Dimension. Used to create a 
-                    timeserie in ArcGIS
+                    timeserie in ArcGIS. Alternatively a virtual merge writes a small JSON
+                    manifest of the files, which is read lazily across the files
+                    (see MergeManifest.py)
  
 ----------------------------------------------------------------------------------'''
 
@@ -21,8 +23,35 @@ import sys, os,re, copy
 from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
+import json
+from StageHandoff import *
+from MergeManifest import *
 
-def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp):
+
+# Virtual merge of the files (JSON manifest instead of a merged file, see set_virtual_merge)
+mergeSettings = {"virtual": False}
+
+
+def set_virtual_merge(VirtualMerge):
+    """
+        Function Description:
+        Defines if MergeNetCDFFunction writes a merged file or the manifest of a virtual merge
+        (see MergeNetCDFManifest). The manifest can only be read by the exporters of the
+        populated voxels, not by MakeNetCDFFeatureLayer.
+
+        Parameters
+        ----------
+        VirtualMerge: bool
+            If true, a manifest is written instead of the merged file
+
+        Returns
+        -------
+
+    """
+    mergeSettings["virtual"] = bool(VirtualMerge)
+
+
+def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp, varNames = None, append = False):
     """
         Function Description:   Function to Merge multiple NetCDF files along the
                                 time Dimension.
@@ -37,15 +66,23 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
             Name of output file
         Timestamp: string
             Timestamp of the current NetCDF file 
+        varNames: list
+            Names of the variables to be merged (optional, all variables if None). Used to
+            skip the other variables of the shared HeightAssignment output
+        append: bool
+            If true and the merged file already exists, the files are appended to it
+            (see AppendNetCDFFunction). Otherwise a new merged file is created
         
         Returns
         -------
         outNetCDFFileName: string
-            Path to merged output NetCDF file
+            Path to merged output NetCDF file (manifest with the virtual merge)
         NetCDFDimensions: list
             Names of NetCDF dimensions (lat, lon, Z, time)
             Used to create NetCDF feature layer
     """
+    if mergeSettings["virtual"]:
+        return MergeNetCDFManifest(file_names, current_geodatabase, outFileName, Timestamp, varNames, append)
 
     arcpy.AddMessage('\nSTART Merging netCDF File')
 
@@ -54,16 +91,21 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
     msgInvalidParameters = "Invalid number of parameters."
     ErrorDesc = "error while running"
 
+    outNcFileName = Timestamp + "_" + outFileName + "_merged.nc"
+    outNetCDFFileName = os.path.join(current_geodatabase, outNcFileName)
+    outNetCDFFileName = outNetCDFFileName.replace(os.sep,'/')
+    if append and os.path.exists(outNetCDFFileName):
+        return AppendNetCDFFunction(file_names, outNetCDFFileName)
+
 
-    # 1. Open NetCDF Files and read as Multi-File netCDF Dataset (with shared dimension "time")
-    # 1.1 Open as Multi-File Dataset
+    # 1. Open the first NetCDF file as Master-File to retrieve the Dimensions, Variables and Attributes
+    #    (the input files are streamed one after the other into the output file, see step 5)
     arcpy.AddMessage(file_names)
-    merged_file = netCDF4.MFDataset(file_names, aggdim = "time")
-    master_file = netCDF4.Dataset(file_names[0]) # First file as Master-File to retrieve Global Attributes
+    master_file = open_stage_file(file_names[0])
 
     # 1.2 Get Variable and Dimension Names
-    dimNames = list(merged_file.dimensions.keys())
-    ncVarNames = list(merged_file.variables.keys())
+    dimNames = list(master_file.dimensions.keys())
+    ncVarNames = list(master_file.variables.keys())
 
     # 1.3 Check if X,Y,Z Dimension exist
     xDimension = 'longitude'
@@ -78,29 +120,16 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
 
 
     # 2. Create new Output NetCDF file
-    outNcFileName = Timestamp + "_" + outFileName + "_merged.nc"
-    outNetCDFFileName = os.path.join(current_geodatabase, outNcFileName)
-    outNetCDFFileName = outNetCDFFileName.replace(os.sep,'/')
     outNetCDFFile = Dataset(outNetCDFFileName, 'w', format='NETCDF4')
 
 
     # 3. Create dimension and coordinate variables in outNetCDFFile
     for dimName in dimNames:       
-        #Set output dimension size    
-        if dimName == xDimension:
-            dimSize = len(merged_file.variables[dimName])
-        elif dimName == yDimension:
-            dimSize = len(merged_file.variables[dimName])
-        elif dimName == zDimension:
-                dimSize = len(merged_file.variables[dimName]) 
+        #Set output dimension size (the time dimension is unlimited and grows with every merged file)
+        if dimName == timeDimension:
+            dimSize = None
         else:
-            dimSize = len(merged_file.dimensions[dimName])
-            
-        #Adjust output dimension size if it is NONE (NONE is returned for UNLIITED size)
-        #Getting actual size in file from shape
-        if dimSize == None:
-            ncCoordVar = merged_file.variables[dimName]
-            dimSize = list(ncCoordVar.shape)[0]
+            dimSize = len(master_file.dimensions[dimName])
 
         #3.1 Create dimension in outnetCDFfile
         outNetCDFFile.createDimension(dimName,dimSize) 
@@ -108,51 +137,33 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
         #3.2 Check if dimension is also a variable i.e. coordinate variable
         if dimName in ncVarNames:
             # Get coordinate variable    
-            ncCoordVar = merged_file.variables[dimName]
-                
-            # Get all data
-            ncCoordVarData = ncCoordVar[:] 
+            ncCoordVar = master_file.variables[dimName]
                 
-            #3.2.1 Create coordinate variable in outnetCDFfile           
+            #3.2.1 Create coordinate variable in outnetCDFfile (time values are written in step 5)
             outNcCoordVar = outNetCDFFile.createVariable(dimName, 'f4', (dimName,), fill_value = -3.4028235e+38)
             
-            if dimName == 'time':
-                outNcCoordVar[:] = np.arange(0, len(ncCoordVarData), 1)
-            else:
-                outNcCoordVar[:] = ncCoordVarData
+            if dimName != timeDimension:
+                outNcCoordVar[:] = ncCoordVar[:]
             
             #3.2.2 Write Coordinate Variable Attributes
-            # First check if Coord. Variable is instance of class "netCDF4._netCDF4.Variable"
-            if isinstance(ncCoordVar, (netCDF4._netCDF4.Variable)):         
-                CoordVarAttributes = netCDF4.Variable.ncattrs(ncCoordVar)
-        
-                for CoordVarAttrib in CoordVarAttributes:
-                    if CoordVarAttrib == '_FillValue':
-                        pass
-                    else:
-                        CoordAttribValue = netCDF4.Variable.getncattr(ncCoordVar, CoordVarAttrib)
-                        netCDF4.Variable.setncattr(outNcCoordVar, CoordVarAttrib, CoordAttribValue)
-            # Some Variables in merged_file are instances of class "netCDF4._netCDF4._Variable". For those the "ncattrs" and "getncattr" methods are not available.
-            # Thus a workaraound to assign the attributes is used by taking the attributes from the master_file
-            else:   
-                CoordVarAttributes = netCDF4.Variable.ncattrs(master_file.variables[dimName])
-                for CoordVarAttrib in CoordVarAttributes:
-                    if CoordVarAttrib == '_FillValue':
-                        pass
-                    else:
-                        CoordAttribValue = netCDF4.Variable.getncattr(master_file.variables[dimName], CoordVarAttrib)
-                        netCDF4.Variable.setncattr(outNcCoordVar, CoordVarAttrib, CoordAttribValue)
+            CoordVarAttributes = netCDF4.Variable.ncattrs(ncCoordVar)
+            for CoordVarAttrib in CoordVarAttributes:
+                if CoordVarAttrib == '_FillValue':
+                    pass
+                else:
+                    CoordAttribValue = netCDF4.Variable.getncattr(ncCoordVar, CoordVarAttrib)
+                    netCDF4.Variable.setncattr(outNcCoordVar, CoordVarAttrib, CoordAttribValue)
     arcpy.AddMessage("... writing dimensions and coordinate variables")
 
 
 
-    # 4. Get the netCDF variable objects and write variables in new output netCDF file
+    # 4. Get the netCDF variable objects and create the variables in new output netCDF file
+    mergeVarNames = []
     for varName in ncVarNames:
         if varName not in dimNames:                 # Coordinate Variables already written, thus only write variables which have no dimension of the same name
-            ncVar = merged_file.variables[varName]
-            ncVarData = ncVar[:]    
-            ncVarShape = ncVar.shape
-            ncVarRank = len(ncVarData.shape)
+            if varNames is not None and varName not in varNames:
+                continue
+            ncVar = master_file.variables[varName]
             ncVarDimNames = ncVar.dimensions 
             
             # 4.1 Check if X, Y dimensions exist
@@ -166,10 +177,12 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
                 arcpy.AddMessage("... " + xDimension + " and " +  yDimension + " dimensions exists in variable " + varName)
 
             
-            # 4.2 Create variable in outnetCDFfile 
+            # 4.2 Create variable in outnetCDFfile (variables without time dimension are taken from the Master-File)
             outNcVar = outNetCDFFile.createVariable(varName, 'f4', ncVarDimNames, fill_value = -3.4028235e+38)    
-            outNcVar[:] = ncVarData[:]
-            arcpy.AddMessage("... writing variable " + varName)        
+            if timeDimension in ncVarDimNames:
+                mergeVarNames.append(varName)
+            else:
+                outNcVar[:] = ncVar[:]
 
             
             # 4.3 Get variable attributes and write to new output file
@@ -177,39 +190,21 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
             bGridMappingExists = False
             ncGridMappingVarName = ""
             
-            if isinstance(ncVar, (netCDF4._netCDF4.Variable)):
-                allAttributes = netCDF4.Variable.ncattrs(ncVar)        
-                for attrib in allAttributes:
-                    if attrib == '_FillValue':
-                        pass
-                    else:
-                        attribValue = netCDF4.Variable.getncattr(ncVar, attrib)
-                        netCDF4.Variable.setncattr(outNcVar, attrib, attribValue)
-                        if attrib == "grid_mapping":
-                            bGridMappingExists = True
-                            ncGridMappingVarName = attribValue
-                arcpy.AddMessage("... writing variable attributes for " + varName)
-
-            # Some Variables in merged_file are instances of class "netCDF4._netCDF4._Variable". For those the "ncattrs" and "getncattr" methods are not available.
-            # Thus a workaraound to assign the attributes is used by taking the attributes from the master_file
-            else:   
-                allAttributes = netCDF4.Variable.ncattrs(master_file.variables[varName])
-        
-                for attrib in allAttributes:
-                    if attrib == '_FillValue':
-                        pass
-                    else:
-                        attribValue = netCDF4.Variable.getncattr(master_file.variables[varName], attrib)
-                        netCDF4.Variable.setncattr(outNcVar, attrib, attribValue)
-                        if attrib == "grid_mapping":
-                            bGridMappingExists = True
-                            ncGridMappingVarName = attribValue
-                arcpy.AddMessage("... writing variable attributes for " + varName)
+            allAttributes = netCDF4.Variable.ncattrs(ncVar)        
+            for attrib in allAttributes:
+                if attrib == '_FillValue':
+                    pass
+                else:
+                    attribValue = netCDF4.Variable.getncattr(ncVar, attrib)
+                    netCDF4.Variable.setncattr(outNcVar, attrib, attribValue)
+                    if attrib == "grid_mapping":
+                        bGridMappingExists = True
+                        ncGridMappingVarName = attribValue
+            arcpy.AddMessage("... writing variable attributes for " + varName)
 
             # 4.4 Get grid_mapping variable object if exists
             if bGridMappingExists:
-                ncGridMappingVar = merged_file.variables[ncGridMappingVarName]        
-                ncGridMappingVarShape = ncGridMappingVar.shape        
+                ncGridMappingVar = master_file.variables[ncGridMappingVarName]        
                 ncGridMappingVarDimNames = ncGridMappingVar.dimensions 
             
                 #4.4.1 Create grid mapping variable in outnetCDFfile 
@@ -223,26 +218,406 @@ def MergeNetCDFFunction(file_names, current_geodatabase, outFileName, Timestamp)
                 arcpy.AddMessage("... writing grid_mapping for " + varName)
 
 
-    #5.0 Write all global attributes to OutNetCDF File
+    #5.0 Stream the time slabs of the input files into the output file (one input file in memory at once)
+    write_time_slabs(outNetCDFFile, file_names, mergeVarNames, 0, master_file)
+
+
+    #6.0 Write all global attributes to OutNetCDF File
     # Global Attributes are taken from master_file
-    globalAllAttributes = netCDF4.MFDataset.ncattrs(merged_file)
+    globalAllAttributes = netCDF4.Dataset.ncattrs(master_file)
     for globalAttribute in globalAllAttributes:
         globalAttributeValue = netCDF4.Dataset.getncattr(master_file, globalAttribute)
         netCDF4.Dataset.setncattr(outNetCDFFile, globalAttribute, globalAttributeValue)
     arcpy.AddMessage("... writing global attributes")
 
-    #6.0 Syncronize and close netCDF files
+    #7.0 Syncronize and close netCDF files
     outNetCDFFile.sync()    
     outNetCDFFile.close()
-    merged_file.close()
+    master_file.close()
 
     arcpy.AddMessage('END Merging netCDF File\n\n')
 
     return [outNetCDFFileName, [timeDimension, zDimension, yDimension, xDimension]]
 
 
+def AppendNetCDFFunction(file_names, mergedFileName):
+    """
+        Function Description:   Function to append newly arriving NetCDF files (e.g. a new forecast hour)
+                                to an existing merged file. The files are validated against the merged
+                                file and only their time slabs are written.
+         
+        Parameters
+        ----------
+        file_names: array
+            Array containing paths to NetCDF files
+        mergedFileName: string
+            Path to merged NetCDF file (created by MergeNetCDFFunction)
+        
+        Returns
+        -------
+        mergedFileName: string
+            Path to merged output NetCDF file
+        NetCDFDimensions: list
+            Names of NetCDF dimensions (lat, lon, Z, time)
+            Used to create NetCDF feature layer
+    """
+
+    arcpy.AddMessage('\nSTART Appending to merged netCDF File')
+
+    #Define message constants so they may be translated easily
+    msgInvalidParameter = "Invalid parameter."
+
+    xDimension = 'longitude'
+    yDimension = 'latitude'
+    zDimension = 'Z'
+    timeDimension = 'time'
+
+    # 1. Open merged NetCDF file (time dimension has to be unlimited to be extended)
+    arcpy.AddMessage(file_names)
+    outNetCDFFile = Dataset(mergedFileName, 'a')
+    if not outNetCDFFile.dimensions[timeDimension].isunlimited():
+        outNetCDFFile.close()
+        arcpy.AddError("Time dimension of " + mergedFileName + " is not unlimited.")
+        raise Exception (msgInvalidParameter)
+    dimNames = list(outNetCDFFile.dimensions.keys())
+    mergeVarNames = [varName for varName in outNetCDFFile.variables if varName not in dimNames and timeDimension in outNetCDFFile.variables[varName].dimensions]
+
+    # 2. Validate the dimensions, coordinates and variable attributes of all files before writing
+    for fileName in file_names:
+        inNetCDFFile = open_stage_file(fileName)
+        mismatch = get_merge_mismatch(outNetCDFFile, inNetCDFFile, mergeVarNames, timeDimension)
+        inNetCDFFile.close()
+        if mismatch:
+            outNetCDFFile.close()
+            arcpy.AddError("The " + mismatch + " of " + fileName + " does not match the merged file " + mergedFileName + ".")
+            raise Exception (msgInvalidParameter)
+    arcpy.AddMessage("... dimensions and attributes match the merged file")
+
+    # 3. Extend the time dimension by the time slabs of the new files
+    write_time_slabs(outNetCDFFile, file_names, mergeVarNames, len(outNetCDFFile.dimensions[timeDimension]))
+
+    # 4. Syncronize and close netCDF file
+    outNetCDFFile.sync()
+    outNetCDFFile.close()
+
+    arcpy.AddMessage('END Appending to merged netCDF File\n\n')
+
+    return [mergedFileName, [timeDimension, zDimension, yDimension, xDimension]]
+
+
+def write_time_slabs(outNetCDFFile, file_names, mergeVarNames, timeStart, master_file = None, timeDimension = 'time'):
+    """
+        Function Description:
+        Writes the time slabs of the input files one after the other into the merged file,
+        starting at timeStart along the (unlimited) time dimension. Only one input file is
+        in memory at once.
+
+        Parameters
+        ----------
+        outNetCDFFile: Dataset
+            Merged NetCDF file opened for writing
+        file_names: array
+            Array containing paths to NetCDF files
+        mergeVarNames: list
+            Names of the variables with a time dimension
+        timeStart: int
+            Index of the first time slab to write
+        master_file: Dataset
+            Already opened first file of file_names (optional)
+        timeDimension: string
+            Name of the time dimension
+
+        Returns
+        -------
+
+    """
+    for fileName in file_names:
+        if master_file is not None and fileName == file_names[0]:
+            inNetCDFFile = master_file
+        else:
+            inNetCDFFile = open_stage_file(fileName)
+        timeSize = len(inNetCDFFile.dimensions[timeDimension])
+        timeSlice = slice(timeStart, timeStart + timeSize)
+
+        # Time coordinate is numbered consecutively over all merged files
+        if timeDimension in outNetCDFFile.variables:
+            outNetCDFFile.variables[timeDimension][timeSlice] = np.arange(timeSlice.start, timeSlice.stop, 1)
+
+        # Write the slab of each variable at its position along the time dimension
+        for varName in mergeVarNames:
+            if varName not in inNetCDFFile.variables:
+                arcpy.AddError("Variable " + varName + " does not exist in " + fileName + ".")
+                raise Exception ("Invalid parameter.")
+            ncVar = inNetCDFFile.variables[varName]
+            timeIndex = ncVar.dimensions.index(timeDimension)
+            outSlices = [slice(None)] * len(ncVar.dimensions)
+            outSlices[timeIndex] = timeSlice
+            outNetCDFFile.variables[varName][tuple(outSlices)] = ncVar[:]
+        arcpy.AddMessage("... writing time slab of " + os.path.basename(fileName))
+
+        timeStart += timeSize
+        if inNetCDFFile is not master_file:
+            inNetCDFFile.close()
+
+
+def get_time_units(ncFile, timeDimension = 'time'):
+    """
+        Function Description:
+        Reads the units of the time coordinate of a NetCDF file (reference date of the forecast run).
+
+        Parameters
+        ----------
+        ncFile: Dataset
+            NetCDF file
+        timeDimension: string
+            Name of the time dimension
+
+        Returns
+        -------
+        timeUnits: string
+            Units of the time coordinate (empty if the file has no time units)
+    """
+    if timeDimension in ncFile.variables and 'units' in ncFile.variables[timeDimension].ncattrs():
+        return str(ncFile.variables[timeDimension].getncattr('units'))
+    return ""
+
+
+def get_merged_hours(file_names, current_geodatabase, outFileNames, Timestamp, timeDimension = 'time'):
+    """
+        Function Description:
+        Number of files (forecast hours) which are already contained in the merged files of the
+        layers (or in the manifests with the virtual merge). Used to process only the newly arriving
+        hours and to append them to the merged files (see AppendNetCDFFunction). The time coordinate of the merged files is numbered
+        consecutively, thus the files are compared by the number of timesteps and by the units of
+        the time coordinate, which are copied from the files and change with the forecast run.
+
+        Parameters
+        ----------
+        file_names: array
+            Array containing paths to the NetCDF files in the order of the merge
+        current_geodatabase: string
+            Path to the folder of the merged files
+        outFileNames: list
+            Names of the merged files (names of the layers, as in MergeNetCDFFunction)
+        Timestamp: string
+            Timestamp of the merged files
+        timeDimension: string
+            Name of the time dimension
+
+        Returns
+        -------
+        mergedHours: int
+            Number of leading files of file_names contained in the merged files. 0 if a merged
+            file does not exist, if the merged files differ in their timesteps or if they do not
+            match the files (e.g. of another forecast run, all files are merged again)
+    """
+    # 1. Number of timesteps and time units of the merged files or manifests (equal for all layers)
+    mergedTime = None
+    for outFileName in outFileNames:
+        mergedFileName = os.path.join(current_geodatabase, Timestamp + "_" + outFileName + ("_merged.json" if mergeSettings["virtual"] else "_merged.nc")).replace(os.sep,'/')
+        if not os.path.exists(mergedFileName):
+            return 0
+        if mergeSettings["virtual"]:
+            manifest = open_merged_manifest(mergedFileName)
+            timeAttributes = manifest["variables"][timeDimension]["attributes"] if timeDimension in manifest["variables"] else {}
+            layerTime = [manifest["dimensions"][timeDimension], str(timeAttributes.get('units', ""))]
+        else:
+            with Dataset(mergedFileName, 'r') as mergedFile:
+                layerTime = [len(mergedFile.dimensions[timeDimension]), get_time_units(mergedFile, timeDimension)]
+        if mergedTime is not None and layerTime != mergedTime:
+            arcpy.AddMessage("WARNING: The merged files of " + Timestamp + " contain different timesteps, all files are merged again.")
+            return 0
+        mergedTime = layerTime
+    [mergedLength, mergedUnits] = mergedTime
+
+    # 2. Number of leading files with the timesteps of the merged files
+    timeLength = 0
+    mergedHours = 0
+    for fileName in file_names:
+        if timeLength >= mergedLength:
+            break
+        with Dataset(fileName, 'r') as inNetCDFFile:
+            if get_time_units(inNetCDFFile, timeDimension) != mergedUnits:
+                timeLength = -1
+                break
+            timeLength += len(inNetCDFFile.dimensions[timeDimension])
+        mergedHours += 1
+    if timeLength != mergedLength:
+        arcpy.AddMessage("WARNING: The merged files of " + Timestamp + " do not match the timesteps of the files, all files are merged again.")
+        return 0
+    return mergedHours
+
+
+def get_merge_mismatch(refNetCDFFile, inNetCDFFile, mergeVarNames, timeDimension = 'time'):
+    """
+        Function Description:
+        Compares a NetCDF file with the reference file of a merge (dimension sizes except time,
+        coordinate values, dimensions and attributes of the merged variables).
+
+        Parameters
+        ----------
+        refNetCDFFile: Dataset
+            Merged file or Master-File of the merge
+        inNetCDFFile: Dataset
+            NetCDF file to be merged
+        mergeVarNames: list
+            Names of the variables with a time dimension
+        timeDimension: string
+            Name of the time dimension
+
+        Returns
+        -------
+        mismatch: string
+            Description of the mismatch (empty if the file matches)
+    """
+    dimNames = list(refNetCDFFile.dimensions.keys())
+    mismatch = ""
+    for dimName in dimNames:
+        if dimName == timeDimension:
+            continue
+        if dimName not in inNetCDFFile.dimensions or len(inNetCDFFile.dimensions[dimName]) != len(refNetCDFFile.dimensions[dimName]):
+            mismatch = "dimension " + dimName
+        elif dimName in refNetCDFFile.variables:
+            refNcCoordVar = refNetCDFFile.variables[dimName]
+            if dimName not in inNetCDFFile.variables or not np.array_equal(refNcCoordVar[:], np.asarray(inNetCDFFile.variables[dimName][:], dtype = refNcCoordVar.dtype)):
+                mismatch = "coordinate variable " + dimName
+    for varName in mergeVarNames:
+        if varName not in inNetCDFFile.variables or inNetCDFFile.variables[varName].dimensions != refNetCDFFile.variables[varName].dimensions:
+            mismatch = "variable " + varName
+            continue
+        inAttributes = [attrib for attrib in netCDF4.Variable.ncattrs(inNetCDFFile.variables[varName]) if attrib != '_FillValue']
+        refAttributes = [attrib for attrib in netCDF4.Variable.ncattrs(refNetCDFFile.variables[varName]) if attrib != '_FillValue']
+        if set(inAttributes) != set(refAttributes):
+            mismatch = "attributes of variable " + varName
+        elif not all(np.array_equal(inNetCDFFile.variables[varName].getncattr(attrib), refNetCDFFile.variables[varName].getncattr(attrib)) for attrib in inAttributes):
+            mismatch = "attributes of variable " + varName
+    return mismatch
+
+
+def MergeNetCDFManifest(file_names, current_geodatabase, outFileName, Timestamp, varNames = None, append = False):
+    """
+        Function Description:   Virtual merge of multiple NetCDF files along the time Dimension.
+                                Instead of copying the data, a JSON manifest with the ordered file
+                                list, the time values, the shared dimensions and attributes and the
+                                time offset of each file is written. The files remain the only copy
+                                of the data and are read with read_manifest_variable.
+         
+        Parameters
+        ----------
+        file_names: array
+            Array containing paths to NetCDF files
+        current_geodatabase: string
+            Path to work GDB
+        outFileName: string
+            Name of output file
+        Timestamp: string
+            Timestamp of the current NetCDF file 
+        varNames: list
+            Names of the variables in the manifest (optional, all variables if None)
+        append: bool
+            If true and the manifest already exists, the files are appended to the files of
+            the manifest. Otherwise a new manifest is written
+        
+        Returns
+        -------
+        manifestFileName: string
+            Path to manifest file
+        NetCDFDimensions: list
+            Names of NetCDF dimensions (lat, lon, Z, time)
+    """
+
+    arcpy.AddMessage('\nSTART Virtual merging of netCDF Files')
 
+    #Define message constants so they may be translated easily
+    msgInvalidParameter = "Invalid parameter."
 
+    xDimension = 'longitude'
+    yDimension = 'latitude'
+    zDimension = 'Z'
+    timeDimension = 'time'
 
+    manifestFileName = os.path.join(current_geodatabase, Timestamp + "_" + outFileName + "_merged.json")
+    manifestFileName = manifestFileName.replace(os.sep,'/')
 
-                
\ No newline at end of file
+    # 1. The manifest refers to the files on disk (in-memory intermediate files are written out)
+    arcpy.AddMessage(file_names)
+    materialize_stage_files(file_names)
+    file_names = [os.path.abspath(fileName).replace(os.sep,'/') for fileName in file_names]
+    if append and os.path.exists(manifestFileName):
+        file_names = open_merged_manifest(manifestFileName)["files"] + file_names
+
+    # 2. Shared dimensions and attributes are taken from the first file as Master-File
+    master_file = Dataset(file_names[0], 'r')
+    dimNames = list(master_file.dimensions.keys())
+    for Dimension in list((xDimension, yDimension, zDimension, timeDimension)):
+        if list(dimNames).count(Dimension) == 0:
+            master_file.close()
+            arcpy.AddError("NetCDF Dimension " + Dimension + " does not exist.")
+            raise Exception (msgInvalidParameter)
+    manifestVarNames = [varName for varName in master_file.variables if varName in dimNames or varNames is None or varName in varNames]
+    mergeVarNames = [varName for varName in manifestVarNames if varName not in dimNames and timeDimension in master_file.variables[varName].dimensions]
+
+    variables = {}
+    for varName in manifestVarNames:
+        ncVar = master_file.variables[varName]
+        variables[varName] = {"dimensions": list(ncVar.dimensions),
+                              "dtype": str(ncVar.dtype),
+                              "attributes": {attrib: get_json_attribute(ncVar.getncattr(attrib)) for attrib in ncVar.ncattrs()}}
+    globalAttributes = {attrib: get_json_attribute(master_file.getncattr(attrib)) for attrib in master_file.ncattrs()}
+
+    # 3. Validate the files and get the time offset of each file
+    timeOffsets = []
+    timeSizes = []
+    timeStart = 0
+    for fileName in file_names:
+        inNetCDFFile = Dataset(fileName, 'r')
+        mismatch = get_merge_mismatch(master_file, inNetCDFFile, mergeVarNames, timeDimension)
+        timeSize = len(inNetCDFFile.dimensions[timeDimension])
+        inNetCDFFile.close()
+        if mismatch:
+            master_file.close()
+            arcpy.AddError("The " + mismatch + " of " + fileName + " does not match " + file_names[0] + ".")
+            raise Exception (msgInvalidParameter)
+        timeOffsets.append(timeStart)
+        timeSizes.append(timeSize)
+        timeStart += timeSize
+    dimensions = {dimName: len(master_file.dimensions[dimName]) for dimName in dimNames}
+    dimensions[timeDimension] = timeStart
+    master_file.close()
+
+    # 4. Write manifest (time is numbered consecutively over all files, as in the merged file)
+    manifest = {"files": file_names,
+                "timeDimension": timeDimension,
+                "timeOffsets": timeOffsets,
+                "timeSizes": timeSizes,
+                "time": list(range(timeStart)),
+                "dimensions": dimensions,
+                "variables": variables,
+                "globalAttributes": globalAttributes}
+    with open(manifestFileName, 'w') as manifestFile:
+        json.dump(manifest, manifestFile, indent = 1)
+    arcpy.AddMessage("... writing manifest of " + str(len(file_names)) + " files")
+
+    arcpy.AddMessage('END Virtual merging of netCDF Files\n\n')
+
+    return [manifestFileName, [timeDimension, zDimension, yDimension, xDimension]]
+
+
+def get_json_attribute(attribValue):
+    """
+        Function Description:
+        Converts a NetCDF attribute value to a JSON serializable value.
+
+        Parameters
+        ----------
+        attribValue: 
+            Attribute value (string, number or numpy array)
+
+        Returns
+        -------
+        attribValue:
+            Attribute value as string, number or list
+    """
+    if hasattr(attribValue, 'tolist'):
+        return attribValue.tolist()
+    return attribValue
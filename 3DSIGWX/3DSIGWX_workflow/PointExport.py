@@ -0,0 +1,282 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  PointExport
+ Source Name:       PointExport.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file (or manifest of a virtual merge)
+                    NetCDF Variable Names
+                    Output file (GeoPackage, GeoJSON text sequence or Feature Class)
+
+ Description:       Extraction of the populated voxels of a classified NetCDF file as points.
+                    MakeNetCDFFeatureLayer creates a feature for every (time, Z, latitude,
+                    longitude)-cell, also for the cells with the fill value, which are not
+                    visible in the web app. Here only the cells where at least one variable
+                    is not the fill value are extracted with numpy masks, time step by time
+                    step, as columns (one array per dimension and variable). Variables without
+                    Z dimension (e.g. StormClassification, see CapeGrid.py) are extruded to
+                    all Z layers of the file with a broadcast view. The manifest of a virtual
+                    merge is read in the same way (see MergeManifest.py).
+                    The columns are written with one of several writers: GeoPackage and
+                    GeoJSON text sequence (RFC 8142) only depend on the Python standard
+                    library, thus the export can be tested and benchmarked without ArcGIS.
+                    The Feature Class writer uses arcpy.da and is used by CreateSceneLayer.
+
+                    Usage: python PointExport.py NetCDF-file Variable[,Variable] output-file [time]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, json, sqlite3, time
+from netCDF4 import Dataset
+
+from MergeManifest import open_merged_file, iterate_merged_timesteps
+
+
+# Spatial reference of the points (geographic coordinates of the COSMO files)
+PointSpatialReference = 4326
+
+
+def extract_voxel_points(inNetCDFFileName, VariableNames, DimensionNames, timeEnabled = False):
+    """
+        Function Description:
+        Extracts the populated voxels of the variables as points. A voxel is populated if at
+        least one of the variables is not the fill value there. Without time the first time
+        step is extracted (as MakeNetCDFFeatureLayer does without time row dimension).
+        Variables without Z dimension are extruded to all Z layers.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        VariableNames: list
+            Names of the variables (a single name is accepted as string)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        timeEnabled: bool
+            If true, all time steps are extracted and the time is added as column
+
+        Returns
+        -------
+        points: dict
+            Columns of the points (dimension and variable name -> array)
+    """
+    if isinstance(VariableNames, str):
+        VariableNames = [VariableNames]
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+
+    inNetCDFFile = open_merged_file(inNetCDFFileName)
+    zData = np.ma.getdata(inNetCDFFile.variables[zDimension][:])
+    yData = np.ma.getdata(inNetCDFFile.variables[yDimension][:])
+    xData = np.ma.getdata(inNetCDFFile.variables[xDimension][:])
+    inNetCDFFile.close()
+
+    columns = {name: [] for name in ([timeDimension] if timeEnabled else []) + [zDimension, yDimension, xDimension] + VariableNames}
+    for timeStep, timeValue, VariableData in iterate_merged_timesteps(inNetCDFFileName, VariableNames, timeEnabled, timeDimension):
+        # Values of all variables at the time step (Z, latitude, longitude), 2D variables as (1, latitude, longitude)
+        VariableData = [Data if Data.ndim == 3 else Data[np.newaxis] for Data in VariableData]
+        populated = np.zeros((len(zData), len(yData), len(xData)), dtype = bool)
+        for Data in VariableData:
+            populated |= ~np.ma.getmaskarray(Data)
+        [zIndex, yIndex, xIndex] = np.nonzero(populated)
+
+        if timeEnabled:
+            columns[timeDimension].append(np.full(len(zIndex), timeValue))
+        columns[zDimension].append(zData[zIndex])
+        columns[yDimension].append(yData[yIndex])
+        columns[xDimension].append(xData[xIndex])
+        for varName, Data in zip(VariableNames, VariableData):
+            columns[varName].append(np.broadcast_to(np.ma.filled(Data, np.nan), populated.shape)[zIndex, yIndex, xIndex])
+
+    return {name: np.concatenate(column).astype(np.float64) for name, column in columns.items()}
+
+
+def write_geojson_seq(points, outFileName, LayerName, DimensionNames):
+    """
+        Function Description:
+        Writes the points as GeoJSON text sequence (RFC 8142, one feature per line).
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        outFileName: string
+            Path to output file (.geojsons)
+        LayerName: string
+            Name of the layer (not used, same arguments as the other writers)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+    """
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    coordinates = zip(points[xDimension].tolist(), points[yDimension].tolist(), points[zDimension].tolist())
+    properties = [[name, points[name].tolist()] for name in points]
+    with open(outFileName, 'w') as outFile:
+        for pointIndex, [x, y, z] in enumerate(coordinates):
+            feature = {"type": "Feature",
+                       "geometry": {"type": "Point", "coordinates": [x, y, z]},
+                       "properties": {name: (None if column[pointIndex] != column[pointIndex] else column[pointIndex]) for name, column in properties}}
+            outFile.write("\x1e" + json.dumps(feature) + "\n")
+    return outFileName
+
+
+def write_geopackage(points, outFileName, LayerName, DimensionNames):
+    """
+        Function Description:
+        Writes the points as PointZ feature table into a GeoPackage (OGC 12-128r15) with sqlite3.
+        An existing file is overwritten.
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        outFileName: string
+            Path to output file (.gpkg)
+        LayerName: string
+            Name of the feature table
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+    """
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    pointCount = len(points[xDimension])
+
+    # Geometry blobs: GeoPackage header (little endian, no envelope) followed by an ISO WKB PointZ
+    geometryType = np.dtype([('magic', 'S2'), ('version', 'u1'), ('flags', 'u1'), ('srs_id', '<i4'),
+                             ('byteOrder', 'u1'), ('wkbType', '<u4'), ('x', '<f8'), ('y', '<f8'), ('z', '<f8')])
+    geometries = np.zeros(pointCount, dtype = geometryType)
+    geometries['magic'] = b'GP'
+    geometries['flags'] = 1
+    geometries['srs_id'] = PointSpatialReference
+    geometries['byteOrder'] = 1
+    geometries['wkbType'] = 1001
+    geometries['x'] = points[xDimension]
+    geometries['y'] = points[yDimension]
+    geometries['z'] = points[zDimension]
+    geometryBuffer = geometries.tobytes()
+    geometrySize = geometryType.itemsize
+
+    if os.path.exists(outFileName):
+        os.remove(outFileName)
+    connection = sqlite3.connect(outFileName)
+    connection.execute("PRAGMA application_id = 1196444487")     # "GPKG"
+    connection.execute("PRAGMA user_version = 10200")
+    connection.execute("CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL, srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL, "
+                       "organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL, description TEXT)")
+    connection.executemany("INSERT INTO gpkg_spatial_ref_sys VALUES (?, ?, ?, ?, ?, ?)", [
+        ("Undefined cartesian SRS", -1, "NONE", -1, "undefined", None),
+        ("Undefined geographic SRS", 0, "NONE", 0, "undefined", None),
+        ("WGS 84 geodetic", 4326, "EPSG", 4326, 'GEOGCS["WGS 84",DATUM["WGS_1984",SPHEROID["WGS 84",6378137,298.257223563,AUTHORITY["EPSG","7030"]],'
+         'AUTHORITY["EPSG","6326"]],PRIMEM["Greenwich",0,AUTHORITY["EPSG","8901"]],UNIT["degree",0.0174532925199433,AUTHORITY["EPSG","9122"]],'
+         'AUTHORITY["EPSG","4326"]]', None)])
+    connection.execute("CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY, data_type TEXT NOT NULL, identifier TEXT UNIQUE, "
+                       "description TEXT DEFAULT '', last_change DATETIME NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%fZ','now')), "
+                       "min_x DOUBLE, min_y DOUBLE, max_x DOUBLE, max_y DOUBLE, srs_id INTEGER)")
+    connection.execute("CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL, column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL, "
+                       "srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL, PRIMARY KEY (table_name, column_name))")
+
+    # Feature table with one REAL field per column
+    fieldNames = list(points.keys())
+    fieldDefinitions = ", ".join('"' + name + '" REAL' for name in fieldNames)
+    connection.execute('CREATE TABLE "' + LayerName + '" (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom BLOB, ' + fieldDefinitions + ')')
+    bounds = [float(points[xDimension].min()), float(points[yDimension].min()), float(points[xDimension].max()), float(points[yDimension].max())] if pointCount else [None] * 4
+    connection.execute("INSERT INTO gpkg_contents (table_name, data_type, identifier, min_x, min_y, max_x, max_y, srs_id) VALUES (?, 'features', ?, ?, ?, ?, ?, ?)",
+                       [LayerName, LayerName] + bounds + [PointSpatialReference])
+    connection.execute("INSERT INTO gpkg_geometry_columns VALUES (?, 'geom', 'POINT', ?, 1, 0)", (LayerName, PointSpatialReference))
+
+    columns = [np.where(np.isnan(points[name]), None, points[name].astype(object)) for name in fieldNames]
+    rows = ((geometryBuffer[pointIndex * geometrySize:(pointIndex + 1) * geometrySize],) + row for pointIndex, row in enumerate(zip(*columns)))
+    connection.executemany('INSERT INTO "' + LayerName + '" (geom, ' + ", ".join('"' + name + '"' for name in fieldNames) + ') VALUES (' +
+                           ", ".join("?" * (len(fieldNames) + 1)) + ')', rows)
+    connection.commit()
+    connection.close()
+    return outFileName
+
+
+def write_feature_class(points, outFeatureClass, LayerName, DimensionNames):
+    """
+        Function Description:
+        Writes the points as PointZ Feature Class (e.g. in the work GDB) with arcpy.da.
+        arcpy is only imported here, thus the other writers work without ArcGIS.
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        outFeatureClass: string
+            Path to output Feature Class
+        LayerName: string
+            Name of the layer (not used, same arguments as the other writers)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+
+        Returns
+        -------
+        outFeatureClass: string
+            Path to output Feature Class
+    """
+    import arcpy
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    pointArray = np.zeros(len(points[xDimension]), dtype = [(name, '<f8') for name in points])
+    for name in points:
+        pointArray[name] = points[name]
+    if arcpy.Exists(outFeatureClass):
+        arcpy.management.Delete(outFeatureClass)
+    arcpy.da.NumPyArrayToFeatureClass(pointArray, outFeatureClass, [xDimension, yDimension, zDimension], arcpy.SpatialReference(PointSpatialReference))
+    return outFeatureClass
+
+
+# Writer of the output file by file extension (other paths are Feature Classes)
+PointWriters = {".gpkg": write_geopackage, ".geojsons": write_geojson_seq, ".geojsonl": write_geojson_seq}
+
+
+def export_voxel_points(inNetCDFFileName, VariableNames, DimensionNames, outFileName, timeEnabled = False):
+    """
+        Function Description:
+        Extracts the populated voxels and writes them with the writer of the output file.
+
+        Parameters
+        ----------
+        inNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        VariableNames: list
+            Names of the variables
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        outFileName: string
+            Path to output file (.gpkg, .geojsons/.geojsonl or Feature Class)
+        timeEnabled: bool
+            If true, all time steps are extracted and the time is added as column
+
+        Returns
+        -------
+        outFileName: string
+            Path to output file
+        pointCount: int
+            Number of exported points
+    """
+    points = extract_voxel_points(inNetCDFFileName, VariableNames, DimensionNames, timeEnabled)
+    [LayerName, extension] = os.path.splitext(os.path.basename(outFileName))
+    writer = PointWriters.get(extension.lower(), write_feature_class)
+    writer(points, outFileName, LayerName, DimensionNames)
+    return [outFileName, len(points[DimensionNames[3]])]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4:
+        print(__doc__)
+        sys.exit(1)
+    timeEnabled = len(sys.argv) > 4 and sys.argv[4].lower() in ("time", "true", "1")
+    startTime = time.perf_counter()
+    [outFileName, pointCount] = export_voxel_points(sys.argv[1], sys.argv[2].split(","), ['time', 'Z', 'latitude', 'longitude'], sys.argv[3], timeEnabled)
+    print("%d points exported to %s in %.2f s" % (pointCount, outFileName, time.perf_counter() - startTime))
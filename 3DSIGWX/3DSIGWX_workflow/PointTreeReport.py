@@ -0,0 +1,133 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  PointTreeReport
+ Source Name:       PointTreeReport.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Merged NetCDF file and variable names (optional, synthetic clouds otherwise)
+                    Maximum number of points per node (optional, default 2000)
+
+ Description:       Measures the build time of the node tree (octree over longitude/latitude/Z,
+                    see SceneLayerPackage.py) and of the complete Scene Layer Package, and
+                    prints the number of nodes and points of every level of detail.
+                    Without a NetCDF file, cloud areas are generated on the Full Extent of
+                    COSMO-1E (Switzerland, 350 x 600 grid points, 24 layers).
+
+                    Usage: python PointTreeReport.py [NetCDF file] [variable names] [max points per node]
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import sys, os, time, tempfile
+
+from SceneLayerPackage import *
+
+
+def synthetic_clouds(nLayers, nLatitude, nLongitude, MaxHeight = 7000, coverage = 0.4):
+    """
+        Function Description:
+        Creates the points of cloud areas (smooth random field above a threshold) on a
+        regular grid of the Full Extent.
+
+        Parameters
+        ----------
+        nLayers: int
+            Number of Z layers
+        nLatitude: int
+            Number of latitude rows
+        nLongitude: int
+            Number of longitude columns
+        MaxHeight: int
+            Heighest Z layer
+        coverage: float
+            Fraction of the voxels covered with clouds
+
+        Returns
+        -------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+    """
+    rng = np.random.default_rng(0)
+    zCoordinates = np.linspace(MaxHeight, 0, num = nLayers)
+    latitude = np.linspace(45.6, 47.9, nLatitude)
+    longitude = np.linspace(5.8, 10.6, nLongitude)
+    [Z, Y, X] = np.meshgrid(np.linspace(0, 1, nLayers), np.linspace(0, 1, nLatitude), np.linspace(0, 1, nLongitude), indexing = 'ij')
+    field = np.zeros(Z.shape)
+    for _ in range(12):
+        [kz, ky, kx] = rng.uniform(0.5, 6, 3)
+        field += np.sin(2 * np.pi * (kz * Z + rng.uniform())) * np.sin(2 * np.pi * (ky * Y + rng.uniform())) * np.sin(2 * np.pi * (kx * X + rng.uniform()))
+    [zIndex, yIndex, xIndex] = np.nonzero(field > np.quantile(field, 1 - coverage))
+    points = {"Z": zCoordinates[zIndex].astype(np.float64),
+              "latitude": latitude[yIndex].astype(np.float64),
+              "longitude": longitude[xIndex].astype(np.float64),
+              "CloudClassification": rng.integers(1, 9, len(zIndex)).astype(np.float64)}
+    return points, ["time", "Z", "latitude", "longitude"]
+
+
+def point_tree_report(points, DimensionNames, maxPointsPerNode = 2000, repetitions = 3):
+    """
+        Function Description:
+        Builds the node tree "repetitions" times and the Scene Layer Package once and prints
+        the best build time of the tree, the build time of the package and the number of
+        nodes and points per level.
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        maxPointsPerNode: int
+            Maximum number of points per node
+        repetitions: int
+            Number of runs of the tree building
+
+        Returns
+        -------
+        levelStatistics: list
+            Number of nodes, number of points and maximum number of points per node of every level
+    """
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    xData = points[xDimension]
+    yData = points[yDimension]
+    zData = points[zDimension]
+
+    # 1. Node tree
+    runTimes = []
+    for _ in range(repetitions):
+        startTime = time.perf_counter()
+        nodes = build_point_tree(xData, yData, zData, maxPointsPerNode)
+        runTimes.append(time.perf_counter() - startTime)
+    levelStatistics = get_level_statistics(nodes)
+
+    # 2. Complete Scene Layer Package (node resources and archive)
+    outSceneLayerPackage = os.path.join(tempfile.mkdtemp(), "PointTreeReport.slpk")
+    startTime = time.perf_counter()
+    write_point_scene_layer_package(points, outSceneLayerPackage, "PointTreeReport", DimensionNames, maxPointsPerNode)
+    packageTime = time.perf_counter() - startTime
+    packageSize = os.path.getsize(outSceneLayerPackage)
+    os.remove(outSceneLayerPackage)
+
+    print("Points: " + str(len(xData)) + ", max. points per node: " + str(maxPointsPerNode) + ", nodes: " + str(len(nodes)))
+    print("Tree build time: {:.3f} s, package build time: {:.3f} s ({:.1f} MB, {} workers)".format(min(runTimes), packageTime, packageSize / 1e6, packageSettings["workers"]))
+    print("{:>6} {:>8} {:>10} {:>16}".format("level", "nodes", "points", "max. points/node"))
+    for [level, [nodeCount, pointCount, maxPoints]] in enumerate(levelStatistics):
+        print("{:>6} {:>8} {:>10} {:>16}".format(level, nodeCount, pointCount, maxPoints))
+    return levelStatistics
+
+
+if __name__ == "__main__":
+    arguments = sys.argv[1:]
+    if len(arguments) > 1 and os.path.exists(arguments[0]):
+        DimensionNames = ["time", "Z", "latitude", "longitude"]
+        points = extract_voxel_points(arguments[0], arguments[1].split(","), DimensionNames)
+        arguments = arguments[2:]
+    else:
+        [points, DimensionNames] = synthetic_clouds(24, 350, 600)      # Full Extent of COSMO-1E (Switzerland)
+
+    maxPointsPerNode = int(arguments[0]) if arguments else 2000
+    point_tree_report(points, DimensionNames, maxPointsPerNode)
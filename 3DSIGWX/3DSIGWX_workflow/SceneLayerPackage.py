@@ -0,0 +1,529 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  SceneLayerPackage
+ Source Name:       SceneLayerPackage.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Points (see PointExport.py)
+                    Output Scene Layer Package (.slpk)
+
+ Description:       Writer of I3S Point Scene Layer Packages (.slpk, I3S version 1.6, profile
+                    "points") without CreatePointSceneLayerPackage. The points are split into
+                    a node tree (octree over longitude/latitude/Z with a maximum number of
+                    points per node, the inner nodes hold thinned out representative points as
+                    coarser levels of detail), then the node index documents, feature data and attribute
+                    buffers of the nodes are built and stored gzip compressed in the package
+                    (uncompressed zip archive, as required for .slpk files).
+                    The resources of the nodes can be built on a process pool (see
+                    set_package_workers). The module only depends on numpy and the Python
+                    standard library, thus it also runs without ArcGIS.
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import os, io, gzip, json, struct, uuid, zipfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PointExport import *
+
+
+# Settings of the parallel node building (see set_package_workers) and maximum number of
+# points per node (see set_max_points_per_node)
+packageSettings = {"workers": 1, "pool": None, "maxPointsPerNode": 2000}
+
+# Meters per degree latitude (used for the radius of the minimum bounding spheres)
+MetersPerDegree = 111320.0
+
+# Size of the point symbols in pixels (used for the level of detail switching)
+PointSymbolSize = 8
+
+
+def set_package_workers(nWorkers):
+    """
+        Function Description:
+        Defines the number of worker processes used to build the node resources of a Scene
+        Layer Package. With one worker the nodes are built in the current process.
+
+        Parameters
+        ----------
+        nWorkers: int
+            Number of worker processes
+
+        Returns
+        -------
+    """
+    nWorkers = max(int(nWorkers or 1), 1)
+    if nWorkers != packageSettings["workers"]:
+        shutdown_package_pool()
+    packageSettings["workers"] = nWorkers
+
+
+def set_max_points_per_node(maxPointsPerNode):
+    """
+        Function Description:
+        Defines the maximum number of points (features) per node of a Scene Layer Package.
+
+        Parameters
+        ----------
+        maxPointsPerNode: int
+            Maximum number of points per node
+
+        Returns
+        -------
+    """
+    packageSettings["maxPointsPerNode"] = max(int(maxPointsPerNode), 1)
+
+
+def shutdown_package_pool():
+    """
+        Function Description:
+        Stops the worker processes of the parallel node building (if started).
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+    """
+    if packageSettings["pool"] is not None:
+        packageSettings["pool"].shutdown()
+        packageSettings["pool"] = None
+
+
+def get_representative_points(pointIndex, xData, yData, zData, maxPoints):
+    """
+        Function Description:
+        Thins out the points of a node to representative points for the coarser levels of
+        detail. The bounds of the points are divided into a regular grid with at most maxPoints
+        cells and the first point of every occupied cell is kept. The kept points are original
+        points, thus their attributes (e.g. the classification) remain valid.
+
+        Parameters
+        ----------
+        pointIndex: array
+            Indices of the points of the node
+        xData, yData, zData: array
+            Coordinates of the points
+        maxPoints: int
+            Maximum number of representative points
+
+        Returns
+        -------
+        representativeIndex: array
+            Indices of the representative points (subset of pointIndex)
+    """
+    gridSize = max(int(np.floor(np.cbrt(maxPoints) + 1e-9)), 1)
+    cellIndex = np.zeros(len(pointIndex), dtype = np.int64)
+    for coordinates in [xData, yData, zData]:
+        values = coordinates[pointIndex]
+        [minValue, maxValue] = [values.min(), values.max()]
+        if maxValue > minValue:
+            cell = np.minimum(((values - minValue) / (maxValue - minValue) * gridSize).astype(np.int64), gridSize - 1)
+        else:
+            cell = np.zeros(len(values), dtype = np.int64)
+        cellIndex = cellIndex * gridSize + cell
+    [_, firstIndex] = np.unique(cellIndex, return_index = True)
+    return pointIndex[np.sort(firstIndex)]
+
+
+def build_point_tree(xData, yData, zData, maxPointsPerNode, maxLevel = 16):
+    """
+        Function Description:
+        Splits the points into an octree over longitude/latitude/Z. A node is split into its
+        eight octants as long as it contains more than maxPointsPerNode points. All points
+        are stored in the leaf nodes, the inner nodes keep representative points of their
+        octants (see get_representative_points) as coarser level of detail. Thus no node has
+        more than maxPointsPerNode points (except leaves at maxLevel).
+
+        Parameters
+        ----------
+        xData: array
+            Longitude of the points
+        yData: array
+            Latitude of the points
+        zData: array
+            Height of the points
+        maxPointsPerNode: int
+            Maximum number of points per node
+        maxLevel: int
+            Maximum depth of the tree (nodes with identical positions are not split further)
+
+        Returns
+        -------
+        nodes: list
+            Nodes of the tree (id, level, parent, children, pointIndex), root node first
+    """
+    nodes = [{"id": 0, "level": 0, "parent": None, "children": [], "pointIndex": np.arange(len(xData))}]
+    nodeIndex = 0
+    while nodeIndex < len(nodes):
+        node = nodes[nodeIndex]
+        pointIndex = node["pointIndex"]
+        if len(pointIndex) > maxPointsPerNode and node["level"] < maxLevel:
+            octant = np.zeros(len(pointIndex), dtype = np.int8)
+            for [axis, coordinates] in enumerate([xData, yData, zData]):
+                values = coordinates[pointIndex]
+                octant += (2 ** axis) * (values >= (values.min() + values.max()) / 2).astype(np.int8)
+            if np.any(octant != octant[0]):
+                order = np.argsort(octant, kind = 'stable')
+                bounds = np.searchsorted(octant[order], np.arange(9))
+                for childOctant in range(8):
+                    childPoints = pointIndex[order[bounds[childOctant]:bounds[childOctant + 1]]]
+                    if len(childPoints) > 0:
+                        node["children"].append(len(nodes))
+                        nodes.append({"id": len(nodes), "level": node["level"] + 1, "parent": node["id"], "children": [], "pointIndex": childPoints})
+                node["pointIndex"] = get_representative_points(pointIndex, xData, yData, zData, maxPointsPerNode)
+        nodeIndex += 1
+    return nodes
+
+
+def get_level_statistics(nodes):
+    """
+        Function Description:
+        Counts the nodes and points of every level of a node tree.
+
+        Parameters
+        ----------
+        nodes: list
+            Nodes of the tree (see build_point_tree)
+
+        Returns
+        -------
+        levelStatistics: list
+            Number of nodes, number of points and maximum number of points per node of every level
+    """
+    levelStatistics = []
+    for node in nodes:
+        while len(levelStatistics) <= node["level"]:
+            levelStatistics.append([0, 0, 0])
+        nodePoints = len(node["pointIndex"])
+        statistics = levelStatistics[node["level"]]
+        statistics[0] += 1
+        statistics[1] += nodePoints
+        statistics[2] = max(statistics[2], nodePoints)
+    return levelStatistics
+
+
+def get_switching_threshold(node):
+    """
+        Function Description:
+        Computes the screen size (diameter of the bounding sphere in pixels) up to which a
+        node is drawn instead of its children. The representative points of an inner node
+        are shown until their spacing on the screen exceeds the size of the point symbols
+        (leaf nodes have no children and are always drawn).
+
+        Parameters
+        ----------
+        node: dict
+            Node of the tree (see build_point_tree)
+
+        Returns
+        -------
+        maxError: float
+            Maximum screen size of the node in pixels
+    """
+    return float(PointSymbolSize * np.sqrt(len(node["pointIndex"])))
+
+
+def get_node_bounds(nodes, xData, yData, zData):
+    """
+        Function Description:
+        Computes the bounds of every node (of its own points and the points of its children).
+
+        Parameters
+        ----------
+        nodes: list
+            Nodes of the tree (see build_point_tree)
+        xData, yData, zData: array
+            Coordinates of the points
+
+        Returns
+        -------
+        bounds: array
+            Bounds of the nodes (xmin, ymin, zmin, xmax, ymax, zmax)
+    """
+    bounds = np.empty((len(nodes), 6))
+    bounds[:, :3] = np.inf
+    bounds[:, 3:] = -np.inf
+    for node in reversed(nodes):        # Children are always stored after their parent
+        pointIndex = node["pointIndex"]
+        if len(pointIndex) > 0:
+            for axis, Data in enumerate([xData, yData, zData]):
+                bounds[node["id"], axis] = min(bounds[node["id"], axis], Data[pointIndex].min())
+                bounds[node["id"], axis + 3] = max(bounds[node["id"], axis + 3], Data[pointIndex].max())
+        if node["parent"] is not None:
+            bounds[node["parent"], :3] = np.minimum(bounds[node["parent"], :3], bounds[node["id"], :3])
+            bounds[node["parent"], 3:] = np.maximum(bounds[node["parent"], 3:], bounds[node["id"], 3:])
+    return bounds
+
+
+def get_minimum_bounding_sphere(nodeBounds):
+    """
+        Function Description:
+        Minimum bounding sphere of a node as used by I3S (center in degrees and meters,
+        radius in meters).
+
+        Parameters
+        ----------
+        nodeBounds: array
+            Bounds of the node (xmin, ymin, zmin, xmax, ymax, zmax)
+
+        Returns
+        -------
+        mbs: list
+            Center longitude, latitude, height and radius
+    """
+    center = (nodeBounds[:3] + nodeBounds[3:]) / 2
+    extent = (nodeBounds[3:] - nodeBounds[:3]) / 2
+    extentMeters = [extent[0] * MetersPerDegree * np.cos(np.radians(center[1])), extent[1] * MetersPerDegree, extent[2]]
+    radius = max(float(np.sqrt(np.sum(np.square(extentMeters)))), 1.0)
+    return [float(center[0]), float(center[1]), float(center[2]), radius]
+
+
+def get_node_name(nodeId):
+    """
+        Function Description:
+        Name of a node in the package (the root node is called "root").
+    """
+    return "root" if nodeId == 0 else str(nodeId)
+
+
+def gzip_resource(data):
+    """
+        Function Description:
+        Compresses a resource of the package with gzip (without time stamp, thus the same
+        resource always gives the same bytes).
+
+        Parameters
+        ----------
+        data: bytes
+            Resource
+
+        Returns
+        -------
+        compressedData: bytes
+            gzip compressed resource
+    """
+    compressedFile = io.BytesIO()
+    with gzip.GzipFile(fileobj = compressedFile, mode = 'wb', compresslevel = 6, mtime = 0) as gzipFile:
+        gzipFile.write(data)
+    return compressedFile.getvalue()
+
+
+def build_node_resources(nodeJobs):
+    """
+        Function Description:
+        Builds the resources of several nodes (node index document, feature data and attribute
+        buffers). Runs in the worker processes of the package pool.
+
+        Parameters
+        ----------
+        nodeJobs: list
+            Per node: node index document, positions (n, 3), object ids and attribute columns
+
+        Returns
+        -------
+        resources: list
+            Path in the package and gzip compressed content of every resource
+    """
+    resources = []
+    for [nodeDocument, positions, objectIds, attributeColumns, LayerName] in nodeJobs:
+        nodePath = "nodes/" + nodeDocument["id"] + "/"
+        resources.append((nodePath + "3dNodeIndexDocument.json.gz", gzip_resource(json.dumps(nodeDocument).encode("utf-8"))))
+        if len(objectIds) == 0:
+            continue
+
+        # Feature data: one feature per point at its position
+        featureData = [{"id": objectId, "position": position, "pivotOffset": [0, 0, 0], "mbb": position + position, "layer": LayerName}
+                       for objectId, position in zip(objectIds.tolist(), positions.tolist())]
+        resources.append((nodePath + "features/0.json.gz", gzip_resource(json.dumps({"featureData": featureData, "geometryData": []}).encode("utf-8"))))
+
+        # Attribute buffers: count (UInt32) followed by the values (Float64 values are aligned to 8 bytes by padding)
+        resources.append((nodePath + "attributes/f_0/0.bin.gz", gzip_resource(struct.pack("<I", len(objectIds)) + objectIds.astype("<u4").tobytes())))
+        for fieldIndex, column in enumerate(attributeColumns):
+            resources.append((nodePath + "attributes/f_" + str(fieldIndex + 1) + "/0.bin.gz",
+                              gzip_resource(struct.pack("<II", len(column), 0) + column.astype("<f8").tobytes())))
+    return resources
+
+
+def create_scene_layer_document(points, LayerName, DimensionNames, nodeBounds):
+    """
+        Function Description:
+        Creates the scene layer document (3dSceneLayer.json) of a point scene layer.
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        LayerName: string
+            Name of the layer
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        nodeBounds: array
+            Bounds of the root node (xmin, ymin, zmin, xmax, ymax, zmax)
+
+        Returns
+        -------
+        sceneLayer: dict
+            Scene layer document
+    """
+    fields = [{"name": "OBJECTID", "type": "esriFieldTypeOID", "alias": "OBJECTID"}]
+    attributeStorageInfo = [{"key": "f_0", "name": "OBJECTID", "header": [{"property": "count", "valueType": "UInt32"}],
+                             "ordering": ["attributeValues"], "attributeValues": {"valueType": "Oid32", "valuesPerElement": 1}}]
+    for fieldIndex, fieldName in enumerate(points):
+        fields.append({"name": fieldName, "type": "esriFieldTypeDouble", "alias": fieldName})
+        attributeStorageInfo.append({"key": "f_" + str(fieldIndex + 1), "name": fieldName,
+                                     "header": [{"property": "count", "valueType": "UInt32"}],
+                                     "ordering": ["attributeValues"], "attributeValues": {"valueType": "Float64", "valuesPerElement": 1}})
+
+    storeId = "{" + str(uuid.uuid4()).upper() + "}"
+    return {"id": 0,
+            "version": storeId,
+            "name": LayerName,
+            "href": "./layers/0",
+            "layerType": "Point",
+            "spatialReference": {"wkid": PointSpatialReference, "latestWkid": PointSpatialReference},
+            "heightModelInfo": {"heightModel": "gravity_related_height", "vertCRS": "EGM96_Geoid", "heightUnit": "meter"},
+            "capabilities": ["View", "Query"],
+            "store": {"id": storeId,
+                      "profile": "points",
+                      "version": "1.6",
+                      "resourcePattern": ["3dNodeIndexDocument", "Attributes", "featureData"],
+                      "rootNode": "./nodes/root",
+                      "extent": [float(nodeBounds[0]), float(nodeBounds[1]), float(nodeBounds[3]), float(nodeBounds[4])],
+                      "indexCRS": "http://www.opengis.net/def/crs/EPSG/0/" + str(PointSpatialReference),
+                      "vertexCRS": "http://www.opengis.net/def/crs/EPSG/0/" + str(PointSpatialReference),
+                      "normalReferenceFrame": "vertex-reference-frame",
+                      "lodType": "AutoThinning",
+                      "lodModel": "node-switching",
+                      "defaultGeometrySchema": {"geometryType": "points",
+                                                "header": [{"property": "vertexCount", "type": "UInt32"}],
+                                                "topology": "PerAttributeArray",
+                                                "ordering": ["position"],
+                                                "vertexAttributes": {"position": {"valueType": "Float64", "valuesPerElement": 3}},
+                                                "featureAttributeOrder": ["id"],
+                                                "featureAttributes": {"id": {"valueType": "UInt64", "valuesPerElement": 1}}}},
+            "fields": fields,
+            "attributeStorageInfo": attributeStorageInfo,
+            "drawingInfo": {"renderer": {"type": "simple", "symbol": {"type": "PointSymbol3D", "symbolLayers": [
+                {"type": "Icon", "size": PointSymbolSize, "resource": {"primitive": "circle"}, "material": {"color": [255, 255, 255]}}]}}}}
+
+
+def write_point_scene_layer_package(points, outSceneLayerPackage, LayerName, DimensionNames, maxPointsPerNode = None):
+    """
+        Function Description:
+        Writes the points as I3S Point Scene Layer Package (.slpk). An existing file is
+        overwritten.
+
+        Parameters
+        ----------
+        points: dict
+            Columns of the points (see extract_voxel_points)
+        outSceneLayerPackage: string
+            Path to output Scene Layer Package (.slpk)
+        LayerName: string
+            Name of the layer
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        maxPointsPerNode: int
+            Maximum number of points per node (None uses the value of set_max_points_per_node)
+
+        Returns
+        -------
+        outSceneLayerPackage: string
+            Path to output Scene Layer Package
+        nodeCount: int
+            Number of nodes in the package
+    """
+    [timeDimension, zDimension, yDimension, xDimension] = DimensionNames
+    xData = points[xDimension]
+    yData = points[yDimension]
+    zData = points[zDimension]
+
+    # 1. Node tree and bounding spheres
+    if maxPointsPerNode is None:
+        maxPointsPerNode = packageSettings["maxPointsPerNode"]
+    nodes = build_point_tree(xData, yData, zData, maxPointsPerNode)
+    nodeBounds = get_node_bounds(nodes, xData, yData, zData)
+    if len(xData) == 0:
+        nodeBounds[:] = 0
+    nodeSpheres = [get_minimum_bounding_sphere(bounds) for bounds in nodeBounds]
+
+    # 2. Node index documents and data of every node
+    storeDocument = create_scene_layer_document(points, LayerName, DimensionNames, nodeBounds[0])
+    attributeNames = list(points.keys())
+    nodeJobs = []
+    for node in nodes:
+        nodeName = get_node_name(node["id"])
+        nodeDocument = {"id": nodeName,
+                        "level": node["level"],
+                        "version": storeDocument["store"]["id"],
+                        "mbs": nodeSpheres[node["id"]],
+                        # Switch to the children as soon as the representative points are further apart than the symbol size
+                        "lodSelection": [{"metricType": "maxScreenThreshold", "maxError": get_switching_threshold(node)}],
+                        "children": [{"id": get_node_name(child), "href": "../" + get_node_name(child), "mbs": nodeSpheres[child]} for child in node["children"]]}
+        if node["parent"] is not None:
+            nodeDocument["parentNode"] = {"id": get_node_name(node["parent"]), "href": "../" + get_node_name(node["parent"]), "mbs": nodeSpheres[node["parent"]]}
+        pointIndex = node["pointIndex"]
+        if len(pointIndex) > 0:
+            nodeDocument["featureData"] = [{"href": "./features/0"}]
+            nodeDocument["attributeData"] = [{"href": "./attributes/f_" + str(fieldIndex) + "/0"} for fieldIndex in range(len(attributeNames) + 1)]
+        positions = np.stack([xData[pointIndex], yData[pointIndex], zData[pointIndex]], axis = 1)
+        nodeJobs.append([nodeDocument, positions, pointIndex + 1, [points[name][pointIndex] for name in attributeNames], LayerName])
+
+    # 3. Build the node resources (on the worker processes) and write them into the package
+    nWorkers = packageSettings["workers"]
+    if nWorkers > 1 and len(nodeJobs) > 1:
+        if packageSettings["pool"] is None:
+            packageSettings["pool"] = ProcessPoolExecutor(max_workers = nWorkers, mp_context = multiprocessing.get_context("spawn"))
+        jobBlocks = [nodeJobs[block[0]:block[-1] + 1] for block in np.array_split(np.arange(len(nodeJobs)), min(len(nodeJobs), 4 * nWorkers)) if len(block) > 0]
+        resourceBlocks = packageSettings["pool"].map(build_node_resources, jobBlocks)
+    else:
+        resourceBlocks = [build_node_resources(nodeJobs)]
+
+    if os.path.exists(outSceneLayerPackage):
+        os.remove(outSceneLayerPackage)
+    with zipfile.ZipFile(outSceneLayerPackage, 'w', zipfile.ZIP_STORED) as slpkFile:
+        slpkFile.writestr("metadata.json", json.dumps({"folderPattern": "basic", "archiveCompressionType": "STORE", "resourceCompressionType": "GZIP",
+                                                       "I3SVersion": "1.6", "nodeCount": len(nodes)}))
+        slpkFile.writestr("3dSceneLayer.json.gz", gzip_resource(json.dumps(storeDocument).encode("utf-8")))
+        for resources in resourceBlocks:
+            for [resourcePath, resourceData] in resources:
+                slpkFile.writestr(resourcePath, resourceData)
+
+    return [outSceneLayerPackage, len(nodes)]
+
+
+def CreatePointSceneLayerPackage(InNetCDFFileName, DimensionNames, VariableNames, outSceneLayerPackage, LayerName, timeEnabled = False):
+    """
+        Function Description:
+        Extracts the populated voxels of a NetCDF file and writes them as Point Scene Layer
+        Package (replaces MakeNetCDFFeatureLayer and CreatePointSceneLayerPackage).
+
+        Parameters
+        ----------
+        InNetCDFFileName: string
+            Path to NetCDF file (e.g. merged file) or manifest of a virtual merge (.json)
+        DimensionNames: list
+            Names of the dimensions (time, Z, latitude, longitude)
+        VariableNames: list
+            Names of the variables
+        outSceneLayerPackage: string
+            Path to output Scene Layer Package (.slpk)
+        LayerName: string
+            Name of the layer
+        timeEnabled: bool
+            If true, all time steps are exported and the time is added as field
+
+        Returns
+        -------
+        outSceneLayerPackage: string
+            Path to output Scene Layer Package
+        pointCount: int
+            Number of exported points
+    """
+    points = extract_voxel_points(InNetCDFFileName, VariableNames, DimensionNames, timeEnabled)
+    write_point_scene_layer_package(points, outSceneLayerPackage, LayerName, DimensionNames)
+    return [outSceneLayerPackage, len(points[DimensionNames[3]])]
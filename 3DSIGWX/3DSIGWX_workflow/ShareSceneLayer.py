@@ -32,7 +32,8 @@ def ShareSceneLayerFunction(inSceneLayer, temporary_LayerFolder, LayerName, Time
         Parameters
         ----------
         inSceneLayer: string
-            Path to Layer File (.lyrx)
+            Path to Layer File (without extension .lyrx) or to Scene Layer Package (.slpk)
+            written by the I3S writer (see SceneLayerPackage.py)
         temporary_LayerFolder: string
             Path to Folder, where temporary Scene Layer files are stored
         LayerName: string
@@ -126,7 +127,10 @@ def ShareSceneLayerFunction(inSceneLayer, temporary_LayerFolder, LayerName, Time
         
     arcpy.AddMessage("... Older files archived")
 
-    # 2. Create Scene Layer Package
+    # 2. Create Scene Layer Package (unless it is already written by the I3S writer)
+    nativeSceneLayerPackage = inSceneLayer.endswith(".slpk")
+    if nativeSceneLayerPackage:
+        inSceneLayer = os.path.splitext(inSceneLayer)[0]
     inSceneLayer = inSceneLayer+".lyrx"
     inSceneLayer = inSceneLayer.replace(os.sep, '/')
     arcpy.AddMessage("... Input Scene Layer: "+inSceneLayer)
@@ -135,7 +139,10 @@ def ShareSceneLayerFunction(inSceneLayer, temporary_LayerFolder, LayerName, Time
     outSceneLayerName = inSceneLayerName + '_'+ change_date 
     outSceneLayerPackage = os.path.join(temporary_LayerFolder, outSceneLayerName)
     arcpy.AddMessage("... Creating Scene Layer Package to folder: " + str(outSceneLayerPackage))
-    arcpy.CreatePointSceneLayerPackage_management(inSceneLayer, outSceneLayerPackage)
+    if nativeSceneLayerPackage:
+        os.replace(os.path.splitext(inSceneLayer)[0] + ".slpk", outSceneLayerPackage + ".slpk")
+    else:
+        arcpy.CreatePointSceneLayerPackage_management(inSceneLayer, outSceneLayerPackage)
 
 
     # 3. Update Scene Layer
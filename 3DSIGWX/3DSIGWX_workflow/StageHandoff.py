@@ -0,0 +1,200 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  StageHandoff
+ Source Name:       StageHandoff.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         In-memory option (hand over the intermediate files in memory)
+
+ Description:       Handoff of the intermediate NetCDF files between the stages of the
+                    workflows (Clip -> HeightAssignment -> Classification -> Merge).
+                    By default the intermediate files are written to disk. With the in-memory
+                    option they are created as in-memory NetCDF datasets and the next stage
+                    opens them from the memory buffer instead of writing and re-reading the
+                    file on disk. Data, coordinates, attributes and the grid mapping are kept
+                    exactly as in a file, thus the stages do not change. The buffers hold
+                    whole files until they are released, therefore the in-memory option is
+                    only used if the domain is processed at once (tile size 0). With tiles
+                    the files stay on disk and the peak memory is defined by the tile size.
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import arcpy
+import os
+from netCDF4 import Dataset
+from TileProcessing import tileSettings
+
+
+# Hand over the intermediate files in memory (see set_stage_in_memory)
+handoffSettings = {"inMemory": False}
+# Memory buffers of the closed in-memory NetCDF files (file name -> buffer)
+stageBuffers = {}
+
+
+def set_stage_in_memory(InMemory):
+    """
+        Function Description:
+        Defines if the intermediate files of the workflows are kept in memory or written to disk.
+
+        Parameters
+        ----------
+        InMemory: bool
+            If true, the intermediate files are kept in memory (only without tiles)
+
+        Returns
+        -------
+
+    """
+    handoffSettings["inMemory"] = bool(InMemory)
+
+
+def stage_in_memory():
+    """
+        Function Description:
+        Checks if the intermediate files are kept in memory. With tiles the files are always
+        written to disk, otherwise the buffers of whole files would define the peak memory.
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+        inMemory: bool
+            True if the intermediate files are kept in memory
+    """
+    return handoffSettings["inMemory"] and tileSettings["size"] == 0
+
+
+def create_stage_name(fileName, workspace):
+    """
+        Function Description:
+        Creates a unique name for an intermediate file. Names of the in-memory files are
+        unique as well, although they do not exist on disk.
+
+        Parameters
+        ----------
+        fileName: string
+            Name of the intermediate file
+        workspace: string
+            Path to the folder of the intermediate files
+
+        Returns
+        -------
+        unique_name: string
+            Unique name of the intermediate file
+    """
+    unique_name = arcpy.CreateUniqueName(fileName, workspace=workspace)
+    [baseName, extension] = os.path.splitext(unique_name)
+    counter = 0
+    while unique_name in stageBuffers:
+        unique_name = baseName + "_" + str(counter) + extension
+        counter += 1
+    return unique_name
+
+
+def create_stage_file(fileName, format = 'NETCDF4'):
+    """
+        Function Description:
+        Creates an intermediate NetCDF file (on disk, or in memory with the in-memory option).
+
+        Parameters
+        ----------
+        fileName: string
+            Name of the intermediate file
+        format: string
+            NetCDF format of the file
+
+        Returns
+        -------
+        outNetCDFFile: Dataset
+            NetCDF dataset opened for writing
+    """
+    if stage_in_memory():
+        return Dataset(fileName, 'w', format = format, memory = 0)
+    return Dataset(fileName, 'w', format = format)
+
+
+def close_stage_file(outNetCDFFile, fileName):
+    """
+        Function Description:
+        Closes an intermediate NetCDF file. The memory buffer of an in-memory file is kept
+        for the next stage.
+
+        Parameters
+        ----------
+        outNetCDFFile: Dataset
+            NetCDF dataset created with create_stage_file
+        fileName: string
+            Name of the intermediate file
+
+        Returns
+        -------
+
+    """
+    stageBuffer = outNetCDFFile.close()
+    if stageBuffer is not None:
+        stageBuffers[fileName] = stageBuffer
+
+
+def open_stage_file(fileName):
+    """
+        Function Description:
+        Opens a NetCDF file for reading, from the memory buffer if it is an in-memory
+        intermediate file, otherwise from disk.
+
+        Parameters
+        ----------
+        fileName: string
+            Name of the NetCDF file
+
+        Returns
+        -------
+        inNetCDFFile: Dataset
+            NetCDF dataset opened for reading
+    """
+    if fileName in stageBuffers:
+        return Dataset(fileName, 'r', memory = stageBuffers[fileName])
+    return Dataset(fileName, 'r')
+
+
+def materialize_stage_files(fileNames):
+    """
+        Function Description:
+        Writes in-memory intermediate files to disk (e.g. for tools which can only read files).
+
+        Parameters
+        ----------
+        fileNames: list
+            Names of the NetCDF files
+
+        Returns
+        -------
+
+    """
+    for fileName in fileNames:
+        if fileName in stageBuffers:
+            with open(fileName, 'wb') as stageFile:
+                stageFile.write(stageBuffers.pop(fileName))
+
+
+def release_stage_files(fileNames = None):
+    """
+        Function Description:
+        Frees the memory buffers of in-memory intermediate files which are no longer needed.
+
+        Parameters
+        ----------
+        fileNames: list
+            Names of the NetCDF files (None frees all buffers)
+
+        Returns
+        -------
+
+    """
+    if fileNames is None:
+        stageBuffers.clear()
+        return
+    for fileName in fileNames:
+        stageBuffers.pop(fileName, None)
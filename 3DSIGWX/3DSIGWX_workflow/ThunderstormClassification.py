@@ -8,8 +8,11 @@
                     NetCDF CLC variable name
                     Output netCDF File
 
- Description:       Workflow to classify the storm potential at each (t,z,lat,lon)-Cell based
+ Description:       Workflow to classify the storm potential at each (t,lat,lon)-Cell based
                     on the CAPE_MU variable in the input netCDF file (given in J/kg).
+                    CAPE_MU is a 2D variable, thus it is classified once per column and
+                    extruded to the Z-Coordinates afterwards (see CapeGrid.py). Input 
+                    files with a Z dimension (t,z,lat,lon) are classified as well.
                     
   
 ----------------------------------------------------------------------------------'''
@@ -23,12 +26,27 @@ from netCDF4 import Dataset
 from netCDF4 import Variable
 import netCDF4
 
+from TileProcessing import *
+from StageHandoff import *
+from ClassifierEngine import *
+
+
+# Rule table CAPE_MU [J/kg] -> Storm class (see ClassifierEngine.py)
+# If 0<CAPE_MU<500 the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
+StormClassificationRules = [
+    [1, {'CAPE_MU': (500, 1000, "both")}],
+    [2, {'CAPE_MU': (1000, 2000, "right")}],
+    [3, {'CAPE_MU': (2000, 3000, "right")}],
+    [4, {'CAPE_MU': (3000, None, "neither")}],
+]
+
 
 
 def storm_classification(CAPEData):
     """
         Function Description: 
-        Classifying the CAPE_MU value at each (t,z,lat,lon)-Datapoint. 
+        Classifying the CAPE_MU value at each (t,[z,]lat,lon)-Datapoint with the rule 
+        table "StormClassificationRules". 
 
         Parameters
         ----------
@@ -41,34 +59,10 @@ def storm_classification(CAPEData):
             Classified CAPE_MU values
     """
     fill_value = -3.4028235e+38
-    
-    CAPEData = np.array(CAPEData)
-    shapeCAPEData = np.shape(CAPEData)
-    shapeCAPEData = tuple(shapeCAPEData) 
-
-    outVariableData = np.empty(shapeCAPEData)    # Create empty output array
 
     arcpy.AddMessage('... Classifying Data')
-    # Classify CLC Values to Categories 
-    for time in range(shapeCAPEData[0]):
-        for zcoord in range(shapeCAPEData[1]):
-            arcpy.AddMessage('    Z-Coordinate: ' + str(zcoord))
-            for i in range(shapeCAPEData[2]):   # latitude
-                for j in range(shapeCAPEData[3]): # longitude                     
-                    if (CAPEData[time, zcoord, i, j] >= 500) & (CAPEData[time, zcoord, i, j] <= 1000):
-                        outVariableData[time, zcoord, i, j] = 1
-                    
-                    elif (CAPEData[time, zcoord, i, j] > 1000) & (CAPEData[time, zcoord, i, j] <= 2000):
-                        outVariableData[time, zcoord, i, j] = 2
-                    
-                    elif (CAPEData[time, zcoord, i, j] > 2000) & (CAPEData[time, zcoord, i, j] <= 3000):
-                        outVariableData[time, zcoord, i, j] = 3
-
-                    elif (CAPEData[time, zcoord, i, j] > 3000):
-                        outVariableData[time, zcoord, i, j] = 4
-
-                    else:
-                        outVariableData[time, zcoord, i, j] = fill_value    # If 0<CAPE_MU<500 the fill_value (NaN) is inserted, thus no feature will be created in the feature layer
+    # Classify CAPE_MU Values to Categories 
+    outVariableData = apply_rule_table(StormClassificationRules, {'CAPE_MU': CAPEData}, fill_value)
     
     return outVariableData
 
@@ -78,8 +72,8 @@ def storm_classification(CAPEData):
 def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timestamp):
     """
         Function Description: 
-        Classifies the storm potential at each (t,z,lat,lon)-Cell based
-        on the CAPE_MU variable in the input netCDF file (given in J/kg).
+        Classifies the storm potential at each (t,lat,lon)-Cell (or (t,z,lat,lon)-Cell if the
+        input is already regridded) based on the CAPE_MU variable in the input netCDF file (given in J/kg).
 
         Parameters
         ----------
@@ -108,7 +102,7 @@ def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     
     
     #inNetCDFFileName = "CapeRegrid_netCDF.nc"
-    unique_name = arcpy.CreateUniqueName(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", workspace=current_geodatabase)
+    unique_name = create_stage_name(Timestamp + "_" + LayerName + "_Classified_netCDF.nc", current_geodatabase)
     outNetCDFFileName = unique_name      
     #outNetCDFFileName = "StormClassified_netCDF.nc"
     ncVarCAPE = 'CAPE_MU'
@@ -118,10 +112,8 @@ def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 1. Import NetCDF Input File with CAPE Values
     #1.1 Open the netCDF file and get variables
-    inNetCDFFile = Dataset(inNetCDFFileName, 'r')
+    inNetCDFFile = open_stage_file(inNetCDFFileName)
     ncVarNames = inNetCDFFile.variables.keys()
-    ncDimNames = inNetCDFFile.dimensions.keys()
-    ncDimNames = list(ncDimNames) 
 
     
     #1.2 Check if netCDF variable exists
@@ -129,30 +121,31 @@ def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
         arcpy.AddError("NetCDF variable " + ncVarCAPE + " does not exist.")              
         raise Exception (msgInvalidParameter)
     arcpy.AddMessage("... netCDF variable " + ncVarCAPE + " exists")
+    ncDimNames = list(inNetCDFFile.variables[ncVarCAPE].dimensions)     # Only the dimensions of CAPE_MU are written
 
 
-    #1.3 Check if X, Y, Z dimensions exist
+    #1.3 Check if X, Y dimensions exist (Z dimension is optional)
     xDimension = 'longitude'
     yDimension = 'latitude'
     zDimension = 'Z'
-    for Dimension in list((xDimension, yDimension, zDimension)):
+    for Dimension in list((xDimension, yDimension)):
         if list(ncDimNames).count(Dimension) == 0:
             arcpy.AddError("NetCDF Dimension " + Dimension + " does not exist.")              
             raise Exception (msgInvalidParameter)
         arcpy.AddMessage("... netCDF Dimension " + Dimension + " exists")
+    if list(ncDimNames).count(zDimension) == 0:
+        arcpy.AddMessage("... netCDF Dimension " + zDimension + " does not exist (2D classification)")
 
 
     # 2. Extract CAPE Values from netCDF Input File
     # 2.1 Get netCDF CAPE variable object
     ncVarCAPEObj = inNetCDFFile.variables[ncVarCAPE]
-    ncVarCAPEData = inNetCDFFile.variables[ncVarCAPE][:]
 
     
-    # 3. Classification of CAPE Values 
-    classifiedVariableData = storm_classification(ncVarCAPEData)
+    # 3. Classification of CAPE Values (tile by tile when writing the output variable, see 6.)
 
     # 4. Create new Output NetCDF file
-    outNetCDFFile = Dataset(outNetCDFFileName, 'w', format = 'NETCDF4_CLASSIC')
+    outNetCDFFile = create_stage_file(outNetCDFFileName, format = 'NETCDF4_CLASSIC')
 
 
     # 5. Create Dimensions
@@ -206,7 +199,10 @@ def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
     # 6. Create Variable StormClassification with new classified values
     ncVarCloudDim = list(inNetCDFFile.variables[ncVarCAPE].dimensions)
     outNcVar = outNetCDFFile.createVariable(outVarCAPE, 'f4', (ncVarCloudDim), fill_value = -3.4028235e+38)
-    outNcVar[:, :, :, :] = classifiedVariableData[:]                    
+    for tile in latitude_tiles(len(inNetCDFFile.dimensions[yDimension])):     # Classify and write in latitude bands (see TileProcessing.py)
+        ncVarCAPEData = ncVarCAPEObj[tile_index(ncVarCloudDim, tile, yDimension)]
+        classifiedVariableData = storm_classification(ncVarCAPEData)
+        outNcVar[tile_index(ncVarCloudDim, tile, yDimension)] = classifiedVariableData[:]                    
 
     # 7. Get Variable Attributes and assign to new outVariable
         #    Also determine if grid_mapping exists or not
@@ -264,7 +260,7 @@ def StormClassification(inNetCDFFileName, current_geodatabase, LayerName, Timest
 
     # 10. Synchronize and close NetCDF files
     outNetCDFFile.sync()    
-    outNetCDFFile.close()
+    close_stage_file(outNetCDFFile, outNetCDFFileName)
     inNetCDFFile.close()
 
     arcpy.AddMessage('END Classifing CAPE Values\n\n')
@@ -31,12 +31,13 @@ from CapeGrid import *
 from ThunderstormClassification import *
 from HeightAssignment import *
 from MergeNetCDF import *
+from StageHandoff import *
 from CreateSceneLayer import *
 from ShareSceneLayer import *
 from arcpy import env
 
 def StormWorkflow(inNetCDFFileNames, current_geodatabase, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, Timestamp, descriptionDate,
-                    username_arcgis, password_arcgis, timeEnabled = False):
+                    username_arcgis, password_arcgis, timeEnabled = False, appendMerge = False):
     """
         Function Description:   Workflow to classify the areas of Thunderstorm Potential according to the CAPE
                                 Values of the most unstable parcel.
@@ -67,6 +68,9 @@ def StormWorkflow(inNetCDFFileNames, current_geodatabase, current_folder, tempLa
             Password of ArcGIS account
         timeEnabled: bool
             If true, time dimension is added to the feature layer
+        appendMerge: bool
+            If true, the files are appended to an existing merged file of the same Timestamp
+            (e.g. a newly arriving forecast hour) instead of merging all files again
         
         Returns
         -------
@@ -88,19 +92,24 @@ def StormWorkflow(inNetCDFFileNames, current_geodatabase, current_folder, tempLa
         for InFileName in inNetCDFFileNames:
             arcpy.AddMessage('\nStarting with file ' + str(counter))
     
-            # 1. HeightAssignment
-            ncVarName_Regrid = 'CAPE_MU'  # variable to be interpolated
-            Regrid_assigned_file = CapeGridAssignment(InFileName, ncVarName_Regrid, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+            # 1. StormClassification (once per column on the 2D CAPE values)
+            [storm_classified_file, StormClassificationVariableName] = StormClassification(InFileName, current_folder, LayerName, Timestamp)
             
 
-            # 2. StormClassification
-            [storm_classified_file, StormClassificationVariableName] = StormClassification(Regrid_assigned_file, current_folder, LayerName, Timestamp)
-            file_names.append(storm_classified_file)
+            # 2. Extrude the classified values to the Z-Coordinates for the feature layer
+            #    (geometric height is taken from the input file). The sparse point export and the native
+            #    Scene Layer Package extrude the 2D values themselves, thus only the Z-Coordinates are added
+            extrude = not (pointExportSettings["sparse"] or pointExportSettings["nativePackage"])
+            Regrid_assigned_file = CapeGridAssignment(storm_classified_file, StormClassificationVariableName, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp, 
+                                                      InFileName, extrude)
+            release_stage_files([storm_classified_file])   # Intermediate file is no longer needed
+            file_names.append(Regrid_assigned_file)
             
             counter += 1
         
         # 3. Merging Files
-        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp)
+        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp, None, appendMerge)
+        release_stage_files(file_names)
 
         # 4. Create NetCDF Feature Layer (.lyrx file)
         outFeatureLayerName = CreateNetCDFFeatureLayer(merged_NetCDFfileName, DimensionNames_mergedFile, StormClassificationVariableName, current_geodatabase, 
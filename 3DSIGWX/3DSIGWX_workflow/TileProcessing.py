@@ -0,0 +1,100 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  TileProcessing
+ Source Name:       TileProcessing.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Tile Size (number of latitude rows)
+
+ Description:       Helper functions to process the NetCDF variables in bands of latitude rows 
+                    (tiles) instead of loading the whole domain at once. The clipping, the 
+                    HeightAssignment and the classifications read, process and write one tile 
+                    after the other, thus the peak memory is defined by the tile size and not 
+                    by the extent of the domain. All computations are independent per column, 
+                    the values of the output files are the same as without tiles.
+                    
+  
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+
+
+# Number of latitude rows per tile (0 processes the whole domain at once)
+tileSettings = {"size": 0}
+
+
+def set_tile_size(TileSize):
+    """
+        Function Description: 
+        Sets the number of latitude rows that are processed at once by all workflows.
+
+        Parameters
+        ----------
+        TileSize: int
+            Number of latitude rows per tile (0 or None to process the whole domain at once)
+        
+        Returns
+        -------
+        
+    """
+    if TileSize is None or int(TileSize) <= 0:
+        tileSettings["size"] = 0
+    else:
+        tileSettings["size"] = int(TileSize)
+
+
+def latitude_tiles(nLatitude):
+    """
+        Function Description: 
+        Splits the latitude dimension into bands with the configured tile size.
+
+        Parameters
+        ----------
+        nLatitude: int
+            Size of the latitude dimension
+        
+        Returns
+        -------
+        tiles: list
+            Slices of the latitude rows of every tile
+    """
+    tileSize = tileSettings["size"]
+    if tileSize == 0:
+        tileSize = max(nLatitude, 1)
+
+    return [slice(start, min(start + tileSize, nLatitude)) for start in range(0, nLatitude, tileSize)]
+
+
+def tile_index(ncDimNames, tile, yDimension = 'latitude', stride = 1, xDimension = 'longitude'):
+    """
+        Function Description: 
+        Creates the index to read or write a tile of a NetCDF variable (all other
+        dimensions are taken completely). With a stride > 1 the tile is given in rows 
+        of the subsampled grid and only every stride-th latitude row and longitude 
+        column is read (strided hyperslab).
+
+        Parameters
+        ----------
+        ncDimNames: list
+            Dimension names of the NetCDF variable
+        tile: slice
+            Latitude rows of the tile
+        yDimension: string
+            NetCDF Dimension for y-Coordinate (latitude)
+        stride: int
+            Take every stride-th latitude row and longitude column (1 takes all)
+        xDimension: string
+            NetCDF Dimension for x-Coordinate (longitude)
+        
+        Returns
+        -------
+        index: tuple
+            Index for the NetCDF variable
+    """
+    index = [slice(None)] * len(ncDimNames)
+    if stride > 1:
+        tile = slice(tile.start * stride, (tile.stop - 1) * stride + 1, stride)
+        index[list(ncDimNames).index(xDimension)] = slice(None, None, stride)
+    index[list(ncDimNames).index(yDimension)] = tile
+    return tuple(index)
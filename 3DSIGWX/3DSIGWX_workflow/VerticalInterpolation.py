@@ -0,0 +1,529 @@
+'''----------------------------------------------------------------------------------
+ ArcGIS Tool Name:  VerticalInterpolation
+ Source Name:       VerticalInterpolation.py
+ Version:           ArcGIS Pro 2.8.0
+ Author:            Tschannen Tim and Zurbrügg Niculin, ZHAW School of Engineering
+
+ Arguments:         Geometric Height array
+                    z-Coordinates
+                    Variable array
+
+ Description:       Interpolation engine used by the HeightAssignment. Instead of searching the
+                    nearest model levels column by column, the bracketing levels of every
+                    (Z, latitude, longitude)-Datapoint are found with one batched binary search
+                    over the geometric height axis. The interpolation itself is then carried
+                    out with array arithmetic on the whole cube.
+                    Since the geometric height of the COSMO grid does not change, the lower/higher
+                    layer indices and interpolation ratios are cached in memory and on disk
+                    (keyed on the geometric height field and the z-Coordinate frame) and reused
+                    for every variable, timestamp and run.
+                    For large extents the columns can be interpolated on a process pool (see
+                    set_interpolation_workers). The data is handed to the worker processes through
+                    memory mapped files instead of pickling the arrays.
+                    The module only depends on numpy, so it can also be used outside of ArcGIS.
+
+
+----------------------------------------------------------------------------------'''
+
+#Import required modules
+import numpy as np
+import os, glob, hashlib, shutil, tempfile
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+
+# Settings and statistics of the interpolation weight cache (see set_weight_cache)
+weightCacheSettings = {"folder": None, "maxSize": 500 * 1024**2, "memoryEntries": 4}
+weightCacheStatistics = {"hits": 0, "misses": 0}
+weightMemoryCache = OrderedDict()
+
+# Settings of the parallel interpolation (see set_interpolation_workers)
+interpolationSettings = {"workers": 1, "pool": None}
+
+
+def search_bracketing_levels(columnHeight, targetHeight):
+    """
+        Function Description:
+        Batched binary search over the geometric height axis. The model levels are ordered from
+        top to bottom, thus the geometric height is decreasing along the level axis. For every
+        column and every z-Coordinate the number of levels above the z-Coordinate is returned,
+        which is the index of the first level at or below the z-Coordinate.
+
+        Parameters
+        ----------
+        columnHeight: array
+            Geometric height of the model levels (levels, columns)
+        targetHeight: array
+            z-Coordinates (Z, 1)
+
+        Returns
+        -------
+        levelIndex: array
+            Index of the first level at or below the z-Coordinate (Z, columns)
+    """
+    nLevels = columnHeight.shape[0]
+    columnIndex = np.arange(columnHeight.shape[1])
+    lowerBound = np.zeros((targetHeight.shape[0], columnHeight.shape[1]), dtype=np.intp)
+    upperBound = np.full_like(lowerBound, nLevels)
+
+    while np.any(lowerBound < upperBound):
+        active = lowerBound < upperBound
+        middle = (lowerBound + upperBound) // 2
+        middleHeight = columnHeight[np.minimum(middle, nLevels - 1), columnIndex]
+        above = active & (middleHeight > targetHeight)
+        lowerBound = np.where(above, middle + 1, lowerBound)
+        upperBound = np.where(active & ~above, middle, upperBound)
+
+    return lowerBound
+
+
+def compute_interpolation_weights(GeometricHeight, zCoordinates):
+    """
+        Function Description:
+        Determines for every z-Coordinate and every column the two model levels used for the
+        interpolation and the interpolation ratio. The selection is the same as in the former
+        column-wise search: the nearest level is taken as lower layer, the second or third
+        nearest level as higher layer if the z-Coordinate lies between them. Otherwise the
+        point is below the terrain and marked as invalid. Because the geometric height is
+        monotonic, the three nearest levels are always among the three levels above and the
+        three levels below the z-Coordinate, so only these candidates have to be compared.
+
+        Parameters
+        ----------
+        GeometricHeight: array
+            array of netCDF variable "height" (levels, latitude, longitude)
+        zCoordinates: array
+            z-Coordinates of the new vertical coordinate system
+
+        Returns
+        -------
+        lowerIndex: array
+            Index of the lower layer (Z, latitude, longitude)
+        upperIndex: array
+            Index of the higher layer (Z, latitude, longitude)
+        weight: array
+            Interpolation ratio between lower and higher layer (Z, latitude, longitude)
+        validMask: array
+            False for points below the terrain or with missing geometric height
+    """
+    GeometricHeight = np.asarray(GeometricHeight)
+    levelHeight = GeometricHeight[:-2]                              # Levels considered for the interpolation
+    nLevels = levelHeight.shape[0]
+    shapeOut = (len(zCoordinates),) + levelHeight.shape[1:]
+    columnHeight = levelHeight.reshape(nLevels, -1)
+    columnIndex = np.arange(columnHeight.shape[1])
+    targetHeight = np.asarray(zCoordinates, dtype=np.float64).reshape(-1, 1)
+
+    # 1. Search the first level at or below every z-Coordinate
+    levelIndex = search_bracketing_levels(columnHeight, targetHeight)
+
+    # 2. Distances to the three levels above and the three levels below the z-Coordinate
+    candidateIndex = levelIndex[None, :, :] + np.arange(-3, 3).reshape(-1, 1, 1)
+    candidateValid = (candidateIndex >= 0) & (candidateIndex < nLevels)
+    candidateIndex = np.clip(candidateIndex, 0, nLevels - 1)
+    candidateHeight = columnHeight[candidateIndex, columnIndex]
+    deltaHeight = np.where(candidateValid, np.abs(targetHeight - candidateHeight), np.inf)
+
+    # 3. Indices of the three nearest levels (first level matching the sorted distance)
+    sortedDelta = np.sort(deltaHeight, axis=0)
+    nearestIndex = []
+    for rank in range(3):
+        matchingLevels = np.isclose(deltaHeight, sortedDelta[rank]) & candidateValid
+        firstMatch = np.argmax(matchingLevels, axis=0)
+        nearestIndex.append(np.take_along_axis(candidateIndex, firstMatch[None], axis=0)[0])
+    nearestHeight = [columnHeight[index, columnIndex] for index in nearestIndex]
+
+    # 4. Check, if z-Coordinate is between the nearest and the second (or third) nearest level
+    heightDiffLower = targetHeight - nearestHeight[0]
+    betweenFirst = heightDiffLower * (targetHeight - nearestHeight[1]) < 0
+    betweenSecond = heightDiffLower * (targetHeight - nearestHeight[2]) < 0
+    lowerIndex = nearestIndex[0]
+    upperIndex = np.where(betweenFirst, nearestIndex[1], nearestIndex[2])
+    upperHeight = np.where(betweenFirst, nearestHeight[1], nearestHeight[2])
+    validMask = (betweenFirst | betweenSecond) & (GeometricHeight[0].reshape(1, -1) >= -100000)     # Check for NaN Values in Geometric Height
+
+    # 5. Interpolation ratio
+    heightDiffLayers = np.abs(upperHeight - nearestHeight[0])      # Difference between higher and lower layer
+    heightDiffZCoord = np.abs(heightDiffLower)                     # Difference between z-Coordinate (middle point) and lower Layer
+    weight = np.divide(heightDiffZCoord, heightDiffLayers, out=np.zeros(heightDiffZCoord.shape), where=validMask)
+
+    return [lowerIndex.reshape(shapeOut), upperIndex.reshape(shapeOut), weight.reshape(shapeOut), validMask.reshape(shapeOut)]
+
+
+def apply_interpolation_weights(VariableData, lowerIndex, upperIndex, weight, validMask, fillValue):
+    """
+        Function Description:
+        Interpolates the level based variable values to the z-Coordinates with the
+        precomputed lower/higher layer indices and interpolation ratios.
+
+        Parameters
+        ----------
+        VariableData: array
+            Values from the Variable to interpolate (levels, latitude, longitude) or
+            (time, levels, latitude, longitude). The indices are reused for every timestamp
+        lowerIndex: array
+            Index of the lower layer (Z, latitude, longitude)
+        upperIndex: array
+            Index of the higher layer (Z, latitude, longitude)
+        weight: array
+            Interpolation ratio between lower and higher layer
+        validMask: array
+            False for points below the terrain or with missing geometric height
+        fillValue: float
+            Default value
+
+        Returns
+        -------
+        outVariableData: array
+            Interpolated data ([time,] Z, latitude, longitude)
+    """
+    VariableData = np.ma.getdata(VariableData)
+    leadingAxes = (1,) * (VariableData.ndim - lowerIndex.ndim)      # Broadcast the indices over the time dimension
+    lowerData = np.take_along_axis(VariableData, lowerIndex.reshape(leadingAxes + lowerIndex.shape), axis=-3)
+    upperData = np.take_along_axis(VariableData, upperIndex.reshape(leadingAxes + upperIndex.shape), axis=-3)
+    interpolatedVariableData = lowerData - (lowerData - upperData)*weight
+    return np.where(validMask, interpolatedVariableData, fillValue)
+
+
+def set_weight_cache(cacheFolder, maxCacheSize):
+    """
+        Function Description:
+        Defines where the interpolation weights are stored on disk and how much disk space
+        they may use. If the limit is exceeded, the least recently used entries are removed.
+
+        Parameters
+        ----------
+        cacheFolder: string
+            Path to the folder of the weight cache (None disables the disk cache)
+        maxCacheSize: int
+            Maximum size of the disk cache in [MB]
+
+        Returns
+        -------
+    """
+    weightCacheSettings["folder"] = cacheFolder
+    weightCacheSettings["maxSize"] = int(maxCacheSize * 1024**2)
+    if cacheFolder and maxCacheSize > 0:
+        os.makedirs(cacheFolder, exist_ok=True)
+
+
+def weight_cache_key(GeometricHeight, AmountofLayers, MaxHeight):
+    """
+        Function Description:
+        Hash of the geometric height field and the z-Coordinate frame, used as key of the
+        interpolation weight cache.
+
+        Parameters
+        ----------
+        GeometricHeight: array
+            array of netCDF variable "height"
+        AmountofLayers: int
+            Number of Layers in new vertical coordinate system
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+
+        Returns
+        -------
+        key: string
+            Hexadecimal hash
+    """
+    GeometricHeight = np.ascontiguousarray(np.ma.getdata(GeometricHeight))
+    keyHash = hashlib.blake2b(digest_size=20)
+    keyHash.update(str((GeometricHeight.shape, GeometricHeight.dtype.str, int(AmountofLayers), float(MaxHeight))).encode())
+    keyHash.update(GeometricHeight.tobytes())
+    return keyHash.hexdigest()
+
+
+def evict_weight_cache(cacheFolder, maxCacheSize, keepFile):
+    """
+        Function Description:
+        Removes the least recently used cache files until the cache fits into "maxCacheSize".
+
+        Parameters
+        ----------
+        cacheFolder: string
+            Path to the folder of the weight cache
+        maxCacheSize: int
+            Maximum size of the disk cache in [bytes]
+        keepFile: string
+            Cache file which is never removed (the entry written last)
+
+        Returns
+        -------
+    """
+    cacheFiles = []
+    for f in glob.glob(os.path.join(cacheFolder, "*.npz")):
+        try:
+            cacheFiles.append((os.path.getmtime(f), os.path.getsize(f), f))
+        except OSError:
+            pass        # Removed by another worker process in the meantime
+    cacheSize = sum(size for _, size, _ in cacheFiles)
+    for _, size, cacheFile in sorted(cacheFiles):
+        if cacheSize <= maxCacheSize:
+            break
+        if os.path.abspath(cacheFile) == os.path.abspath(keepFile):
+            continue
+        try:
+            os.remove(cacheFile)
+        except OSError:
+            pass
+        cacheSize -= size
+
+
+def get_interpolation_weights(GeometricHeight, zCoordinates, AmountofLayers, MaxHeight):
+    """
+        Function Description:
+        Returns the lower/higher layer indices, interpolation ratios and valid mask of
+        compute_interpolation_weights. The result is first looked up in memory, then in the
+        disk cache and only computed if both lookups fail. Hits and misses are counted in
+        "weightCacheStatistics".
+
+        Parameters
+        ----------
+        GeometricHeight: array
+            array of netCDF variable "height" (levels, latitude, longitude)
+        zCoordinates: array
+            z-Coordinates of the new vertical coordinate system
+        AmountofLayers: int
+            Number of Layers in new vertical coordinate system
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+
+        Returns
+        -------
+        weights: list
+            [lowerIndex, upperIndex, weight, validMask]
+    """
+    key = weight_cache_key(GeometricHeight, AmountofLayers, MaxHeight)
+
+    # 1. Lookup in memory
+    if key in weightMemoryCache:
+        weightMemoryCache.move_to_end(key)
+        weightCacheStatistics["hits"] += 1
+        return weightMemoryCache[key]
+
+    # 2. Lookup on disk
+    cacheFolder = weightCacheSettings["folder"]
+    useDiskCache = bool(cacheFolder) and weightCacheSettings["maxSize"] > 0
+    cacheFile = os.path.join(cacheFolder, key + ".npz") if useDiskCache else None
+    weights = None
+    if useDiskCache and os.path.exists(cacheFile):
+        try:
+            with np.load(cacheFile) as cachedWeights:
+                weights = [cachedWeights["lowerIndex"].astype(np.intp), cachedWeights["upperIndex"].astype(np.intp),
+                           cachedWeights["weight"], cachedWeights["validMask"]]
+            os.utime(cacheFile)     # Mark as recently used
+            weightCacheStatistics["hits"] += 1
+        except (OSError, ValueError, KeyError):
+            os.remove(cacheFile)    # Damaged cache file, compute again
+            weights = None
+
+    # 3. Compute and store
+    if weights is None:
+        weightCacheStatistics["misses"] += 1
+        weights = compute_interpolation_weights(GeometricHeight, zCoordinates)
+        if useDiskCache:
+            indexType = np.min_scalar_type(max(int(weights[0].max(initial=0)), int(weights[1].max(initial=0))))
+            tempFile = cacheFile[:-4] + "_" + str(os.getpid()) + ".tmp.npz"
+            np.savez(tempFile, lowerIndex=weights[0].astype(indexType), upperIndex=weights[1].astype(indexType),
+                     weight=weights[2], validMask=weights[3])
+            os.replace(tempFile, cacheFile)
+            evict_weight_cache(cacheFolder, weightCacheSettings["maxSize"], cacheFile)
+
+    weightMemoryCache[key] = weights
+    while len(weightMemoryCache) > weightCacheSettings["memoryEntries"]:
+        weightMemoryCache.popitem(last=False)
+    return weights
+
+
+
+def set_interpolation_workers(nWorkers):
+    """
+        Function Description:
+        Defines the number of worker processes used to interpolate the columns of a tile.
+        With one worker the interpolation runs in the current process.
+
+        Parameters
+        ----------
+        nWorkers: int
+            Number of worker processes
+
+        Returns
+        -------
+    """
+    nWorkers = max(int(nWorkers or 1), 1)
+    if nWorkers != interpolationSettings["workers"]:
+        shutdown_interpolation_pool()
+    interpolationSettings["workers"] = nWorkers
+
+
+def shutdown_interpolation_pool():
+    """
+        Function Description:
+        Stops the worker processes of the parallel interpolation (if started).
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+    """
+    if interpolationSettings["pool"] is not None:
+        interpolationSettings["pool"].shutdown()
+        interpolationSettings["pool"] = None
+
+
+def init_interpolation_worker(cacheSettings):
+    """
+        Function Description:
+        Initializes a worker process with the weight cache settings of the main process.
+    """
+    weightCacheSettings.update(cacheSettings)
+
+
+def create_mapped_array(folder, name, shape, dtype, data = None):
+    """
+        Function Description:
+        Creates a memory mapped array in "folder" which can be opened by the worker processes.
+
+        Parameters
+        ----------
+        folder: string
+            Folder of the memory mapped files
+        name: string
+            File name
+        shape: tuple
+            Shape of the array
+        dtype: numpy dtype
+            Data type of the array
+        data: array
+            Values to copy into the array (optional)
+
+        Returns
+        -------
+        mappedArray: list
+            [memory mapped array, (path, shape, dtype)] 
+    """
+    path = os.path.join(folder, name + ".npy")
+    mappedArray = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=tuple(shape))
+    if data is not None:
+        mappedArray[:] = data
+    return [mappedArray, (path, tuple(shape), np.dtype(dtype).str)]
+
+
+def interpolate_columns_worker(heightBlock, variableBlocks, outputBlocks, columnSlice, zCoordinates, AmountofLayers, MaxHeight, fillValue):
+    """
+        Function Description:
+        Worker process: interpolates the latitude rows "columnSlice" of all variables. The input
+        and output arrays are opened from the memory mapped files of the main process.
+
+        Parameters
+        ----------
+        heightBlock: tuple
+            (path, shape, dtype) of the geometric height (levels, latitude, longitude)
+        variableBlocks: list
+            (path, shape, dtype) of the variables ([time,] levels, latitude, longitude)
+        outputBlocks: list
+            (path, shape, dtype) of the interpolated variables ([time,] Z, latitude, longitude)
+        columnSlice: slice
+            Latitude rows interpolated by this worker
+        zCoordinates: array
+            z-Coordinates of the new vertical coordinate system
+        AmountofLayers: int
+            Number of Layers in new vertical coordinate system
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+        fillValue: float
+            Default value
+
+        Returns
+        -------
+        statistics: list
+            Weight cache hits and misses of this call
+    """
+    hits = weightCacheStatistics["hits"]
+    misses = weightCacheStatistics["misses"]
+
+    GeometricHeight = np.load(heightBlock[0], mmap_mode='r')
+    GeometricHeight = np.ascontiguousarray(GeometricHeight[:, columnSlice, :])
+    [lowerIndex, upperIndex, weight, validMask] = get_interpolation_weights(GeometricHeight, zCoordinates, AmountofLayers, MaxHeight)
+    for variableBlock, outputBlock in zip(variableBlocks, outputBlocks):
+        VariableData = np.load(variableBlock[0], mmap_mode='r')
+        outVariableData = np.load(outputBlock[0], mmap_mode='r+')
+        outVariableData[..., columnSlice, :] = apply_interpolation_weights(VariableData[..., columnSlice, :], lowerIndex, upperIndex, weight, validMask, fillValue)
+        outVariableData.flush()
+        del VariableData, outVariableData       # Release the files (required to remove them on Windows)
+
+    return [weightCacheStatistics["hits"] - hits, weightCacheStatistics["misses"] - misses]
+
+
+def interpolate_parallel(GeometricHeight, VariableDataList, zCoordinates, AmountofLayers, MaxHeight, fillValue):
+    """
+        Function Description:
+        Interpolates several variables to the z-Coordinates by splitting the latitude rows
+        between the worker processes of a process pool. The result is the same as calling
+        apply_interpolation_weights for every variable in the current process.
+
+        Parameters
+        ----------
+        GeometricHeight: array
+            array of netCDF variable "height" (levels, latitude, longitude)
+        VariableDataList: list
+            Values of the variables to interpolate ([time,] levels, latitude, longitude)
+        zCoordinates: array
+            z-Coordinates of the new vertical coordinate system
+        AmountofLayers: int
+            Number of Layers in new vertical coordinate system
+        MaxHeight: int
+            Heighest interpolated Layer in new vert. coord. system
+        fillValue: float
+            Default value
+
+        Returns
+        -------
+        outVariableDataList: list
+            Interpolated data of every variable ([time,] Z, latitude, longitude)
+    """
+    nWorkers = interpolationSettings["workers"]
+    if interpolationSettings["pool"] is None:
+        # Worker processes are always spawned (as on Windows): forked processes would inherit the open NetCDF files of the main process
+        interpolationSettings["pool"] = ProcessPoolExecutor(max_workers=nWorkers, mp_context=multiprocessing.get_context("spawn"),
+                                                            initializer=init_interpolation_worker, initargs=(dict(weightCacheSettings),))
+    pool = interpolationSettings["pool"]
+
+    # 1. Copy the input data to memory mapped files and create the output files
+    GeometricHeight = np.ma.getdata(GeometricHeight)
+    nLatitude = GeometricHeight.shape[1]
+    mappedFolder = tempfile.mkdtemp(prefix="3DSIGWX_interpolation_")
+    try:
+        [mappedHeight, heightBlock] = create_mapped_array(mappedFolder, "HEIGHT", GeometricHeight.shape, GeometricHeight.dtype, GeometricHeight)
+        del mappedHeight
+        variableBlocks = []
+        outputBlocks = []
+        for index, VariableData in enumerate(VariableDataList):
+            VariableData = np.ma.getdata(VariableData)
+            [mappedVariable, variableBlock] = create_mapped_array(mappedFolder, "VAR" + str(index), VariableData.shape, VariableData.dtype, VariableData)
+            del mappedVariable
+            shapeOut = list(VariableData.shape)
+            shapeOut[-3] = AmountofLayers
+            [mappedOutput, outputBlock] = create_mapped_array(mappedFolder, "OUT" + str(index), shapeOut, np.float64)
+            del mappedOutput
+            variableBlocks.append(variableBlock)
+            outputBlocks.append(outputBlock)
+
+        # 2. Interpolate the latitude rows on the worker processes
+        columnSlices = [slice(int(rows[0]), int(rows[-1]) + 1) for rows in np.array_split(np.arange(nLatitude), nWorkers) if len(rows) > 0]
+        futures = [pool.submit(interpolate_columns_worker, heightBlock, variableBlocks, outputBlocks, columnSlice,
+                               zCoordinates, AmountofLayers, MaxHeight, fillValue) for columnSlice in columnSlices]
+        for future in futures:
+            [hits, misses] = future.result()
+            weightCacheStatistics["hits"] += hits
+            weightCacheStatistics["misses"] += misses
+
+        # 3. Read back the interpolated data
+        outVariableDataList = [np.array(np.load(outputBlock[0], mmap_mode='r')) for outputBlock in outputBlocks]
+    finally:
+        shutil.rmtree(mappedFolder, ignore_errors=True)
+
+    return outVariableDataList
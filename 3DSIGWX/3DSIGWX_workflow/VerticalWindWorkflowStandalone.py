@@ -29,12 +29,13 @@ from importlib import reload
 # Import Geoprocessing Modules
 from HeightAssignment import *
 from MergeNetCDF import *
+from StageHandoff import *
 from CreateSceneLayer import *
 from ShareSceneLayer import *
 from arcpy import env
 
 def VerticalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, current_folder, tempLayerFolder, AmountofLayers, MaxHeight, Timestamp, descriptionDate,
-                        username_arcgis, password_arcgis, timeEnabled = False):
+                        username_arcgis, password_arcgis, timeEnabled = False, heightAssigned = False, appendMerge = False):
     """
         Function Description:   Function to create a hosted Scene Layer containing vertical
                                 wind values based on the "W"" Variable in the COSMO-1E Numerical 
@@ -68,6 +69,12 @@ def VerticalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, cur
             Password of ArcGIS account
         timeEnabled: bool
             If true, time dimension is added to the feature layer
+        heightAssigned: bool
+            If true, the input files are the output of the shared HeightAssignment of all
+            variables and no further interpolation is needed
+        appendMerge: bool
+            If true, the files are appended to an existing merged file of the same Timestamp
+            (e.g. a newly arriving forecast hour) instead of merging all files again
         
         Returns
         -------
@@ -91,7 +98,10 @@ def VerticalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, cur
             
             # 1. HeightAssignment
             ncVarName_HeightAssign = ['W']  # variable to be interpolated
-            height_assigned_file = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
+            if heightAssigned:
+                height_assigned_file = InFileName     # Already interpolated by the shared HeightAssignment
+            else:
+                height_assigned_file = HeightAssignment(InFileName, ncVarName_HeightAssign, current_folder, AmountofLayers, MaxHeight, LayerName, Timestamp)
 
             # 2. CloudClassification
             file_names.append(height_assigned_file)
@@ -99,10 +109,12 @@ def VerticalWindWorkflow(inNetCDFFileNames, ncVarNames, current_geodatabase, cur
             counter += 1
         
         # 3. Merging Files
-        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp)
+        SceneLayerVarNames = ['W', 'LayerLevel']    # Add LayerLevel to Scene Layer Attributes (used for filtering in the webapp)
+        [merged_NetCDFfileName, DimensionNames_mergedFile] = MergeNetCDFFunction(file_names, current_folder, LayerName, Timestamp, SceneLayerVarNames, appendMerge)
+        if not heightAssigned:
+            release_stage_files(file_names)   # Shared files are released by the main workflow
         
         # 4. Create NetCDF Feature Layer (.lyrx file)
-        SceneLayerVarNames = ['W', 'LayerLevel']    # Add LayerLevel to Scene Layer Attributes (used for filtering in the webapp)
         outFeatureLayerName = CreateNetCDFFeatureLayer(merged_NetCDFfileName, DimensionNames_mergedFile, SceneLayerVarNames, current_geodatabase, current_folder, 
                                                         tempLayerFolder, LayerName, Timestamp, timeEnabled)
         